@@ -0,0 +1,97 @@
+"""
+Benchmark of the ``require_role`` authentication dependency, with and without the cache of verified tokens.
+
+For every size, that many distinct tokens are polled in turn, imitating the same count of logged-in clients.
+Each case calls the dependency ``--calls`` times and is repeated several times. Results are written in the same
+format as ``run_benchmark.py``, so they could also be compared using ``compare.py``.
+
+Run from project root directory::
+
+    python -m benchmark.auth_benchmark --sizes 1 100 1000 --output benchmark/results/auth.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+
+from loguru import logger
+from starlette.requests import Request
+
+from config import auth as auth_conf
+from endpoints import auth as auth_endpoint
+from schema.auth import TokenData
+
+from benchmark.run_benchmark import time_case, get_meta_info
+
+DEFAULT_SIZE_LIST = [1, 100, 1000]
+
+
+def make_request(jwt_str: str) -> Request:
+    cookie = f'{auth_conf.JWT_FRONTEND_COOKIE_KEY}={jwt_str}'
+    return Request({'type': 'http', 'headers': [(b'cookie', cookie.encode())]})
+
+
+def make_token_list(count: int) -> list[str]:
+    """
+    Return ``count`` distinct valid tokens of role ``admin``.
+    """
+    now = int(time.time())
+    return [TokenData(role_name='admin', created_at=now - index).to_jwt() for index in range(count)]
+
+
+def verify_without_cache(request: Request) -> str:
+    """
+    The dependency before tokens are cached, decode and verify the token on every call.
+    """
+    token_data = TokenData.from_jwt(jwt_str=request.cookies.get(auth_conf.JWT_FRONTEND_COOKIE_KEY))
+    token_data.try_verify(['admin'])
+    return token_data.role_name
+
+
+def call_repeatedly(func, request_list: list[Request], calls: int) -> None:
+    for request in itertools.islice(itertools.cycle(request_list), calls):
+        func(request)
+
+
+async def run(size_list: list[int], repeat: int, calls: int) -> dict:
+    require_admin = auth_endpoint.require_role(['admin'])
+    result_list: list[dict] = []
+
+    for size in size_list:
+        request_list = [make_request(jwt_str) for jwt_str in make_token_list(size)]
+
+        # warm up the cache, so that the cached case only measures hits
+        auth_endpoint._token_cache.clear()
+        call_repeatedly(require_admin, request_list, size)
+
+        for case_name, func in [
+            ('require_role[no_cache]', verify_without_cache),
+            ('require_role[cached]', require_admin),
+        ]:
+            timing = await time_case(lambda: call_repeatedly(func, request_list, calls), repeat)
+            logger.info(f'[{size}] {case_name}: {timing["median_s"] / calls * 10 ** 6:.2f}us per request')
+            result_list.append({'size': size, 'case': case_name, 'calls': calls, **timing})
+
+    return {'meta': get_meta_info(), 'results': result_list}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark require_role authentication dependency')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZE_LIST, help='Counts of distinct tokens')
+    parser.add_argument('--repeat', type=int, default=5, help='Times each case is repeated')
+    parser.add_argument('--calls', type=int, default=10000, help='Requests authenticated in each repeat')
+    parser.add_argument('--output', default='benchmark/results/auth.json', help='Path of result JSON file')
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+
+    result = asyncio.run(run(args.sizes, args.repeat, args.calls))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    logger.success(f'Benchmark result written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
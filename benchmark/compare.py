@@ -0,0 +1,49 @@
+"""
+Compare two benchmark result JSON files generated by ``run_benchmark.py``.
+
+Run from project root directory::
+
+    python -m benchmark.compare benchmark/results/old.json benchmark/results/new.json
+"""
+import argparse
+import json
+
+
+def load_median_dict(path: str) -> tuple[dict, dict[tuple[int, str], float]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        result = json.load(f)
+    return result['meta'], {(item['size'], item['case']): item['median_s'] for item in result['results']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark results')
+    parser.add_argument('base', help='Result JSON used as baseline')
+    parser.add_argument('new', help='Result JSON to be compared')
+    parser.add_argument(
+        '--threshold', type=float, default=1.2,
+        help='Ratio of new/base median above which a case is marked as regression')
+    args = parser.parse_args()
+
+    base_meta, base_dict = load_median_dict(args.base)
+    new_meta, new_dict = load_median_dict(args.new)
+    print(f'base: {base_meta.get("commit")}  new: {new_meta.get("commit")}')
+
+    regression_count: int = 0
+    for key in sorted(base_dict.keys() & new_dict.keys()):
+        size, case = key
+        ratio = new_dict[key] / base_dict[key] if base_dict[key] > 0 else float('inf')
+        mark = ''
+        if ratio > args.threshold:
+            mark = '  <-- regression'
+            regression_count += 1
+        print(f'{size:>9} {case:<80} {base_dict[key] * 1000:>10.2f}ms {new_dict[key] * 1000:>10.2f}ms '
+              f'x{ratio:.2f}{mark}')
+
+    for key in sorted(base_dict.keys() ^ new_dict.keys()):
+        print(f'{key[0]:>9} {key[1]:<80} only in {"base" if key in base_dict else "new"}')
+
+    print(f'{regression_count} regression(s) found')
+
+
+if __name__ == '__main__':
+    main()
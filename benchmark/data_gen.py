@@ -0,0 +1,64 @@
+"""
+Synthetic record generator used by benchmarks.
+
+Records imitate a real dorm: one record per collection interval with small jitter, daily usage pattern,
+occasional collection gaps, and top-ups when the balance is running low.
+"""
+import time
+
+import numpy as np
+
+
+def generate_rows(
+        count: int,
+        seed: int = 0,
+        end_timestamp: int | None = None,
+        interval_sec: int = 3600,
+        gap_probability: float = 0.005,
+) -> list[tuple[int, float, float]]:
+    """
+    Generate ``count`` rows of ``(timestamp, light_balance, ac_balance)`` with ascending timestamp.
+
+    Parameters:
+
+    - ``seed`` Random seed, same seed always generates the same rows.
+    - ``end_timestamp`` Timestamp of the last row. Default to current timestamp.
+    - ``interval_sec`` Collection interval in seconds.
+    - ``gap_probability`` Probability that collection stopped for several hours before a row.
+    """
+    if end_timestamp is None:
+        end_timestamp = int(time.time())
+    if count == 0:
+        return []
+
+    rng = np.random.default_rng(seed)
+
+    # timestamp steps with jitter and collection gaps
+    step_arr = interval_sec + rng.integers(-120, 120, count)
+    gap_mask = rng.random(count) < gap_probability
+    step_arr[gap_mask] += rng.integers(2, 48, gap_mask.sum()) * interval_sec
+    # step before each row, the last row is at end timestamp
+    timestamp_arr = end_timestamp - (np.cumsum(step_arr[::-1])[::-1] - step_arr)
+
+    # usage during each step, more usage in the evening
+    hour_arr = (timestamp_arr // 3600 + 8) % 24
+    evening_factor_arr = np.where((hour_arr >= 18) & (hour_arr <= 23), 3.0, 1.0)
+    step_hour_arr = step_arr / 3600
+    light_usage_arr = rng.gamma(2.0, 0.03, count) * evening_factor_arr * step_hour_arr
+    ac_usage_arr = rng.gamma(1.5, 0.1, count) * evening_factor_arr * step_hour_arr
+
+    # accumulate balances, top up when balance is low
+    row_list: list[tuple[int, float, float]] = []
+    light_balance: float = 100.0
+    ac_balance: float = 200.0
+    for timestamp, light_usage, ac_usage in zip(
+            timestamp_arr.tolist(), light_usage_arr.tolist(), ac_usage_arr.tolist()):
+        light_balance -= light_usage
+        ac_balance -= ac_usage
+        if light_balance < 5:
+            light_balance += 50
+        if ac_balance < 10:
+            ac_balance += 100
+        row_list.append((timestamp, round(light_balance, 2), round(ac_balance, 2)))
+
+    return row_list
@@ -0,0 +1,205 @@
+"""
+Benchmark suite for ``provider.database`` and ``provider.algorithms``.
+
+For every data size, a fresh local SQLite database is filled with synthetic records (check out ``data_gen.py``),
+then each benchmark case is timed several times. Results are written to a JSON file, which could be compared
+with the result of another commit using ``compare.py``.
+
+Run from project root directory::
+
+    python -m benchmark.run_benchmark --sizes 1000 10000 100000 1000000 --output benchmark/results/new.json
+"""
+import argparse
+import asyncio
+import functools
+import inspect
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+import numpy as np
+import sqlalchemy
+from loguru import logger
+from sqlalchemy import insert
+
+import config.general
+from provider import database
+from provider import algorithms
+from schema import electric as elec_schema
+from schema import general as gene_schema
+from schema.electric import SQLRecord, RecordBatch
+from schema.sql import SQLBaseModel
+
+from benchmark.data_gen import generate_rows
+
+DEFAULT_SIZE_LIST = [1000, 10000, 100000, 1000000]
+
+INSERT_CHUNK_SIZE = 50000
+
+
+async def prepare_database(db_path: str, row_list: list[tuple[int, float, float]]) -> None:
+    """
+    Create a new SQLite database at ``db_path``, fill it with rows and build usage rollups.
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    engine = database.init_engine(f'sqlite+aiosqlite:///{db_path}', force_create=True)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLBaseModel.metadata.create_all)
+        for chunk_start in range(0, len(row_list), INSERT_CHUNK_SIZE):
+            await conn.execute(insert(SQLRecord), [
+                {'timestamp': timestamp, 'light_balance': light, 'ac_balance': ac}
+                for timestamp, light, ac in row_list[chunk_start:chunk_start + INSERT_CHUNK_SIZE]
+            ])
+
+    await database.rebuild_rollups()
+
+
+def iter_usage_convert_config():
+    """
+    Yield ``(name, config)`` of every combination of the boolean options of ``UsageConvertConfig``.
+    """
+    option_list = ['spreading', 'use_smart_merge', 'smoothing', 'per_hour_usage', 'remove_first_point']
+    for flag_list in itertools.product([True, False], repeat=len(option_list)):
+        option_dict = dict(zip(option_list, flag_list))
+        name = ','.join(option for option, flag in option_dict.items() if flag) or 'none'
+        yield name, elec_schema.UsageConvertConfig(**option_dict)
+
+
+async def time_case(func, repeat: int) -> dict:
+    """
+    Call ``func`` ``repeat`` times and return timing info in seconds. ``func`` could be sync or async.
+    """
+    duration_list: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = func()
+        if inspect.isawaitable(res):
+            await res
+        duration_list.append(time.perf_counter() - start)
+
+    return {
+        'repeat': repeat,
+        'min_s': min(duration_list),
+        'median_s': statistics.median(duration_list),
+        'mean_s': statistics.mean(duration_list),
+    }
+
+
+def iter_cases(first_timestamp: int, last_timestamp: int, record_batch: RecordBatch, include_python: bool):
+    """
+    Yield ``(case_name, func)`` of all benchmark cases.
+    """
+    yield 'get_records_by_time_range', functools.partial(
+        database.get_records_by_time_range, first_timestamp, last_timestamp, usage_convert_config=None)
+
+    for period, period_count in [
+        (gene_schema.PeriodUnit.day, 30),
+        (gene_schema.PeriodUnit.week, 52),
+        (gene_schema.PeriodUnit.month, 24),
+    ]:
+        yield f'period_usage_list[{period.value},{period_count}]', functools.partial(
+            database.period_usage_list, period=period, period_count=period_count)
+
+    yield 'get_statistics', database.get_statistics
+
+    yield 'get_statistics_by_time_range', functools.partial(
+        database.get_statistics_by_time_range, first_timestamp, last_timestamp)
+
+    implementation_list = [('vectorized', True)]
+    if include_python:
+        implementation_list.append(('python', False))
+
+    for (impl_name, vectorized), (config_name, usage_convert_config) in itertools.product(
+            implementation_list, list(iter_usage_convert_config())):
+        yield (
+            f'convert_balance_list_to_usage_list[{impl_name}][{config_name}]',
+            functools.partial(convert_with_impl, record_batch, usage_convert_config, vectorized),
+        )
+
+
+def convert_with_impl(
+        record_batch: RecordBatch,
+        usage_convert_config: elec_schema.UsageConvertConfig,
+        vectorized: bool,
+):
+    original = config.general.USAGE_CONVERT_VECTORIZED
+    config.general.USAGE_CONVERT_VECTORIZED = vectorized
+    try:
+        return algorithms.convert_balance_batch_to_usage_batch(record_batch, usage_convert_config)
+    finally:
+        config.general.USAGE_CONVERT_VECTORIZED = original
+
+
+def get_meta_info() -> dict:
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'commit': commit,
+        'created_at': int(time.time()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'sqlalchemy': sqlalchemy.__version__,
+    }
+
+
+async def run(
+        size_list: list[int],
+        repeat: int,
+        db_path: str,
+        seed: int,
+        include_python: bool,
+) -> dict:
+    result_list: list[dict] = []
+
+    for size in size_list:
+        logger.info(f'Preparing database with {size} records')
+        row_list = generate_rows(size, seed=seed)
+        await prepare_database(db_path, row_list)
+        first_timestamp, last_timestamp = row_list[0][0], row_list[-1][0]
+        record_batch = await database.get_records_by_time_range(first_timestamp, last_timestamp, None)
+
+        for case_name, func in iter_cases(first_timestamp, last_timestamp, record_batch, include_python):
+            timing = await time_case(func, repeat)
+            logger.info(f'[{size}] {case_name}: median {timing["median_s"] * 1000:.2f}ms')
+            result_list.append({'size': size, 'case': case_name, **timing})
+
+        await database.dispose_engine()
+
+    return {'meta': get_meta_info(), 'results': result_list}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark provider.database and provider.algorithms')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZE_LIST, help='Record counts')
+    parser.add_argument('--repeat', type=int, default=5, help='Times each case is repeated')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of synthetic data')
+    parser.add_argument('--db', default='benchmark/results/benchmark.db', help='Path of SQLite database file')
+    parser.add_argument('--output', default='benchmark/results/benchmark.json', help='Path of result JSON file')
+    parser.add_argument(
+        '--include-python', action='store_true',
+        help='Also benchmark the pure Python usage convert implementation, which is slow on large sizes')
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.db) or '.', exist_ok=True)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+
+    result = asyncio.run(run(args.sizes, args.repeat, args.db, args.seed, args.include_python))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    logger.success(f'Benchmark result written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
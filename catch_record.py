@@ -1,28 +1,28 @@
 import asyncio
 from loguru import logger
-from aiohttp import ClientSession
 
 from provider import ahu
 from provider import database
 
-from schema.electric import BalanceRecord
-
 
 async def main():
     await ahu.init_client_session(force_create=True)
 
-    record_dict = await ahu.get_record()
-    logger.info('Record caught from AHU:')
-    logger.info(record_dict)
-    try:
-        record_ins = BalanceRecord(**record_dict)
-        await database.add_record(record_ins)
-        await database.session_maker().close()
-    except Exception as e:
-        logger.error('Failed to add record info into database')
-        logger.exception(e)
+    # catch records of all rooms concurrently
+    for result in await ahu.get_records_of_rooms():
+        if result.record is None:
+            logger.error(f'Failed to catch record of room {result.room_id}: {result.error}')
+            continue
+        logger.info(f'Record of room {result.room_id} caught from AHU:')
+        logger.info(result.record)
+        try:
+            await database.add_record(result.record, room_id=result.room_id)
+        except Exception as e:
+            logger.error(f'Failed to add record info of room {result.room_id} into database')
+            logger.exception(e)
 
     await ahu.aiohttp_session.close()
+    await database.dispose_engine()
 
 
 if __name__ == '__main__':
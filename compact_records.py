@@ -0,0 +1,24 @@
+import argparse
+import asyncio
+
+from loguru import logger
+
+from provider import database
+
+
+async def main(dry_run: bool, room_id: str | None):
+    result = await database.compact_records(dry_run, room_id=room_id)
+    await database.dispose_engine()
+    if dry_run:
+        logger.success(f'Dry run, {result.removed} of {result.scanned} old records could be removed')
+    else:
+        logger.success(f'Old records compacted, {result.removed} of {result.scanned} records removed')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compact old records into representative points of each hour or day')
+    parser.add_argument('--dry-run', action='store_true', help='Only count records could be removed')
+    parser.add_argument('--room-id', default=None, help='Only compact records of this room, default to all rooms')
+    args = parser.parse_args()
+
+    asyncio.run(main(args.dry_run, args.room_id))
@@ -29,5 +29,12 @@ PYJWT_ALGORITHM: str = 'HS256'
 # with unit HOURS.
 TOKEN_EXPIRES_DELTA_HOURS: int = 240
 
+# Max count of verified tokens cached in memory, so that the signature of a token is not verified on every request.
+TOKEN_CACHE_MAX_SIZE: int = 1024
+
+# Cached tokens will be verified again after this time in seconds.
+# Token expiry is checked on every request regardless of this value.
+TOKEN_CACHE_TTL_SECONDS: int = 300
+
 # Controls the cookies key in the frontend to store JWT info.
 JWT_FRONTEND_COOKIE_KEY: str = 'role_info'
@@ -25,8 +25,23 @@ DORM_AC_INFO_DICT = {
     "room": "YOUR_ROOM_HERE"
 }
 
-# This value should not be used directly
-# If you need to use AHU request header, please use ``get_ahu_header()`` function below to get up-to-date header info.
+# Additional rooms to catch records of, besides the default room configured above.
+# Key is room id, which is used to query records of the room through API, e.g. ``?room_id=b3_402``.
+# Value is a dict with the request info of light and AC account of this room, the same format as above::
+#
+#     {
+#         "b3_402": {
+#             "light": {"feeitemid": ..., "room": ...},
+#             "ac": {"feeitemid": ..., "room": ...},
+#         },
+#     }
+#
+# Room id should be at most 64 characters, and ``default`` is reserved for the room configured above.
+DORM_EXTRA_ROOM_DICT: dict[str, dict[str, dict]] = {}
+
+# Deprecated, the backend reads and updates AHU request header using ``provider.ahu_header.header_store``,
+# which never blocks the event loop and writes ``ahu_header.json`` atomically.
+# The value and functions below are only kept for compatibility of scripts using them.
 DORM_REQ_HEADER_DICT: dict | None = None
 
 
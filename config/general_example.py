@@ -27,3 +27,85 @@ POINT_SPREADING_TOLERANCE_MIN: int = 10
 # the duration between two data of backend.
 # this value will be used to calculate the factor when converting usage list to the unit of usage per hour.
 BACKEND_CATCH_TIME_DURATION_MIN: int = 60
+
+# If `True`, use NumPy vectorized implementation when converting balance list to usage list.
+# Result is identical to the pure Python implementation, but much faster when dealing with large record list.
+USAGE_CONVERT_VECTORIZED: bool = True
+
+# max count of entries in the response cache of read endpoints.
+RESPONSE_CACHE_MAX_SIZE: int = 256
+
+# cached response will expire after this time in seconds even if there is no write to database.
+# data written by another process (e.g. catch_record.py launched by cron) will be visible after at most this time.
+RESPONSE_CACHE_TTL_SECONDS: int = 60
+
+# max count of entries in the cache of results calculated from time ranges entirely in the past.
+PAST_RANGE_CACHE_MAX_SIZE: int = 512
+
+# If `True`, converted usage series of ``/info/recent_records`` are cached and extended incrementally when new
+# records arrive, instead of being converted from scratch on every request. The result is the same either way.
+# Check out ``provider/usage_series.py``.
+USAGE_SERIES_CACHE_ENABLED: bool = True
+
+# max count of cached usage series, one for each combination of room, convert config and days.
+USAGE_SERIES_CACHE_MAX_SIZE: int = 64
+
+# record list responses larger than this size in bytes are compressed, if client accepts gzip or brotli.
+# brotli is used only if ``brotli`` package is installed.
+RESPONSE_COMPRESS_MIN_BYTES: int = 1024
+
+# compression level of gzip (1-9) and quality of brotli (0-11). Higher value gives smaller size but costs more CPU.
+RESPONSE_COMPRESS_LEVEL_GZIP: int = 6
+RESPONSE_COMPRESS_LEVEL_BROTLI: int = 5
+
+# If `True`, expose metrics in Prometheus text format at ``/metrics``, including request latency, database queries,
+# AHU requests and usage convert stages. Notice the endpoint requires no authentication.
+METRICS_ENABLED: bool = True
+
+# SQL statements slower than this time in milliseconds are logged and kept in the slow query log,
+# check it out using ``/info/slow_queries``. ``None`` to disable.
+SLOW_QUERY_THRESHOLD_MS: float | None = 200
+
+# max count of the most recent slow queries kept in memory.
+SLOW_QUERY_LOG_MAX_SIZE: int = 100
+
+# If `True`, capture the query plan of slow ``SELECT`` statements by running ``EXPLAIN`` in background.
+SLOW_QUERY_EXPLAIN: bool = True
+
+# max count of records could be added in one bulk insertion request.
+BULK_INSERT_MAX_RECORDS: int = 10000
+
+# Raw records older than these days are compacted into representative points of each day / hour
+# by ``compact_records.py`` or ``/info/compact_records``, usage is preserved. ``None`` to disable that level.
+# Check out docs/usage_calc.md for more info.
+RECORD_COMPACT_DAILY_AFTER_DAYS: int | None = 365
+RECORD_COMPACT_HOURLY_AFTER_DAYS: int | None = 30
+
+# days of records compacted in each transaction.
+RECORD_COMPACT_CHUNK_DAYS: int = 7
+
+# count of records read from database at a time by the streaming record endpoints.
+STREAM_CHUNK_SIZE: int = 1000
+
+# timeout in seconds of a single request to AHU website.
+AHU_REQUEST_TIMEOUT_SEC: float = 10
+
+# max count of retries when request to AHU website timeout or failed with server error.
+AHU_REQUEST_MAX_RETRIES: int = 2
+
+# retry backoff in seconds. The n-th retry waits a random time between 0 and min(BASE * 2^n, MAX).
+AHU_RETRY_BACKOFF_BASE_SEC: float = 0.5
+AHU_RETRY_BACKOFF_MAX_SEC: float = 5
+
+# max count of requests sent to AHU website at the same time when catching records of multiple rooms.
+AHU_MAX_CONCURRENT_REQUESTS: int = 4
+
+# If `True`, backend catches records from AHU website by itself, and there is no need to run catch_record.py by cron.
+# Do NOT enable it if catch_record.py is still scheduled, otherwise records will be caught twice.
+COLLECTOR_ENABLED: bool = False
+
+# interval in seconds between two records caught by collector.
+COLLECTOR_INTERVAL_SEC: int = 3600
+
+# max random delay in seconds added to each collection.
+COLLECTOR_JITTER_SEC: int = 30
@@ -2,3 +2,25 @@ DB_HOST: str = "YOUR_HOST_HERE"
 DB_NAME: str = "YOUR_DB_NAME_HERE"
 DB_USERNAME: str = "YOUR_DB_USERNAME_HERE"
 DB_PASSWORD: str = "YOUR_DB_PASSWORD_HERE"
+
+# Database backend, could be:
+# - "mysql" Use MySQL through aiomysql, with the host, name and credentials above.
+# - "sqlite" Use a local SQLite file through aiosqlite, suitable for small or test deployments.
+DB_BACKEND: str = "mysql"
+
+# Path of SQLite database file, only used when DB_BACKEND is "sqlite".
+SQLITE_PATH: str = "data/ahu_elec_watch.db"
+
+# If not None, use this SQLAlchemy URL directly, all the options above will be ignored.
+DB_URL: str | None = None
+
+# Connection pool configs, not used by SQLite backend.
+# DB_POOL_SIZE connections will be opened when backend starts.
+DB_POOL_SIZE: int = 5
+DB_POOL_MAX_OVERFLOW: int = 10
+# recycle connections after this time in seconds, should be less than MySQL wait_timeout.
+DB_POOL_RECYCLE_SEC: int = 3600
+# test connections before using them, avoid errors caused by connections closed by server.
+DB_POOL_PRE_PING: bool = True
+# max time in seconds waiting for a connection from pool.
+DB_POOL_TIMEOUT_SEC: int = 30
@@ -5,9 +5,10 @@ from schema.electric import SQLBaseModel
 
 
 async def init_models():
-    async with database._engine.begin() as session:
+    async with database.get_engine().begin() as session:
         await session.run_sync(SQLBaseModel.metadata.drop_all)
         await session.run_sync(SQLBaseModel.metadata.create_all)
+    await database.dispose_engine()
 
 
 if __name__ == '__main__':
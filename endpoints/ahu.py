@@ -8,17 +8,19 @@ import jwt
 from fastapi import APIRouter, Query, Depends, Request, Response, Body
 
 import provider.ahu
-from config import dorm as dorm_config
+from provider import ahu_header
+from provider import collector
 from endpoints import auth as auth_endpoint
 from schema import ahu as ahu_schema
 from schema import electric as elec_schema
+from exception import error as exc
 
 ahu_router = APIRouter()
 
 
 @ahu_router.get('/header_info', response_model=ahu_schema.AHUHeaderInfo)
 async def get_ahu_header_info(role=Depends(auth_endpoint.require_role(['admin']))):
-    return ahu_schema.AHUHeaderInfo.from_dict(dorm_config.get_ahu_header(force_load_from_file=True))
+    return ahu_schema.AHUHeaderInfo.from_dict(await ahu_header.header_store.get())
 
 
 @ahu_router.post('/set_header_info', response_model=ahu_schema.AHUHeaderInfo)
@@ -26,8 +28,7 @@ async def set_ahu_header_info(
         url_str: str = Body(),
         role=Depends(auth_endpoint.require_role(['admin'])),
 ):
-    dorm_config.update_ahu_header(url_str=url_str, clear_cache=True)
-    return ahu_schema.AHUHeaderInfo.from_dict(dorm_config.get_ahu_header(force_load_from_file=True))
+    return ahu_schema.AHUHeaderInfo.from_dict(await ahu_header.header_store.update_token_from_url(url_str))
 
 
 class CatchRecordResponse(BaseModel):
@@ -36,13 +37,25 @@ class CatchRecordResponse(BaseModel):
 
     - ``record`` The record retrieved from AHU website.
     - ``latency_ms`` Request latency between backend server and AHU website. In milliseconds unit.
+    - ``request_timings`` Timing info of each sub-request to AHU website. Sub-requests are performed concurrently.
     """
     record: elec_schema.BalanceRecord
     latency_ms: int
+    request_timings: list[ahu_schema.AHURequestTiming]
+
+
+@ahu_router.get('/rooms', response_model=list[str])
+async def get_room_list():
+    """
+    Get IDs of all rooms that records are caught of. The default room comes first.
+
+    Room ID could be passed to ``room_id`` parameter of info endpoints to get records of that room.
+    """
+    return list(provider.ahu.get_room_dict().keys())
 
 
 @ahu_router.get('/catch_record', tags=['Test', 'Records'], response_model=CatchRecordResponse)
-async def catch_record_from_ahu(dry_run: bool = True):
+async def catch_record_from_ahu(dry_run: bool = True, room_id: str = elec_schema.DEFAULT_ROOM_ID):
     """
     Directly catch records from AHU website.
 
@@ -54,22 +67,51 @@ async def catch_record_from_ahu(dry_run: bool = True):
         - If `True`, only try to catch records and returns info to frontend,
         will NOT update database.
         - If `false`, means catch records, return info, then add record to database.
+    - `room_id` The room to catch record of. Check out ``/ahu/rooms`` for available rooms.
 
     Returns:
 
     - ``latency_ms`` The time consumed for requesting data from AHU website and pydantic validation.
     The database operation when `dry_run=False` is not included in this field.
+    - ``request_timings`` Timing of the light and AC sub-requests, including the latency of every retry attempt.
 
     """
+    room = provider.ahu.get_room(room_id)
     start_req = time.time()
-    record_info: elec_schema.BalanceRecord = elec_schema.BalanceRecord.from_info_dict(await provider.ahu.get_record())
+    record_dict, request_timings = await provider.ahu.get_record_with_timings(room)
+    record_info: elec_schema.BalanceRecord = elec_schema.BalanceRecord.from_info_dict(record_dict)
     duration = time.time() - start_req
     latency_ms: int = int(duration * (10 ** 3))
 
     if not dry_run:
-        await provider.database.add_record(record_info=record_info)
+        await provider.database.add_record(record_info=record_info, room_id=room_id)
 
     return CatchRecordResponse(
         record=record_info,
         latency_ms=latency_ms,
+        request_timings=request_timings,
     )
+
+
+@ahu_router.get('/collector_status', tags=['Records'], response_model=ahu_schema.CollectorStatusOut)
+async def get_collector_status():
+    """
+    Get status of the resident record collector, including last success, last error and latency info.
+
+    Check ``healthy`` field to find out if records are being caught normally.
+    """
+    return collector.collector.get_status()
+
+
+@ahu_router.post('/collector/run', tags=['Records'], response_model=ahu_schema.CollectorStatusOut)
+async def run_collector_once(role=Depends(auth_endpoint.require_role(['admin']))):
+    """
+    Immediately catch records of all rooms using the collector, regardless of schedule.
+    Returns collector status afterward.
+
+    Raise ``CollectorBusyError`` (409) if a scheduled or manual collection is in progress.
+    """
+    if collector.collector.collecting:
+        raise exc.CollectorBusyError()
+    await collector.collector.collect_once()
+    return collector.collector.get_status()
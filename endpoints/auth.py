@@ -25,10 +25,46 @@ from config import auth as auth_conf
 from config import general as gene_conf
 from exception import error as exc
 
+from provider.cache import LRUCache
 from schema.auth import TokenData
 
 auth_router = APIRouter()
 
+# cache of verified tokens, token string -> ``TokenData``.
+# expiry and role are still checked by ``TokenData.try_verify()`` on every request.
+_token_cache = LRUCache(
+    max_size=auth_conf.TOKEN_CACHE_MAX_SIZE,
+    ttl_seconds=auth_conf.TOKEN_CACHE_TTL_SECONDS,
+)
+
+# the secret key and algorithm that the cached tokens are verified with
+_token_cache_secret: tuple[str, str] | None = None
+
+
+def decode_token(jwt_str: str) -> TokenData:
+    """
+    Return the ``TokenData`` of a JWT string, using the cache of verified tokens.
+
+    Only tokens with valid signature are cached, decoding errors are raised every time.
+    All cached tokens are dropped once ``PYJWT_SECRET_KEY`` or ``PYJWT_ALGORITHM`` changes,
+    so that tokens signed with the old secret must be verified again.
+    """
+    global _token_cache_secret
+    secret = (auth_conf.PYJWT_SECRET_KEY, auth_conf.PYJWT_ALGORITHM)
+    if secret != _token_cache_secret:
+        _token_cache.clear()
+        _token_cache_secret = secret
+
+    hit, token_data = _token_cache.get(jwt_str)
+    if hit:
+        return token_data
+
+    token_data = TokenData.from_jwt(jwt_str=jwt_str)
+    # no need to keep the tokens that have already expired
+    if time.time() <= token_data.created_at + auth_conf.TOKEN_EXPIRES_DELTA_HOURS * 3600:
+        _token_cache.set(jwt_str, token_data)
+    return token_data
+
 
 def auth_and_gen_jwt(role_need_to_auth: auth_conf.RoleInfo) -> str:
     """
@@ -97,7 +133,7 @@ def require_role(
             raise exc.TokenError(no_token=True)
 
         # convert jwt string to token data
-        token_data = TokenData.from_jwt(jwt_str=jwt_str)
+        token_data = decode_token(jwt_str)
         token_data.try_verify(role_list)
         return token_data.role_name
 
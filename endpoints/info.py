@@ -1,17 +1,28 @@
+import gzip
 import time
 from enum import Enum
-from typing import Annotated, Optional
+from typing import Annotated, Optional, AsyncIterator
 
-from fastapi import APIRouter, Query, Body, Depends
+import orjson
+from fastapi import APIRouter, Query, Body, Depends, Request, Response, HTTPException, Header
+from fastapi.responses import StreamingResponse
+
+try:
+    import brotli
+except ImportError:
+    # brotli is optional, only gzip is used if not installed
+    brotli = None
 
 import config.general
 from provider.database import add_record, get_record_count
 from provider import database as provider_db
+from provider import cache
+from provider import slow_query
 from schema.electric import Statistics, BalanceRecord
-from schema.electric import BalanceRecord
+from schema.electric import RecordBatch
 from schema import electric as elec_schema
 from schema import general as gene_schema
-from schema.sql import PaginationConfig
+from schema.sql import PaginationConfig, KeysetPaginationConfig
 from endpoints.auth import require_role
 
 from exception import error as exc
@@ -20,6 +31,153 @@ from exception import error as exc
 # Notice that this router actually do NOT add any prefix
 infoRouter = APIRouter()
 
+# query parameter used to select the room of records, records of the default room are used if omitted
+RoomIdQuery = Annotated[str, Query(min_length=1, max_length=elec_schema.ROOM_ID_MAX_LENGTH)]
+
+# ``Accept-Encoding`` request header, used to negotiate compression of large responses
+AcceptEncodingHeader = Annotated[str | None, Header(include_in_schema=False)]
+
+
+def conditional_get(time_dependent: bool = False):
+    """
+    A dependency function generator used to support conditional GET of read endpoints.
+
+    The generated dependency function computes an ETag from the data version, the latest record timestamp of the
+    requested room and the request URL. If it matches ``If-None-Match`` request header, ``304 Not Modified`` is
+    returned before the endpoint runs any heavy query. Otherwise, the ETag is added to the response headers.
+
+    :param time_dependent: If `true`, the response also changes with time even if no record is written,
+        e.g. statistics of trailing windows. Then current time is included in ETag, rounded down to
+        ``RESPONSE_CACHE_TTL_SECONDS``.
+
+    Notice:
+
+    - Records deleted by other processes (not through this backend) do not change the ETag, since only the latest
+      timestamp is checked. Such change becomes visible after this backend restarts, or any record is written.
+    """
+
+    async def generated_conditional_get_func(request: Request, response: Response):
+        room_id = request.query_params.get('room_id', elec_schema.DEFAULT_ROOM_ID)
+        latest_timestamp = await provider_db.get_latest_record_timestamp(room_id)
+        time_bucket: int | None = None
+        if time_dependent:
+            time_bucket = int(time.time() // config.general.RESPONSE_CACHE_TTL_SECONDS)
+
+        etag = cache.make_etag(request.url.path, request.url.query, latest_timestamp, time_bucket)
+        header_dict = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if cache.etag_matches(request.headers.get('if-none-match'), etag):
+            raise HTTPException(status_code=304, headers=header_dict)
+        response.headers.update(header_dict)
+
+    return generated_conditional_get_func
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """
+    Choose the content encoding of response from ``Accept-Encoding`` request header.
+    Returns ``br``, ``gzip`` or ``None``. Brotli is preferred if ``brotli`` package is installed.
+    """
+    if not accept_encoding:
+        return None
+
+    accepted_set: set[str] = set()
+    for item in accept_encoding.split(','):
+        name, _, param = item.strip().partition(';')
+        param = param.strip()
+        # skip encodings with q=0
+        if param.startswith('q='):
+            try:
+                if float(param[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted_set.add(name.strip().lower())
+
+    if brotli is not None and 'br' in accepted_set:
+        return 'br'
+    if 'gzip' in accepted_set:
+        return 'gzip'
+    return None
+
+
+def compressed_json_response(body: bytes, accept_encoding: str | None) -> Response:
+    """
+    Create a JSON ``Response`` of encoded ``body``, compressed with negotiated encoding if
+    it's larger than ``RESPONSE_COMPRESS_MIN_BYTES``.
+    """
+    header_dict = {'Vary': 'Accept-Encoding'}
+    encoding = None
+    if len(body) >= config.general.RESPONSE_COMPRESS_MIN_BYTES:
+        encoding = negotiate_encoding(accept_encoding)
+
+    if encoding == 'br':
+        body = brotli.compress(body, quality=config.general.RESPONSE_COMPRESS_LEVEL_BROTLI)
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=config.general.RESPONSE_COMPRESS_LEVEL_GZIP)
+    if encoding is not None:
+        header_dict['Content-Encoding'] = encoding
+
+    return Response(content=body, media_type='application/json', headers=header_dict)
+
+
+def record_batch_to_dict_list(record_batch: RecordBatch) -> list[dict]:
+    """
+    Convert records in batch to dicts with the same fields as ``BalanceRecord``, which could be encoded by ``orjson``.
+    """
+    return [
+        {'timestamp': timestamp, 'light_balance': light, 'ac_balance': ac}
+        for timestamp, light, ac in zip(
+            record_batch.timestamp.astype(float).tolist(),
+            record_batch.light_balance.tolist(),
+            record_batch.ac_balance.tolist(),
+        )
+    ]
+
+
+def record_list_response(record_batch: RecordBatch, accept_encoding: str | None) -> Response:
+    """
+    Fast path of returning a list of records. The fields of each record are the same as ``BalanceRecord``.
+
+    Records in batch are encoded to JSON directly using ``orjson``, without creating ``BalanceRecord`` models and
+    validating them again against ``response_model``. Values are passed as they are, round the batch before if
+    needed.
+    """
+    body = orjson.dumps(record_batch_to_dict_list(record_batch))
+    return compressed_json_response(body, accept_encoding)
+
+
+def record_stream_response(
+        batch_iter: AsyncIterator[RecordBatch],
+        stream_format: gene_schema.StreamFormat,
+) -> StreamingResponse:
+    """
+    Create a ``StreamingResponse`` sending records of the batches in ``batch_iter`` with the required format.
+    The fields of each record are the same as ``BalanceRecord``.
+    """
+
+    def dump_batch(record_batch: RecordBatch) -> list[bytes]:
+        # encoded the same way as ``record_list_response()``
+        return [orjson.dumps(record_dict) for record_dict in record_batch_to_dict_list(record_batch)]
+
+    async def iter_ndjson():
+        async for record_batch in batch_iter:
+            yield b''.join(line + b'\n' for line in dump_batch(record_batch))
+
+    async def iter_json():
+        is_first: bool = True
+        yield b'['
+        async for record_batch in batch_iter:
+            line_list = dump_batch(record_batch)
+            if not line_list:
+                continue
+            yield (b'' if is_first else b',') + b','.join(line_list)
+            is_first = False
+        yield b']'
+
+    if stream_format == gene_schema.StreamFormat.ndjson:
+        return StreamingResponse(iter_ndjson(), media_type='application/x-ndjson')
+    return StreamingResponse(iter_json(), media_type='application/json')
+
 
 @infoRouter.get('/api_info', response_model=gene_schema.BackendInfoOut)
 def get_backend_endpoint_version():
@@ -29,13 +187,70 @@ def get_backend_endpoint_version():
     )
 
 
-@infoRouter.get('/statistics', response_model=Statistics, tags=['Statistics'])
-async def get_electrical_usage_statistic():
-    return await provider_db.get_statistics()
+@infoRouter.get('/cache_info', response_model=gene_schema.CacheInfoOut)
+async def get_cache_info():
+    """
+    Return the size, hit and miss counters of the response cache of read endpoints.
+    """
+    return cache.get_cache_info()
+
+
+@infoRouter.get('/slow_queries', response_model=list[gene_schema.SlowQueryOut])
+async def get_slow_queries(
+        role: Annotated[str, Depends(require_role(['admin']))],
+        limit: Annotated[int, Query(ge=1)] = 20,
+):
+    """
+    Get the most recent SQL statements slower than ``SLOW_QUERY_THRESHOLD_MS``, the latest comes first.
+
+    Each item contains the statement, parameters, duration, the provider function executed it, and the
+    ``EXPLAIN`` result of ``SELECT`` statements, which is captured in background and may be missing for a moment.
+    """
+    return slow_query.get_slow_queries(limit)
+
+
+@infoRouter.get(
+    '/statistics',
+    response_model=Statistics,
+    tags=['Statistics'],
+    dependencies=[Depends(conditional_get(time_dependent=True))])
+async def get_electrical_usage_statistic(room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID):
+    """
+    Usage of the last day and the last week. Shortcut of ``/statistics/windows`` with ``1d`` and ``7d`` windows.
+    """
+    return await provider_db.get_statistics(room_id=room_id)
+
+
+@infoRouter.get(
+    '/statistics/windows',
+    response_model=elec_schema.MultiWindowStatisticsOut,
+    tags=['Statistics'],
+    dependencies=[Depends(conditional_get(time_dependent=True))])
+async def get_multi_window_statistics(
+        windows: Annotated[list[str], Query(min_length=1, max_length=16)] = ['1d', '7d', '30d'],
+        room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID,
+):
+    """
+    Usage statistics of multiple trailing windows ending at current time, calculated from a single scan of records.
+
+    Parameters:
+
+    - ``windows`` Trailing windows, a positive integer followed by unit ``h`` (hour), ``d`` (day) or ``w`` (week).
+      e.g. ``?windows=1d&windows=7d&windows=30d``. At most 16 windows in a request.
+
+    Returns:
+
+    - Statistics of each window, in the same order as ``windows``.
+    """
+    return await provider_db.get_multi_window_statistics(windows, room_id=room_id)
 
 
 @infoRouter.post('/add_record', tags=['Records'])
-async def add_new_record(new_record: BalanceRecord, use_current_timestamp: bool = False):
+async def add_new_record(
+        new_record: BalanceRecord,
+        use_current_timestamp: bool = False,
+        room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID,
+):
     """
     Add a record into database.
 
@@ -43,42 +258,110 @@ async def add_new_record(new_record: BalanceRecord, use_current_timestamp: bool
 
     :param new_record: Record need to be added into database.
     :param use_current_timestamp: If `true`, use current timestamp.
+    :param room_id: The room this record belongs to.
     :return:
     """
     # Override timestamp if needed
     if use_current_timestamp or new_record.timestamp < 0:
         new_record.timestamp = time.time()
-    await add_record(new_record)
+    await add_record(new_record, room_id=room_id)
 
 
-@infoRouter.get('/record_count', response_model=elec_schema.CountInfoOut, tags=['Records', 'Statistics'])
-async def record_count():
-    return await get_record_count()
+@infoRouter.post('/add_records_bulk', tags=['Records'], response_model=elec_schema.BulkInsertResultOut)
+async def add_records_bulk(
+        record_list: list[BalanceRecord],
+        role: Annotated[str, Depends(require_role(['admin']))],
+        overwrite: bool = True,
+        room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID,
+):
+    """
+    Add a list of records into database in one transaction. Used to backfill history from other sources.
+
+    Parameters:
+
+    - ``record_list`` Records need to be added. Timestamps must be valid UNIX timestamps.
+    - ``overwrite`` If `true`, balances of existing records with the same timestamp will be overwritten.
+      Otherwise existing records are kept and counted as skipped.
+    - ``room_id`` The room these records belong to.
+
+    Returns:
+
+    - Count of inserted, updated and skipped records.
+    """
+    return await provider_db.add_records_bulk(record_list, overwrite=overwrite, room_id=room_id)
+
+
+@infoRouter.get(
+    '/record_count',
+    response_model=elec_schema.CountInfoOut,
+    tags=['Records', 'Statistics'],
+    dependencies=[Depends(conditional_get(time_dependent=True))])
+async def record_count(room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID):
+    return await get_record_count(room_id=room_id)
 
 
 @infoRouter.post(
     '/records',
     response_model=list[BalanceRecord],
     tags=['Records'])
-async def get_records_by_pagination(pagination: PaginationConfig):
-    return await provider_db.get_records(pagination)
+@cache.cached_response
+async def get_records_by_pagination(
+        pagination: PaginationConfig,
+        room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID,
+        accept_encoding: AcceptEncodingHeader = None,
+):
+    return record_list_response(await provider_db.get_records(pagination, room_id=room_id), accept_encoding)
+
+
+@infoRouter.get('/records/cursor', response_model=elec_schema.RecordPageOut, tags=['Records'])
+@cache.cached_response
+async def get_records_by_cursor(
+        size: Annotated[int, Query(ge=1, le=1000)] = 20,
+        cursor: str | None = None,
+        room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID,
+):
+    """
+    Get records with cursor based pagination, the latest record comes first.
+
+    Parameters:
+
+    - ``size`` How many records in a page.
+    - ``cursor`` Pass ``next_cursor`` or ``prev_cursor`` of the current page to get the older or newer page.
+      Omit it to get the latest page.
+
+    Returns:
+
+    - Records of the page, with cursors of the adjacent pages. Cursor is ``None`` if no more records in that direction.
+
+    Compared to ``/records``, getting a deep page is as fast as getting the first one.
+    """
+    return await provider_db.get_records_by_cursor(KeysetPaginationConfig(size=size, cursor=cursor), room_id=room_id)
 
 
-@infoRouter.get('/latest_record', tags=['Records'], response_model=BalanceRecord)
-async def get_lastest_record():
+@infoRouter.get(
+    '/latest_record',
+    tags=['Records'],
+    response_model=BalanceRecord,
+    dependencies=[Depends(conditional_get())])
+@cache.cached_response
+async def get_lastest_record(room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID):
     res = await provider_db.get_records(
-        pagination=PaginationConfig(size=1, index=0)
+        pagination=PaginationConfig(size=1, index=0),
+        room_id=room_id,
     )
     if len(res) == 0:
         raise exc.NoResultError('No record found in database.')
 
-    return res[0]
+    return res.to_record_list()[0]
 
 
 @infoRouter.post('/recent_records', tags=['Records'], response_model=list[BalanceRecord])
 async def get_recent_days_records(
         days: Annotated[int, Body(ge=1)] = 7,
-        usage_convert_config: elec_schema.UsageConvertConfig | None = None):
+        usage_convert_config: elec_schema.UsageConvertConfig | None = None,
+        max_points: Annotated[int | None, Query(ge=3)] = None,
+        room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID,
+        accept_encoding: AcceptEncodingHeader = None):
     """
     Here days actually has been converted to timstamp. That means the earliest limit is set by
     calculating time offset but not using natural day as limit.
@@ -87,19 +370,54 @@ async def get_recent_days_records(
 
     - days: The days back you want to get records start from.
     - usage_convert_config: If NOT None, convert balance list to usage list using this config.
+    - max_points: If NOT None, downsample the result to at most this count of points, e.g. the pixel width of chart.
+    - room_id: The room to get records of.
 
     Notice: For more info about usage convert config, check out Model `UsageConvertConfig`
     """
-    return await provider_db.get_recent_records(days, usage_convert_config=usage_convert_config)
+    record_batch = await provider_db.get_recent_records(
+        days,
+        usage_convert_config=usage_convert_config,
+        max_points=max_points,
+        room_id=room_id,
+    )
+    return record_list_response(record_batch, accept_encoding)
+
+
+@infoRouter.post('/recent_records/stream', tags=['Records'])
+async def stream_recent_days_records(
+        days: Annotated[int, Body(ge=1)] = 7,
+        usage_convert_config: elec_schema.UsageConvertConfig | None = None,
+        stream_format: gene_schema.StreamFormat = gene_schema.StreamFormat.ndjson,
+        room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID,
+):
+    """
+    Streaming version of ``/recent_records``, records are sent while being read from database.
+    Recommended when requesting a long time range.
+
+    Parameters:
+
+    - ``stream_format`` ``ndjson`` to send one record per line, ``json`` to send a JSON array.
+    - Others are the same as ``/recent_records``.
+    """
+    batch_iter = await provider_db.stream_records_by_time_range(
+        start_time=int(time.time()) - days * 24 * 60 * 60,
+        end_time=None,
+        usage_convert_config=usage_convert_config,
+        room_id=room_id,
+    )
+    return record_stream_response(batch_iter, stream_format)
 
 
 @infoRouter.get(
     '/daily_usage',
     response_model=list[elec_schema.PeriodUsageInfoOut],
-    tags=['Statistics'], )
+    tags=['Statistics'],
+    dependencies=[Depends(conditional_get(time_dependent=True))])
 async def get_daily_usage(
         days: Annotated[int, Query(ge=1)] = 7,
         recent_on_top: Annotated[bool, Query()] = True,
+        room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID,
 ):
     """
     Parameters:
@@ -107,31 +425,43 @@ async def get_daily_usage(
     - ``days``: The number of days you want to calculate usage statistics. Back starting from today.
     - ``recent_on_top``: If ``true``, then the day closest to today will at the first place of the return list.
     """
-    return await provider_db.daily_usage_list(days=days, recent_on_top=recent_on_top)
+    return await provider_db.period_usage_list(
+        period=gene_schema.PeriodUnit.day,
+        period_count=days,
+        recent_on_top=recent_on_top,
+        room_id=room_id,
+    )
 
 
 @infoRouter.get(
     '/period_usage',
     response_model=list[elec_schema.PeriodUsageInfoOut],
     tags=['Statistics'],
+    dependencies=[Depends(conditional_get(time_dependent=True))],
 )
 async def get_period_usage(
         period: gene_schema.PeriodUnit,
         period_count: int,
         recent_on_top: bool = True,
+        room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID,
 ):
     return await provider_db.period_usage_list(
         period=period,
         period_count=period_count,
         recent_on_top=recent_on_top,
+        room_id=room_id,
     )
 
 
-@infoRouter.post('/get_records_by_time_range', tags=['Records'])
+@infoRouter.post('/get_records_by_time_range', tags=['Records'], response_model=list[BalanceRecord])
+@cache.cached_response(open_end_param='end_time')
 async def get_records_by_time_range(
         start_time: int,
         end_time: int | None = None,
         usage_convert_config: Annotated[elec_schema.UsageConvertConfig, Body(embed=True)] = None,
+        max_points: Annotated[int | None, Query(ge=3)] = None,
+        room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID,
+        accept_encoding: AcceptEncodingHeader = None,
 ):
     """
     Get all records info in a specific time range.
@@ -140,6 +470,9 @@ async def get_records_by_time_range(
 
     - ``start_time`` : Specified the start timestamp.
     - ``end_time``: Specified the end timestamp. If `None`, will be current timestamp.
+    - ``max_points``: If NOT `None`, downsample the result to at most this count of points using LTTB algorithm.
+      When ``usage_convert_config`` is provided, total usage is kept.
+    - ``room_id``: The room to get records of. Default to the room configured in ``config/dorm.py``.
 
     Returns:
     - List of records/usage info.
@@ -147,7 +480,36 @@ async def get_records_by_time_range(
     """
     if end_time is None:
         end_time = time.time()
-    return await provider_db.get_records_by_time_range(start_time, end_time, usage_convert_config)
+    record_batch = await provider_db.get_records_by_time_range(
+        start_time,
+        end_time,
+        usage_convert_config,
+        max_points=max_points,
+        room_id=room_id,
+    )
+    return record_list_response(record_batch, accept_encoding)
+
+
+@infoRouter.post('/get_records_by_time_range/stream', tags=['Records'])
+async def stream_records_by_time_range(
+        start_time: int,
+        end_time: int | None = None,
+        usage_convert_config: Annotated[elec_schema.UsageConvertConfig, Body(embed=True)] = None,
+        stream_format: gene_schema.StreamFormat = gene_schema.StreamFormat.ndjson,
+        room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID,
+):
+    """
+    Streaming version of ``/get_records_by_time_range``, records are sent while being read from database,
+    so that exporting a long time range will not hold all records in memory.
+
+    Parameters:
+
+    - ``stream_format`` ``ndjson`` to send one record per line, ``json`` to send a JSON array.
+    - Others are the same as ``/get_records_by_time_range``.
+    """
+    batch_iter = await provider_db.stream_records_by_time_range(
+        start_time, end_time, usage_convert_config, room_id=room_id)
+    return record_stream_response(batch_iter, stream_format)
 
 
 @infoRouter.get('/delete_records_by_time_range', tags=['Records'])
@@ -156,6 +518,8 @@ async def delete_records_by_time_range(
         end_time: int,
         role: Annotated[str, Depends(require_role(['admin']))],
         dry_run: bool = False,
+        chunk_size: Annotated[int | None, Query(gt=0)] = None,
+        room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID,
 ) -> int:
     """
     Remove records from database with specific time range [start, end] (Notice that end time included in range)
@@ -165,6 +529,9 @@ async def delete_records_by_time_range(
     - ``start`` UNIX timestamp of the start time range.
     - ``end`` UNIX timestamp of the end time range.
     - ``dry_run`` If `True`, will only test the affected records count, and will NOT delete the records.
+    - ``chunk_size`` If set, delete records in batches of at most this count, each in a separate transaction.
+      Recommended when removing a large time range.
+    - ``room_id`` Only records of this room are removed.
 
     Returns:
 
@@ -174,9 +541,75 @@ async def delete_records_by_time_range(
         start_time,
         end_time,
         dry_run,
+        chunk_size,
+        room_id=room_id,
     )
 
 
+@infoRouter.get('/compact_records', tags=['Records'], response_model=elec_schema.CompactionResultOut)
+async def compact_records(
+        role: Annotated[str, Depends(require_role(['admin']))],
+        dry_run: bool = False,
+        room_id: Annotated[str | None, Query(min_length=1, max_length=elec_schema.ROOM_ID_MAX_LENGTH)] = None,
+):
+    """
+    Compact old records into representative points of each hour or day, based on the retention ages in general config.
+    Usage of any time range is preserved, check out docs/usage_calc.md for more info.
+
+    Params:
+
+    - ``dry_run`` If `True`, will only count the records could be removed, and will NOT remove them.
+    - ``room_id`` Only records of this room are compacted. Records of all rooms are compacted if not provided.
+    """
+    return await provider_db.compact_records(dry_run, room_id=room_id)
+
+
 @infoRouter.get('/statistics/time_range', tags=['Statistics'], response_model=elec_schema.TimeRangeStatistics)
-async def get_statistics_of_specific_time_range(start_time: int, end_time: int | None = None):
-    return await provider_db.get_statistics_by_time_range(start_time, end_time)
+@cache.cached_response(open_end_param='end_time')
+async def get_statistics_of_specific_time_range(
+        start_time: int,
+        end_time: int | None = None,
+        room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID,
+):
+    """
+    Get total and average usage of a time range, calculated from usage rollups.
+
+    Parameters:
+
+    - ``start_time`` ``end_time`` The time range. If ``end_time`` is `None`, default to current timestamp.
+
+    Notice:
+
+    - ``start_timestamp`` and ``end_timestamp`` are the timestamps of the first and last record in range, and
+      averages are calculated over the time between them. Before usage rollups were added, they were the first and
+      last point of the usage list converted with spreading and smart merge, which could be later than the first
+      record.
+    - ``point_used`` is the count of records in range.
+    """
+    return await provider_db.get_statistics_by_time_range(start_time, end_time, room_id=room_id)
+
+
+@infoRouter.get('/analytics/time_range', tags=['Statistics'], response_model=elec_schema.TimeRangeAnalyticsOut)
+@cache.cached_response(open_end_param='end_time')
+async def get_time_range_analytics(
+        start_time: int,
+        end_time: int | None = None,
+        percentiles: Annotated[list[float], Query(max_length=16)] = [50, 90, 99],
+        room_id: RoomIdQuery = elec_schema.DEFAULT_ROOM_ID,
+):
+    """
+    Get analytics of records in a time range, including total and average usage, peak hour, percentiles of
+    hourly usage, top-ups and coverage of records.
+
+    Parameters:
+
+    - ``start_time`` ``end_time`` The time range. If ``end_time`` is `None`, default to current timestamp.
+    - ``percentiles`` Percentiles of hourly usage to calculate, each between 0 and 100,
+      e.g. ``?percentiles=50&percentiles=95``.
+
+    Notice:
+
+    - If there is no record in range, usage fields are zero and ``coverage_ratio`` is 0.
+    """
+    return await provider_db.get_time_range_analytics(start_time, end_time, percentiles, room_id=room_id)
+
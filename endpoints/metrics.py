@@ -0,0 +1,74 @@
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from provider import metrics
+
+metrics_router = APIRouter()
+
+
+def get_route_label(scope) -> str:
+    """
+    Return the route template of a request, e.g. ``/info/records``, or ``unmatched`` if no route matched.
+    """
+    # route is set into scope by router when matched
+    route = scope.get('route')
+    route_path: str | None = getattr(route, 'path_format', None) or getattr(route, 'path', None)
+    if route_path is None:
+        return 'unmatched'
+
+    # routes of included routers may only contain the path relative to the router prefix,
+    # in which case the prefix segments are taken from the request path
+    prefix_count = scope['path'].rstrip('/').count('/') - route_path.rstrip('/').count('/')
+    if prefix_count > 0:
+        return '/'.join(scope['path'].split('/')[:prefix_count + 1]) + route_path
+    return route_path
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording the latency of every HTTP request to ``http_request_duration_seconds``.
+
+    Requests are labeled by the route template (e.g. ``/info/records``) instead of the real path, so that the count
+    of label values is bounded. Requests not matching any route are labeled as ``unmatched``.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code: int = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.http_request_duration_seconds.observe(
+                time.perf_counter() - start_time, scope['method'], get_route_label(scope), str(status_code))
+
+
+@metrics_router.get('/metrics', tags=['Metrics'], response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Get metrics of this backend process in Prometheus text exposition format. Could be scraped by Prometheus directly.
+
+    Including:
+
+    - ``http_request_duration_seconds`` Latency histogram of each route.
+    - ``db_query_duration_seconds`` ``db_query_errors_total`` Count and duration of SQL statements.
+    - ``db_pool_connections`` Connections of database pool, by state.
+    - ``ahu_request_duration_seconds`` ``ahu_request_errors_total`` Latency and errors of requests to AHU website.
+    - ``usage_convert_stage_duration_seconds`` Duration of each stage of usage convert.
+    """
+    return PlainTextResponse(metrics.registry.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
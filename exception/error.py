@@ -170,3 +170,29 @@ class AHUInfoParseError(BaseError):
                     f'Received text info is: {received_text_info}',
             status=404,
         )
+
+
+class AHURequestError(BaseError):
+    """
+    Raise when request to AHU website still failed after all retries, e.g. timeout or server error.
+    """
+
+    def __init__(self, request_name: str, attempts: int, reason: str):
+        super().__init__(
+            name='ahu_request_error',
+            message=f'Failed to request {request_name} info from AHU website after {attempts} attempt(s): {reason}',
+            status=502,
+        )
+
+
+class CollectorBusyError(BaseError):
+    """
+    Raise when manually running the record collector while a collection is already in progress.
+    """
+
+    def __init__(self):
+        super().__init__(
+            name='collector_busy',
+            message='Record collector is already catching records, please try again later.',
+            status=409,
+        )
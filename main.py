@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
@@ -13,11 +15,14 @@ from exception.error import BaseError, BaseErrorOut
 
 import config
 from provider import ahu
+from provider import database
+from provider import collector
 
 # sub routers
 from endpoints.info import infoRouter
 from endpoints.auth import auth_router
 from endpoints.ahu import ahu_router
+from endpoints.metrics import metrics_router, MetricsMiddleware
 
 # CORS
 middlewares = [
@@ -30,10 +35,32 @@ middlewares = [
     )
 ]
 
-app = FastAPI(middleware=middlewares)
+# record latency of all requests, added as the outermost middleware so that time spent in other middlewares is included
+if config.general.METRICS_ENABLED:
+    middlewares.insert(0, Middleware(MetricsMiddleware))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm up database connections and start record collector when backend starts, and release resources on shutdown.
+    """
+    await database.warm_up_engine()
+    if config.general.COLLECTOR_ENABLED:
+        collector.collector.start()
+    yield
+    await collector.collector.stop()
+    await database.dispose_engine()
+    if ahu.aiohttp_session is not None:
+        await ahu.aiohttp_session.close()
+
+
+app = FastAPI(middleware=middlewares, lifespan=lifespan)
 app.include_router(infoRouter, prefix="/info", tags=['Info'])
 app.include_router(auth_router, prefix='/auth', tags=['Authentication'])
 app.include_router(ahu_router, prefix='/ahu', tags=['AHU'])
+if config.general.METRICS_ENABLED:
+    app.include_router(metrics_router)
 
 
 @app.get('/test')
@@ -1,3 +1,6 @@
 from . import ahu
 from . import database
 from . import algorithms
+from . import rollup
+from . import cache
+from . import collector
@@ -1,15 +1,24 @@
+import asyncio
+import random
 import time
 
-from aiohttp import ClientSession
+from aiohttp import ClientSession, ClientTimeout, ClientError, ClientResponseError
 import re
 from loguru import logger
 
-from schema.electric import BalanceRecord
+import config.general
+from schema.electric import BalanceRecord, DEFAULT_ROOM_ID
+from schema import ahu as ahu_schema
 from config import dorm
+from provider.ahu_header import header_store
+from provider import metrics
 from exception import error as exc
 
 aiohttp_session: ClientSession | None = None
 
+# limits the count of requests sent to AHU website at the same time, created lazily by ``get_request_semaphore()``.
+_request_semaphore: asyncio.Semaphore | None = None
+
 
 async def init_client_session(force_create: bool = False) -> ClientSession:
     global aiohttp_session
@@ -18,6 +27,46 @@ async def init_client_session(force_create: bool = False) -> ClientSession:
     return aiohttp_session
 
 
+def get_request_semaphore() -> asyncio.Semaphore:
+    global _request_semaphore
+    if _request_semaphore is None:
+        _request_semaphore = asyncio.Semaphore(config.general.AHU_MAX_CONCURRENT_REQUESTS)
+    return _request_semaphore
+
+
+def get_room_dict() -> dict[str, ahu_schema.RoomInfo]:
+    """
+    Return all rooms that records are caught of, keyed by room id. The default room always comes first.
+
+    Rooms are configured by ``DORM_LIGHT_INFO_DICT``, ``DORM_AC_INFO_DICT`` (the default room)
+    and ``DORM_EXTRA_ROOM_DICT`` in ``config/dorm.py``.
+    """
+    room_dict: dict[str, ahu_schema.RoomInfo] = {
+        DEFAULT_ROOM_ID: ahu_schema.RoomInfo(
+            room_id=DEFAULT_ROOM_ID,
+            light_info=dorm.DORM_LIGHT_INFO_DICT,
+            ac_info=dorm.DORM_AC_INFO_DICT,
+        )
+    }
+    for room_id, info_dict in dorm.DORM_EXTRA_ROOM_DICT.items():
+        room_dict[room_id] = ahu_schema.RoomInfo(
+            room_id=room_id,
+            light_info=info_dict['light'],
+            ac_info=info_dict['ac'],
+        )
+    return room_dict
+
+
+def get_room(room_id: str) -> ahu_schema.RoomInfo:
+    """
+    Return info of a room. Raise ``ParamError`` if the room is not configured.
+    """
+    room = get_room_dict().get(room_id)
+    if room is None:
+        raise exc.ParamError('room_id', f'Room {room_id} is not configured')
+    return room
+
+
 def extract_balance(json):
     """
     Parse the balance info from the string returned by AHU website.
@@ -53,6 +102,133 @@ def extract_balance(json):
         )
 
 
+async def _request_balance(
+        session: ClientSession,
+        name: str,
+        info_dict: dict,
+) -> tuple[float, ahu_schema.AHURequestTiming]:
+    """
+    Request balance info of one account from AHU website, with timeout and retries.
+
+    Timeout, connection error and server error (5xx) will be retried at most ``AHU_REQUEST_MAX_RETRIES`` times,
+    waiting a random backoff between attempts. Other errors are raised directly.
+
+    Each attempt holds the request semaphore, so there are at most ``AHU_MAX_CONCURRENT_REQUESTS`` requests
+    in flight. Backoff is waited without holding it.
+
+    Returns:
+
+    A tuple of balance and the timing info of this request.
+    """
+    timeout = ClientTimeout(total=config.general.AHU_REQUEST_TIMEOUT_SEC)
+    max_attempts: int = config.general.AHU_REQUEST_MAX_RETRIES + 1
+    timing = ahu_schema.AHURequestTiming(name=name, attempts=0, latency_ms=0)
+    # metric labels, name is "{room_id}/{account}" for non-default rooms
+    room_id, _, account = name.rpartition('/')
+    metric_labels: tuple[str, str] = (room_id or DEFAULT_ROOM_ID, account)
+
+    start_time = time.perf_counter()
+    attempt_idx: int = 0
+    while True:
+        timing.attempts += 1
+        attempt_start_time = time.perf_counter()
+        try:
+            # header is read on every attempt, so that retries use the token updated in the meantime
+            headers = await header_store.get()
+            async with get_request_semaphore():
+                async with session.post(
+                        url='/charge/feeitem/getThirdData',
+                        data=info_dict,
+                        headers=headers,
+                        timeout=timeout,
+                ) as res:
+                    res.raise_for_status()
+                    json = await res.json()
+                    balance = extract_balance(json)
+            attempt_duration = time.perf_counter() - attempt_start_time
+            timing.attempt_latency_ms.append(int(attempt_duration * 1000))
+            metrics.ahu_request_duration_seconds.observe(attempt_duration, *metric_labels)
+            break
+
+        except exc.BaseError:
+            metrics.ahu_request_duration_seconds.observe(time.perf_counter() - attempt_start_time, *metric_labels)
+            metrics.ahu_request_errors_total.inc(*metric_labels, 'parse')
+            raise
+
+        except (asyncio.TimeoutError, ClientError) as e:
+            attempt_duration = time.perf_counter() - attempt_start_time
+            timing.attempt_latency_ms.append(int(attempt_duration * 1000))
+            metrics.ahu_request_duration_seconds.observe(attempt_duration, *metric_labels)
+
+            if isinstance(e, asyncio.TimeoutError):
+                reason = 'Timeout'
+                metrics.ahu_request_errors_total.inc(*metric_labels, 'timeout')
+            elif isinstance(e, ClientResponseError):
+                reason = f'HTTP {e.status} {e.message}'
+                metrics.ahu_request_errors_total.inc(*metric_labels, f'http_{e.status // 100}xx')
+                # client errors (4xx) are not retried
+                if e.status < 500:
+                    raise exc.AHURequestError(name, timing.attempts, reason)
+            else:
+                reason = f'{type(e).__name__}: {e}'
+                metrics.ahu_request_errors_total.inc(*metric_labels, 'connection')
+
+            if timing.attempts >= max_attempts:
+                raise exc.AHURequestError(name, timing.attempts, reason)
+
+            # exponential backoff with full jitter
+            backoff = random.uniform(0, min(
+                config.general.AHU_RETRY_BACKOFF_MAX_SEC,
+                config.general.AHU_RETRY_BACKOFF_BASE_SEC * (2 ** attempt_idx),
+            ))
+            attempt_idx += 1
+            logger.warning(f'Request {name} info from AHU failed ({reason}), '
+                           f'retry {attempt_idx} after {backoff:.2f}s')
+            await asyncio.sleep(backoff)
+
+    timing.latency_ms = int((time.perf_counter() - start_time) * 1000)
+    return balance, timing
+
+
+async def get_record_with_timings(
+        room: ahu_schema.RoomInfo | None = None,
+) -> tuple[dict, list[ahu_schema.AHURequestTiming]]:
+    """
+    Get current record of a room from AHU official website, with timing info of each sub-request.
+
+    Light and AC balance are requested concurrently. If any of them failed, the other one is cancelled.
+
+    Parameters:
+
+    - ``room`` The room to get record of. If ``None``, use the default room.
+
+    Returns:
+
+    A tuple of record info dict, check out ``get_record()``, and a list of ``AHURequestTiming``.
+    """
+    session = await init_client_session()
+    if room is None:
+        room = get_room(DEFAULT_ROOM_ID)
+
+    name_prefix: str = '' if room.room_id == DEFAULT_ROOM_ID else f'{room.room_id}/'
+    task_list = [
+        asyncio.create_task(_request_balance(session, f'{name_prefix}light', room.light_info)),
+        asyncio.create_task(_request_balance(session, f'{name_prefix}ac', room.ac_info)),
+    ]
+    try:
+        (light_balance, light_timing), (ac_balance, ac_timing) = await asyncio.gather(*task_list)
+    except BaseException:
+        for task in task_list:
+            task.cancel()
+        raise
+
+    return {
+        'timestamp': time.time(),
+        'light_balance': light_balance,
+        'ac_balance': ac_balance,
+    }, [light_timing, ac_timing]
+
+
 async def get_record() -> dict:
     """
     Get current record from AHU official website
@@ -65,33 +241,38 @@ async def get_record() -> dict:
             light_balance: float,
         }
     """
-    light_balance: float = 0
-    ac_balance: float = 0
+    record_dict, _ = await get_record_with_timings()
+    return record_dict
 
-    session = await init_client_session()
 
-    try:
-        async with session.post(
-                url='/charge/feeitem/getThirdData',
-                data=dorm.DORM_LIGHT_INFO_DICT,
-                headers=dorm.get_ahu_header(),
-        ) as res:
-            json = await res.json()
-            light_balance = extract_balance(json)
-
-        async with session.post(
-                url='/charge/feeitem/getThirdData',
-                data=dorm.DORM_AC_INFO_DICT,
-                headers=dorm.DORM_REQ_HEADER_DICT,
-        ) as res:
-            json = await res.json()
-            ac_balance = extract_balance(json)
-
-        return {
-            'timestamp': time.time(),
-            'light_balance': light_balance,
-            'ac_balance': ac_balance,
-        }
-    except exc.BaseError as e:
-        # Here actually want to catch error from func `extract_balance`
-        raise e
+async def get_records_of_rooms(room_list: list[ahu_schema.RoomInfo] | None = None) -> list[ahu_schema.RoomCatchResult]:
+    """
+    Get current records of multiple rooms from AHU official website concurrently.
+
+    Requests of all rooms are sent together, count of requests in flight is bounded by ``AHU_MAX_CONCURRENT_REQUESTS``.
+    Failure of a room does not affect other rooms.
+
+    Parameters:
+
+    - ``room_list`` Rooms to get records of. If ``None``, use all configured rooms.
+
+    Returns:
+
+    A list of ``RoomCatchResult``, in the same order as ``room_list``.
+    """
+    if room_list is None:
+        room_list = list(get_room_dict().values())
+
+    async def catch_room(room: ahu_schema.RoomInfo) -> ahu_schema.RoomCatchResult:
+        try:
+            record_dict, request_timings = await get_record_with_timings(room)
+        except Exception as e:
+            logger.error(f'Failed to get record of room {room.room_id}: {e}')
+            return ahu_schema.RoomCatchResult(room_id=room.room_id, error=f'{type(e).__name__}: {e}')
+        return ahu_schema.RoomCatchResult(
+            room_id=room.room_id,
+            record=BalanceRecord.from_info_dict(record_dict),
+            request_timings=request_timings,
+        )
+
+    return list(await asyncio.gather(*[catch_room(room) for room in room_list]))
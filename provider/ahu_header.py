@@ -0,0 +1,121 @@
+"""
+Store of the AHU request header persisted in ``config/ahu_header.json``.
+
+Header is served from memory. The file is only read again when its modification time changes (e.g. edited by hand),
+and file operations are performed in a worker thread, so that the event loop is never blocked. Updates are written to
+a temporary file in the same directory then renamed to the header file, so the file is never left half-written even
+if the process is killed or another update happens at the same time.
+"""
+import asyncio
+import json
+import os
+import re
+import tempfile
+
+from loguru import logger
+
+from exception import error as exc
+
+AHU_HEADER_PATH: str = 'config/ahu_header.json'
+
+
+def extract_token_from_url(url_str: str) -> str:
+    """
+    Extract the auth token from the URL of the authorized AHU electrical info page, since AHU Online System
+    directly put the Authentication Token Info into the URL.
+
+    Exceptions:
+
+    - ``invalid_url_str`` Raised when there is no valid token info in passed URL string.
+    """
+    match = re.search(r'token=(?P<jwt_token>[a-zA-Z0-9]*\.[a-zA-Z0-9]*\..*?)#', url_str)
+    if match is None:
+        raise exc.BaseError(
+            name='invalid_url_str',
+            message='Could not found valid token info in URL string',
+            status=400)
+    return match.groupdict()['jwt_token']
+
+
+class AHUHeaderStore:
+    """
+    In-memory AHU request header backed by a JSON file.
+
+    Members:
+
+    - ``path`` Path of the header JSON file.
+
+    Notice:
+
+    - Dicts returned by this class are copies, modifying them will not affect the store.
+    """
+
+    def __init__(self, path: str = AHU_HEADER_PATH) -> None:
+        self.path = path
+        self._header: dict | None = None
+        # (mtime_ns, size, inode) of the file when it was loaded or written last time
+        self._file_signature: tuple[int, int, int] | None = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> dict:
+        """
+        Return the current header, reloaded from file if the file has been changed since loaded.
+        """
+        async with self._lock:
+            await asyncio.to_thread(self._reload_if_changed)
+            return dict(self._header)
+
+    async def update(self, update_dict: dict) -> dict:
+        """
+        Update fields of the header and persist it to file atomically. Returns the new header.
+        """
+        async with self._lock:
+            await asyncio.to_thread(self._reload_if_changed)
+            header = {**self._header, **update_dict}
+            await asyncio.to_thread(self._write, header)
+            return dict(self._header)
+
+    async def update_token_from_url(self, url_str: str) -> dict:
+        """
+        Update ``synjones-auth`` field using the token in the URL of authorized AHU electrical info page.
+        Check out ``extract_token_from_url()``.
+        """
+        token_str = extract_token_from_url(url_str)
+        return await self.update({'synjones-auth': 'bearer ' + token_str})
+
+    def _get_file_signature(self) -> tuple[int, int, int]:
+        stat_result = os.stat(self.path)
+        return stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino
+
+    def _reload_if_changed(self) -> None:
+        signature = self._get_file_signature()
+        if self._header is not None and signature == self._file_signature:
+            return
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            self._header = json.load(f)
+        self._file_signature = signature
+        logger.debug(f'AHU header loaded from {self.path}')
+
+    def _write(self, header: dict) -> None:
+        dir_path = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(prefix='.ahu_header.', suffix='.tmp', dir=dir_path)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(header, f)
+                f.flush()
+                os.fsync(f.fileno())
+            # keep the permission of the original file, temp file is only readable by owner
+            if os.path.exists(self.path):
+                os.chmod(temp_path, os.stat(self.path).st_mode & 0o777)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self._header = header
+        self._file_signature = self._get_file_signature()
+
+
+header_store = AHUHeaderStore()
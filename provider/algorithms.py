@@ -1,9 +1,13 @@
 import math
+from datetime import datetime
+
+import numpy as np
 
 import config.general
 from exception import error as exc
+from provider import metrics
 from schema import electric as elec_schema
-from schema.electric import BalanceRecord, SQLRecord
+from schema.electric import BalanceRecord, SQLRecord, RecordBatch
 
 
 def convert_balance_list_to_usage_list(
@@ -35,6 +39,13 @@ def convert_balance_list_to_usage_list(
             'usage_convert_config',
             'Must provide a valid convert config to usage convert function')
 
+    # use the NumPy implementation if enabled in config
+    if config.general.USAGE_CONVERT_VECTORIZED:
+        return convert_balance_batch_to_usage_batch(
+            record_batch=RecordBatch.from_records(record_list),
+            usage_convert_config=usage_convert_config,
+        ).to_record_list()
+
     # create completely new list
     record_list = convert_to_model_record_list(record_list)
 
@@ -43,6 +54,8 @@ def convert_balance_list_to_usage_list(
     if size == 0:
         return []
 
+    stage_timer = metrics.StageTimer(metrics.usage_convert_stage_duration_seconds)
+
     # iterate from end to start to update the balance to usage.
     # notice no negative usage allowed here. Which will be forcefully pull up to 0
     for i in range(size - 1, 0, -1):
@@ -53,22 +66,34 @@ def convert_balance_list_to_usage_list(
     # for more info about why doing this, check out docs/usage_calc.md
     record_list[0].ac_balance = 0
     record_list[0].light_balance = 0
+    stage_timer.lap('balance_to_usage')
 
     # post process of record list
 
     if usage_convert_config.spreading:
         record_list = usage_list_point_spreading(record_list=record_list)
+        stage_timer.lap('spreading')
 
     if usage_convert_config.use_smart_merge:
         # here None merge_ratio param is allowed
         # which will cause smart_point_merge() to find out smart ratio automatically.
         record_list = smart_points_merge(record_list=record_list, merge_ratio=usage_convert_config.merge_ratio)
+        stage_timer.lap('smart_merge')
 
     if usage_convert_config.smoothing:
         record_list = usage_list_smoothing(record_list=record_list)
+        stage_timer.lap('smoothing')
+
+    if usage_convert_config.max_points is not None:
+        record_list = usage_list_downsampling(
+            record_list=record_list,
+            max_points=get_downsampling_target(usage_convert_config),
+        )
+        stage_timer.lap('downsampling')
 
     if usage_convert_config.per_hour_usage:
         record_list = usage_list_unit_convert_to_per_hour(record_list)
+        stage_timer.lap('per_hour_usage')
 
     if usage_convert_config.remove_first_point:
         record_list = record_list[1:]
@@ -76,6 +101,602 @@ def convert_balance_list_to_usage_list(
     return record_list
 
 
+def convert_balance_batch_to_usage_batch(
+        record_batch: RecordBatch,
+        usage_convert_config: elec_schema.UsageConvertConfig,
+) -> RecordBatch:
+    """
+    ``RecordBatch`` version of ``convert_balance_list_to_usage_list()``.
+
+    When ``USAGE_CONVERT_VECTORIZED`` is enabled in general config, all processes are performed on the
+    contiguous timestamp, light and ac arrays of the batch, otherwise fallback to the pure Python version.
+    The result is identical under every ``UsageConvertConfig``, including the 2 decimal places rounding
+    performed by ``BalanceRecord`` validator during the process.
+
+    Returns:
+
+    A new ``RecordBatch`` of usage info. Values of the result batch are NOT rounded.
+    """
+    # ensure config received
+    if usage_convert_config is None:
+        raise exc.ParamError(
+            'usage_convert_config',
+            'Must provide a valid convert config to usage convert function')
+
+    if not config.general.USAGE_CONVERT_VECTORIZED:
+        return RecordBatch.from_records(convert_balance_list_to_usage_list(
+            record_list=record_batch.to_record_list(),
+            usage_convert_config=usage_convert_config,
+        ))
+
+    # Don't deal with empty batch
+    if len(record_batch) == 0:
+        return record_batch
+
+    stage_timer = metrics.StageTimer(metrics.usage_convert_stage_duration_seconds)
+    timestamp_arr = record_batch.timestamp
+    light_arr = vectorized_round(record_batch.light_balance)
+    ac_arr = vectorized_round(record_batch.ac_balance)
+
+    # balance to usage, first usage is always zero. check out docs/usage_calc.md
+    light_arr = vectorized_balance_to_usage(light_arr)
+    ac_arr = vectorized_balance_to_usage(ac_arr)
+    stage_timer.lap('balance_to_usage')
+
+    if usage_convert_config.spreading:
+        timestamp_arr, light_arr, ac_arr = vectorized_point_spreading(timestamp_arr, light_arr, ac_arr)
+        stage_timer.lap('spreading')
+
+    if usage_convert_config.use_smart_merge:
+        timestamp_arr, light_arr, ac_arr = vectorized_points_merge(
+            timestamp_arr, light_arr, ac_arr,
+            merge_ratio=usage_convert_config.merge_ratio,
+        )
+        stage_timer.lap('smart_merge')
+
+    if usage_convert_config.smoothing:
+        light_arr, ac_arr = vectorized_smoothing(light_arr), vectorized_smoothing(ac_arr)
+        stage_timer.lap('smoothing')
+
+    if usage_convert_config.max_points is not None:
+        timestamp_arr, light_arr, ac_arr = vectorized_downsampling(
+            timestamp_arr, light_arr, ac_arr,
+            max_points=get_downsampling_target(usage_convert_config),
+        )
+        stage_timer.lap('downsampling')
+
+    if usage_convert_config.per_hour_usage:
+        light_arr = vectorized_unit_convert_to_per_hour(timestamp_arr, light_arr)
+        ac_arr = vectorized_unit_convert_to_per_hour(timestamp_arr, ac_arr)
+        stage_timer.lap('per_hour_usage')
+
+    usage_batch = RecordBatch(timestamp_arr, light_arr, ac_arr)
+
+    if usage_convert_config.remove_first_point:
+        usage_batch = usage_batch[1:]
+
+    return usage_batch
+
+
+def get_auto_merge_ratio(first_timestamp: int | float, last_timestamp: int | float) -> int:
+    """
+    Return the merge ratio used by smart merge when no ratio is specified, using day as density standard.
+    """
+    return max(1, math.floor(float(last_timestamp - first_timestamp) / (24 * 60 * 60)))
+
+
+class UsageStreamConverter:
+    """
+    Incremental version of ``convert_balance_batch_to_usage_batch()``, used when records are read from database
+    chunk by chunk and the result is sent out before all records are read.
+
+    Each process only keeps the few points it needs from the previous chunks, so memory usage does not grow with
+    the size of the time range. The concatenated output of ``feed()`` and ``finish()`` is identical to the result
+    of converting the whole batch at once.
+
+    Usage::
+
+        converter = UsageStreamConverter(usage_convert_config, merge_ratio=...)
+        for batch in batch_iterator:
+            yield converter.feed(batch)
+        yield converter.finish()
+
+    Parameters:
+
+    - ``usage_convert_config`` Configs used when converting record list.
+    - ``merge_ratio`` Ratio used by smart merge when ``usage_convert_config.merge_ratio`` is ``None``. Since the
+      auto ratio depends on the first and last timestamp of the whole range, it must be resolved by caller in
+      advance, check out ``get_auto_merge_ratio()``.
+    """
+
+    def __init__(
+            self,
+            usage_convert_config: elec_schema.UsageConvertConfig,
+            merge_ratio: int | None = None,
+    ) -> None:
+        # ensure config received
+        if usage_convert_config is None:
+            raise exc.ParamError(
+                'usage_convert_config',
+                'Must provide a valid convert config to usage convert function')
+
+        # downsampling requires the whole list to determine the buckets
+        if usage_convert_config.max_points is not None:
+            raise exc.ParamError('max_points', 'Downsampling is not supported when streaming records')
+
+        self.usage_convert_config = usage_convert_config
+
+        self._merge_ratio: int = 1
+        if usage_convert_config.use_smart_merge:
+            if usage_convert_config.merge_ratio is not None:
+                merge_ratio = usage_convert_config.merge_ratio
+            if merge_ratio is None:
+                raise exc.ParamError('merge_ratio', 'Merge ratio must be resolved before streaming usage convert')
+            self._merge_ratio = max(1, int(merge_ratio))
+
+        # states carried between chunks
+        self._last_light_balance: float | None = None
+        self._last_ac_balance: float | None = None
+        self._spreading_last_timestamp: int | float | None = None
+        self._merge_pending: RecordBatch = RecordBatch.empty()
+        self._merge_seen: int = 0
+        self._smoothing_pending: RecordBatch = RecordBatch.empty()
+        self._smoothing_seen: int = 0
+        self._per_hour_last_timestamp: int | float | None = None
+        self._first_point_removed: bool = False
+
+    def feed(self, record_batch: RecordBatch) -> RecordBatch:
+        """
+        Convert the next balance batch. Returns the usage points that could be determined so far, may be empty.
+        """
+        return self._process(record_batch, final=False)
+
+    def finish(self) -> RecordBatch:
+        """
+        Return the remaining usage points. Should be called once after all batches are fed.
+        """
+        return self._process(RecordBatch.empty(), final=True)
+
+    def _process(self, record_batch: RecordBatch, final: bool) -> RecordBatch:
+        stage_timer = metrics.StageTimer(metrics.usage_convert_stage_duration_seconds)
+        record_batch = self._balance_to_usage(record_batch)
+        stage_timer.lap('balance_to_usage')
+
+        if self.usage_convert_config.spreading:
+            record_batch = self._point_spreading(record_batch)
+            stage_timer.lap('spreading')
+
+        if self.usage_convert_config.use_smart_merge:
+            record_batch = self._points_merge(record_batch, final)
+            stage_timer.lap('smart_merge')
+
+        if self.usage_convert_config.smoothing:
+            record_batch = self._smoothing(record_batch, final)
+            stage_timer.lap('smoothing')
+
+        if self.usage_convert_config.per_hour_usage:
+            record_batch = self._unit_convert_to_per_hour(record_batch)
+            stage_timer.lap('per_hour_usage')
+
+        if self.usage_convert_config.remove_first_point and not self._first_point_removed and len(record_batch) > 0:
+            self._first_point_removed = True
+            record_batch = record_batch[1:]
+
+        return record_batch
+
+    def _balance_to_usage(self, record_batch: RecordBatch) -> RecordBatch:
+        if len(record_batch) == 0:
+            return record_batch
+
+        light_arr = vectorized_round(record_batch.light_balance)
+        ac_arr = vectorized_round(record_batch.ac_balance)
+
+        if self._last_light_balance is None:
+            light_usage_arr = vectorized_balance_to_usage(light_arr)
+            ac_usage_arr = vectorized_balance_to_usage(ac_arr)
+        else:
+            light_usage_arr = vectorized_balance_to_usage(np.concatenate(([self._last_light_balance], light_arr)))[1:]
+            ac_usage_arr = vectorized_balance_to_usage(np.concatenate(([self._last_ac_balance], ac_arr)))[1:]
+
+        self._last_light_balance = light_arr[-1]
+        self._last_ac_balance = ac_arr[-1]
+        return RecordBatch(record_batch.timestamp, light_usage_arr, ac_usage_arr)
+
+    def _point_spreading(self, record_batch: RecordBatch) -> RecordBatch:
+        if len(record_batch) == 0:
+            return record_batch
+
+        last_timestamp = self._spreading_last_timestamp
+        self._spreading_last_timestamp = record_batch.timestamp[-1]
+
+        if last_timestamp is None:
+            return RecordBatch(*vectorized_point_spreading(
+                record_batch.timestamp, record_batch.light_balance, record_batch.ac_balance))
+
+        # prepend the last point of previous chunk, which is never spread, then remove it from result
+        timestamp_arr, light_arr, ac_arr = vectorized_point_spreading(
+            np.concatenate(([last_timestamp], record_batch.timestamp)),
+            np.concatenate(([0.0], record_batch.light_balance)),
+            np.concatenate(([0.0], record_batch.ac_balance)),
+        )
+        return RecordBatch(timestamp_arr[1:], light_arr[1:], ac_arr[1:])
+
+    def _points_merge(self, record_batch: RecordBatch, final: bool) -> RecordBatch:
+        if self._merge_ratio == 1:
+            return record_batch
+
+        pending = RecordBatch.concat([self._merge_pending, record_batch])
+        self._merge_seen += len(record_batch)
+
+        # total point count less than merge ratio, points are not merged
+        if self._merge_seen < self._merge_ratio:
+            if final:
+                self._merge_pending = RecordBatch.empty()
+                return pending
+            self._merge_pending = pending
+            return RecordBatch.empty()
+
+        # merge full groups
+        full_len = len(pending) // self._merge_ratio * self._merge_ratio
+        result_list: list[RecordBatch] = []
+        if full_len > 0:
+            result_list.append(RecordBatch(*vectorized_points_merge(
+                pending.timestamp[:full_len],
+                pending.light_balance[:full_len],
+                pending.ac_balance[:full_len],
+                merge_ratio=self._merge_ratio,
+            )))
+        self._merge_pending = pending[full_len:]
+
+        # merge the last incomplete group
+        if final and len(self._merge_pending) > 0:
+            result_list.append(RecordBatch(
+                self._merge_pending.timestamp[-1:],
+                vectorized_round(np.cumsum(self._merge_pending.light_balance)[-1:]),
+                vectorized_round(np.cumsum(self._merge_pending.ac_balance)[-1:]),
+            ))
+            self._merge_pending = RecordBatch.empty()
+
+        return RecordBatch.concat(result_list)
+
+    def _smoothing(self, record_batch: RecordBatch, final: bool) -> RecordBatch:
+        pending = RecordBatch.concat([self._smoothing_pending, record_batch])
+        self._smoothing_seen += len(record_batch)
+
+        # list with less than 3 points is not smoothed
+        if self._smoothing_seen < 3:
+            if final:
+                self._smoothing_pending = RecordBatch.empty()
+                return pending
+            self._smoothing_pending = pending
+            return RecordBatch.empty()
+
+        result_list: list[RecordBatch] = []
+
+        # first point is kept but rounded. After it's sent, the first pending point is always an already sent one.
+        if self._smoothing_seen == len(pending):
+            result_list.append(round_record_batch(pending[:1]))
+
+        # points with both neighbours known
+        if len(pending) >= 3:
+            result_list.append(RecordBatch(
+                pending.timestamp[1:-1],
+                pending.light_balance[:-2] * 0.1 + pending.light_balance[1:-1] * 0.7 + pending.light_balance[2:] * 0.2,
+                pending.ac_balance[:-2] * 0.1 + pending.ac_balance[1:-1] * 0.7 + pending.ac_balance[2:] * 0.2,
+            ))
+
+        # last point is kept but rounded
+        if final:
+            result_list.append(round_record_batch(pending[-1:]))
+            self._smoothing_pending = RecordBatch.empty()
+        else:
+            self._smoothing_pending = pending[-2:]
+
+        return RecordBatch.concat(result_list)
+
+    def _unit_convert_to_per_hour(self, record_batch: RecordBatch) -> RecordBatch:
+        if len(record_batch) == 0:
+            return record_batch
+
+        last_timestamp = self._per_hour_last_timestamp
+        self._per_hour_last_timestamp = record_batch.timestamp[-1]
+
+        if last_timestamp is None:
+            return RecordBatch(
+                record_batch.timestamp,
+                vectorized_unit_convert_to_per_hour(record_batch.timestamp, record_batch.light_balance),
+                vectorized_unit_convert_to_per_hour(record_batch.timestamp, record_batch.ac_balance),
+            )
+
+        timestamp_arr = np.concatenate(([last_timestamp], record_batch.timestamp))
+        return RecordBatch(
+            record_batch.timestamp,
+            vectorized_unit_convert_to_per_hour(
+                timestamp_arr, np.concatenate(([0.0], record_batch.light_balance)))[1:],
+            vectorized_unit_convert_to_per_hour(
+                timestamp_arr, np.concatenate(([0.0], record_batch.ac_balance)))[1:],
+        )
+
+
+def get_downsampling_target(usage_convert_config: elec_schema.UsageConvertConfig) -> int:
+    """
+    Return the point count the usage list should be downsampled to before removing the first point,
+    so that the final list contains at most ``max_points`` points.
+    """
+    if usage_convert_config.remove_first_point:
+        return usage_convert_config.max_points + 1
+    return usage_convert_config.max_points
+
+
+def lttb_select_index(timestamp_arr: np.ndarray, value_arr_list: list[np.ndarray], max_points: int) -> np.ndarray:
+    """
+    Select at most ``max_points`` points using Largest-Triangle-Three-Buckets algorithm.
+
+    The first and last points are always selected. The rest points are divided into ``max_points - 2`` buckets,
+    and in each bucket the point forming the largest triangle with the previous selected point and the average point
+    of the next bucket is selected. When there are multiple value arrays, the sum of triangle areas is used.
+
+    Returns:
+
+    Ascending index array of the selected points.
+    """
+    size = len(timestamp_arr)
+    if max_points >= size or max_points < 3:
+        return np.arange(size)
+
+    x_arr = timestamp_arr.astype(np.float64)
+    bucket_size = (size - 2) / (max_points - 2)
+
+    # bucket boundaries of the middle points, bucket i is [edge_arr[i], edge_arr[i + 1])
+    edge_arr = (np.arange(max_points - 1) * bucket_size).astype(np.int64) + 1
+    edge_arr[-1] = size - 1
+
+    selected_arr = np.empty(max_points, dtype=np.int64)
+    selected_arr[0] = 0
+    selected_arr[-1] = size - 1
+
+    prev_idx: int = 0
+    for bucket_idx in range(max_points - 2):
+        bucket_start, bucket_end = edge_arr[bucket_idx], edge_arr[bucket_idx + 1]
+
+        # average point of next bucket, the last bucket uses the last point
+        if bucket_idx + 2 < len(edge_arr):
+            next_start, next_end = edge_arr[bucket_idx + 1], edge_arr[bucket_idx + 2]
+        else:
+            next_start, next_end = size - 1, size
+        avg_x = x_arr[next_start:next_end].mean()
+
+        area_arr = np.zeros(bucket_end - bucket_start, dtype=np.float64)
+        for value_arr in value_arr_list:
+            avg_y = value_arr[next_start:next_end].mean()
+            area_arr += np.abs(
+                (x_arr[prev_idx] - avg_x) * (value_arr[bucket_start:bucket_end] - value_arr[prev_idx])
+                - (x_arr[prev_idx] - x_arr[bucket_start:bucket_end]) * (avg_y - value_arr[prev_idx])
+            )
+
+        prev_idx = bucket_start + int(np.argmax(area_arr))
+        selected_arr[bucket_idx + 1] = prev_idx
+
+    return selected_arr
+
+
+def vectorized_downsampling(
+        timestamp_arr: np.ndarray,
+        light_arr: np.ndarray,
+        ac_arr: np.ndarray,
+        max_points: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Downsample a usage list to at most ``max_points`` points. Returns new timestamp, light and ac arrays.
+
+    Points are selected by ``lttb_select_index()``, then every selected point accumulates the usage of the points
+    between the previous selected point and itself, so that the total usage is kept. Values are rounded to
+    2 decimal places, the same as smart merge.
+    """
+    selected_arr = lttb_select_index(timestamp_arr, [light_arr, ac_arr], max_points)
+    if len(selected_arr) == len(timestamp_arr):
+        return timestamp_arr, light_arr, ac_arr
+
+    # group of selected point k is (selected[k - 1], selected[k]], the first group only contains the first point
+    group_start_arr = np.concatenate(([0], selected_arr[:-1] + 1))
+    return (
+        timestamp_arr[selected_arr],
+        vectorized_round(np.add.reduceat(light_arr, group_start_arr)),
+        vectorized_round(np.add.reduceat(ac_arr, group_start_arr)),
+    )
+
+
+def usage_list_downsampling(
+        record_list: list[SQLRecord | BalanceRecord],
+        max_points: int,
+) -> list[SQLRecord | BalanceRecord]:
+    """
+    Downsample a usage record list to at most ``max_points`` points, keeping the total usage.
+    Check out ``vectorized_downsampling()`` for more info.
+
+    Returns:
+
+    - A new ``BalanceRecord`` list if downsampled, otherwise the original list.
+    """
+    if len(record_list) <= max_points:
+        return record_list
+
+    record_batch = RecordBatch.from_records(record_list)
+    return convert_to_model_record_list(RecordBatch(*vectorized_downsampling(
+        record_batch.timestamp,
+        record_batch.light_balance,
+        record_batch.ac_balance,
+        max_points=max_points,
+    )).to_record_list())
+
+
+def downsample_balance_batch(record_batch: RecordBatch, max_points: int) -> RecordBatch:
+    """
+    Select at most ``max_points`` records of a balance batch using ``lttb_select_index()``.
+
+    Unlike usage, balance values are kept as they are since they are not accumulative.
+    """
+    selected_arr = lttb_select_index(
+        record_batch.timestamp,
+        [record_batch.light_balance, record_batch.ac_balance],
+        max_points,
+    )
+    if len(selected_arr) == len(record_batch):
+        return record_batch
+    return RecordBatch(
+        record_batch.timestamp[selected_arr],
+        record_batch.light_balance[selected_arr],
+        record_batch.ac_balance[selected_arr],
+    )
+
+
+def round_record_batch(record_batch: RecordBatch) -> RecordBatch:
+    """
+    Return a new batch with values rounded to 2 decimal places, the same as ``BalanceRecord`` validator.
+    """
+    return RecordBatch(
+        record_batch.timestamp,
+        vectorized_round(record_batch.light_balance),
+        vectorized_round(record_batch.ac_balance),
+    )
+
+
+def vectorized_round(value_arr: np.ndarray) -> np.ndarray:
+    """
+    Round an array to 2 decimal places, giving the identical result as Python builtin ``round(value, 2)``.
+
+    ``np.round()`` scales the value before rounding, which may differ from Python ``round()`` when the value is
+    really close to a half. Such values are rounded by Python ``round()`` instead.
+    """
+    rounded_arr = np.round(value_arr, 2)
+
+    scaled_arr = value_arr * 100
+    close_to_half = np.abs(np.abs(scaled_arr - np.trunc(scaled_arr)) - 0.5) < 1e-6
+    if close_to_half.any():
+        rounded_arr[close_to_half] = [round(value, 2) for value in value_arr[close_to_half].tolist()]
+
+    return rounded_arr
+
+
+def vectorized_balance_to_usage(balance_arr: np.ndarray) -> np.ndarray:
+    """
+    Convert a balance array to usage array. Negative usage is pulled up to zero, and the first usage is zero.
+    """
+    usage_arr = np.zeros_like(balance_arr)
+    diff_arr = balance_arr[:-1] - balance_arr[1:]
+    usage_arr[1:] = np.where(diff_arr > 0, diff_arr, 0.0)
+    return usage_arr
+
+
+def vectorized_point_spreading(
+        timestamp_arr: np.ndarray,
+        light_arr: np.ndarray,
+        ac_arr: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    NumPy version of ``usage_list_point_spreading()``. Returns new timestamp, light and ac arrays.
+    """
+    # only list with more than two elements could perform data spreading
+    if len(timestamp_arr) < 2:
+        return timestamp_arr, light_arr, ac_arr
+
+    # spread point distance
+    max_dis: int = config.general.POINT_SPREADING_DIS_LIMIT_MIN * 60
+    # point spreading threshold
+    spreading_dis: int = max_dis + config.general.POINT_SPREADING_TOLERANCE_MIN * 60
+
+    # calculate new point count of each point, truncated the same way as int()
+    timestamp_diff_arr = (timestamp_arr[1:] - timestamp_arr[:-1]).astype(np.int64)
+    new_point_count_arr = np.zeros(len(timestamp_arr), dtype=np.int64)
+    new_point_count_arr[1:] = np.where(timestamp_diff_arr > spreading_dis, (timestamp_diff_arr - 1) // max_dis, 0)
+
+    # no need for spreading
+    spread_mask = new_point_count_arr > 0
+    if not spread_mask.any():
+        return timestamp_arr, light_arr, ac_arr
+
+    # update data of the spread points
+    light_arr = light_arr.copy()
+    ac_arr = ac_arr.copy()
+    light_arr[spread_mask] = vectorized_round(light_arr[spread_mask] / (new_point_count_arr[spread_mask] + 1))
+    ac_arr[spread_mask] = vectorized_round(ac_arr[spread_mask] / (new_point_count_arr[spread_mask] + 1))
+
+    # each point is repeated to (new_point_count + 1) points, new points are placed before the original one,
+    # so the result is still ascending without sorting
+    repeat_arr = new_point_count_arr + 1
+    group_end_arr = np.cumsum(repeat_arr)
+    back_idx_arr = np.repeat(group_end_arr - 1, repeat_arr) - np.arange(group_end_arr[-1])
+
+    new_timestamp_arr = np.repeat(timestamp_arr, repeat_arr) - back_idx_arr * max_dis
+    return new_timestamp_arr, np.repeat(light_arr, repeat_arr), np.repeat(ac_arr, repeat_arr)
+
+
+def vectorized_points_merge(
+        timestamp_arr: np.ndarray,
+        light_arr: np.ndarray,
+        ac_arr: np.ndarray,
+        merge_ratio: int | None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    NumPy version of ``smart_points_merge()``. Returns new timestamp, light and ac arrays.
+    """
+    list_len = len(timestamp_arr)
+
+    # use auto calculated default ratio
+    if merge_ratio is None:
+        time_range = float(timestamp_arr[-1] - timestamp_arr[0])
+        merge_ratio = math.floor(time_range / (24 * 60 * 60))
+
+    merge_ratio = int(merge_ratio)
+    merge_ratio = max(1, merge_ratio)
+
+    if merge_ratio == 1 or list_len < merge_ratio:
+        return timestamp_arr, light_arr, ac_arr
+
+    group_count = math.ceil(list_len / merge_ratio)
+
+    # use the timestamp of the latest record point of each group.
+    last_idx_arr = np.minimum(np.arange(1, group_count + 1) * merge_ratio, list_len) - 1
+
+    def accumulate(value_arr: np.ndarray) -> np.ndarray:
+        # pad with zeros then accumulate row by row. Here cumsum() is used since it adds values one by one,
+        # which keeps the same floating point result as the Python loop.
+        padded_arr = np.zeros(group_count * merge_ratio, dtype=np.float64)
+        padded_arr[:list_len] = value_arr
+        return vectorized_round(padded_arr.reshape(group_count, merge_ratio).cumsum(axis=1)[:, -1])
+
+    return timestamp_arr[last_idx_arr], accumulate(light_arr), accumulate(ac_arr)
+
+
+def vectorized_smoothing(value_arr: np.ndarray) -> np.ndarray:
+    """
+    NumPy version of ``usage_list_smoothing()``. Returns new value array.
+    """
+    if len(value_arr) < 3:
+        return value_arr
+
+    new_value_arr = np.empty_like(value_arr)
+    new_value_arr[1:-1] = value_arr[:-2] * 0.1 + value_arr[1:-1] * 0.7 + value_arr[2:] * 0.2
+
+    # first and last point are kept, but rounded
+    new_value_arr[0] = round(float(value_arr[0]), 2)
+    new_value_arr[-1] = round(float(value_arr[-1]), 2)
+
+    return new_value_arr
+
+
+def vectorized_unit_convert_to_per_hour(timestamp_arr: np.ndarray, value_arr: np.ndarray) -> np.ndarray:
+    """
+    NumPy version of ``usage_list_unit_convert_to_per_hour()``. Returns new value array.
+    """
+    if len(value_arr) == 0:
+        return value_arr
+
+    new_value_arr = np.zeros_like(value_arr)
+    new_value_arr[1:] = value_arr[1:] / ((timestamp_arr[1:] - timestamp_arr[:-1]) / 3600)
+    return new_value_arr
+
+
 def usage_list_unit_convert_to_per_hour(
         record_list: list[SQLRecord | BalanceRecord]) -> list[BalanceRecord | SQLRecord]:
     """
@@ -354,3 +975,178 @@ def time_range_checker(start: int | float, end: int | float) -> None:
             '[start_time_param]',
             'The start time should be a valid UNIX timestamp which is greater than zero'
         )
+
+
+# seconds of the units could be used in statistics window, e.g. ``12h``, ``7d``, ``4w``
+STATISTICS_WINDOW_UNIT_SEC: dict[str, int] = {
+    'h': 60 * 60,
+    'd': 24 * 60 * 60,
+    'w': 7 * 24 * 60 * 60,
+}
+
+
+def parse_statistics_window(window: str) -> int:
+    """
+    Parse a trailing statistics window like ``1d``, ``12h`` or ``4w``, returns the duration in seconds.
+
+    Raise ``ParamError`` if the window is invalid.
+    """
+    window = window.strip().lower()
+    unit_sec = STATISTICS_WINDOW_UNIT_SEC.get(window[-1:])
+    count_str = window[:-1]
+    if unit_sec is None or not count_str.isdigit() or int(count_str) <= 0:
+        raise exc.ParamError(
+            'windows',
+            f'Invalid statistics window "{window}", should be a positive integer followed by one of '
+            f'{list(STATISTICS_WINDOW_UNIT_SEC.keys())}, e.g. 7d')
+    return int(count_str) * unit_sec
+
+
+def trailing_window_usage(
+        record_batch: RecordBatch,
+        window_start_list: list[int],
+) -> list[tuple[float, float, int]]:
+    """
+    Calculate the usage of multiple trailing windows from one batch of records, which covers the widest window.
+
+    Parameters:
+
+    - ``record_batch`` Records in the widest window with ascending timestamp.
+    - ``window_start_list`` Start timestamp of each window. The window covers records later than (not equal to) it.
+
+    Returns:
+
+    A list of ``(light_usage, ac_usage, point_used)`` for each window.
+
+    Notice:
+
+    - The same as the statistics before this engine, the first record in a window is treated as the base point,
+      so usage is calculated from the records after it, and ``point_used`` does not include it.
+    - Usage of each adjacent record pair is calculated once, and the usage of all windows are read from the
+      suffix sum of it, so the cost does not grow with the count of windows.
+    """
+    size = len(record_batch)
+
+    def suffix_usage(balance_arr: np.ndarray) -> np.ndarray:
+        # suffix_arr[k] is the usage between record k and the last record
+        suffix_arr = np.zeros(max(size, 1), dtype=np.float64)
+        if size > 1:
+            pair_usage_arr = np.maximum(balance_arr[:-1] - balance_arr[1:], 0.0)
+            suffix_arr[:-1] = np.cumsum(pair_usage_arr[::-1])[::-1]
+        return suffix_arr
+
+    light_suffix_arr = suffix_usage(record_batch.light_balance)
+    ac_suffix_arr = suffix_usage(record_batch.ac_balance)
+
+    result_list: list[tuple[float, float, int]] = []
+    for window_start in window_start_list:
+        # index of the base point, the first record later than window start
+        base_idx = int(np.searchsorted(record_batch.timestamp, window_start, side='right'))
+        if base_idx + 1 >= size:
+            result_list.append((0.0, 0.0, 0))
+            continue
+        result_list.append((
+            float(light_suffix_arr[base_idx + 1]),
+            float(ac_suffix_arr[base_idx + 1]),
+            size - base_idx - 1,
+        ))
+
+    return result_list
+
+
+def _local_hour_start_arr(timestamp_arr: np.ndarray) -> np.ndarray:
+    """
+    Return start timestamps of the local hours that the timestamps belong to, the same as ``rollup.get_hour_start()``.
+
+    Only the UTC offset modulo one hour matters, which keeps the same across DST changes of whole hours.
+    """
+    if len(timestamp_arr) == 0:
+        return timestamp_arr.astype(np.int64)
+    utc_offset = datetime.fromtimestamp(int(timestamp_arr[0])).astimezone().utcoffset()
+    offset_mod: int = int(utc_offset.total_seconds()) % 3600
+    timestamp_arr = timestamp_arr.astype(np.int64)
+    return timestamp_arr - (timestamp_arr + offset_mod) % 3600
+
+
+def usage_analytics(
+        timestamp_arr: np.ndarray,
+        balance_arr: np.ndarray,
+        percentile_list: list[float],
+) -> elec_schema.UsageAnalytics:
+    """
+    Calculate the usage analytics of one account from balances with ascending timestamp.
+
+    - Usage between two adjacent records is counted into the local hour of the later record.
+    - Balance increase between two adjacent records is counted as a top-up, and is not usage.
+    - Average is calculated over the duration between the first and the last record.
+    """
+    diff_arr = np.diff(balance_arr)
+    pair_usage_arr = np.maximum(-diff_arr, 0.0)
+    top_up_arr = diff_arr[diff_arr > 0]
+    total_usage = float(pair_usage_arr.sum())
+
+    hour_distance: float = 0.0
+    if len(timestamp_arr) > 1:
+        hour_distance = float(timestamp_arr[-1] - timestamp_arr[0]) / 3600
+
+    peak_hour_start: int | None = None
+    peak_hour_usage: float = 0.0
+    percentile_dict: dict[str, float] = {}
+    if len(pair_usage_arr) > 0:
+        # sum usage by hour, timestamps are ascending so hours are sorted
+        hour_start_arr, hour_idx_arr = np.unique(_local_hour_start_arr(timestamp_arr[1:]), return_inverse=True)
+        hourly_usage_arr = np.bincount(hour_idx_arr, weights=pair_usage_arr)
+        peak_idx = int(np.argmax(hourly_usage_arr))
+        peak_hour_start = int(hour_start_arr[peak_idx])
+        peak_hour_usage = float(hourly_usage_arr[peak_idx])
+        if percentile_list:
+            percentile_value_arr = np.percentile(hourly_usage_arr, percentile_list)
+            percentile_dict = {
+                f'p{percentile:g}': round(float(value), 2)
+                for percentile, value in zip(percentile_list, percentile_value_arr)
+            }
+
+    return elec_schema.UsageAnalytics(
+        total_usage=total_usage,
+        avg_usage_per_hour=total_usage / hour_distance if hour_distance > 0 else 0.0,
+        peak_hour_start=peak_hour_start,
+        peak_hour_usage=peak_hour_usage,
+        hourly_usage_percentiles=percentile_dict,
+        top_up_count=len(top_up_arr),
+        top_up_amount=float(top_up_arr.sum()),
+    )
+
+
+def time_range_analytics(
+        record_batch: RecordBatch,
+        start_time: int,
+        end_time: int,
+        percentile_list: list[float],
+) -> elec_schema.TimeRangeAnalyticsOut:
+    """
+    Calculate analytics of records in time range ``[start_time, end_time]`` in one pass over the batch.
+
+    Parameters:
+
+    - ``record_batch`` All records in the time range with ascending timestamp.
+    - ``percentile_list`` Percentiles of hourly usage to calculate, each between 0 and 100.
+
+    Coverage ratio is the ratio of time slots in range that have at least one record, where each slot lasts
+    ``BACKEND_CATCH_TIME_DURATION_MIN`` minutes, the expected duration between two records.
+    """
+    slot_sec: int = config.general.BACKEND_CATCH_TIME_DURATION_MIN * 60
+    slot_count: int = (end_time - start_time) // slot_sec + 1
+    covered_slot_count: int = 0
+    if len(record_batch) > 0:
+        covered_slot_count = len(np.unique((record_batch.timestamp.astype(np.int64) - start_time) // slot_sec))
+
+    return elec_schema.TimeRangeAnalyticsOut(
+        start_timestamp=start_time,
+        end_timestamp=end_time,
+        first_record_timestamp=int(record_batch.timestamp[0]) if len(record_batch) > 0 else None,
+        last_record_timestamp=int(record_batch.timestamp[-1]) if len(record_batch) > 0 else None,
+        point_used=len(record_batch),
+        coverage_ratio=min(covered_slot_count / slot_count, 1.0),
+        light=usage_analytics(record_batch.timestamp, record_batch.light_balance, percentile_list),
+        ac=usage_analytics(record_batch.timestamp, record_batch.ac_balance, percentile_list),
+    )
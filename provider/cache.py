@@ -0,0 +1,229 @@
+import copy
+import functools
+import hashlib
+import secrets
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Any
+
+from pydantic import BaseModel
+from starlette.responses import Response
+
+import config.general
+from schema import general as gene_schema
+
+# Monotonically increasing data version, increased on every write through ``provider.database``.
+# Used as part of the cache key, so that result cached before a write will never be hit again.
+_data_version: int = 0
+
+# random id of this process, included in ETags so that a restarted backend never reuses ETags of the old one,
+# whose data version may be the same.
+_process_id: str = secrets.token_hex(8)
+
+
+def get_data_version() -> int:
+    return _data_version
+
+
+def bump_data_version() -> int:
+    """
+    Increase the data version. Should be called after every write to database.
+    """
+    global _data_version
+    _data_version += 1
+    return _data_version
+
+
+class LRUCache:
+    """
+    In-process LRU cache with bounded size and optional time-to-live of entries.
+
+    Members:
+
+    - ``max_size`` Max count of entries. The least recently used entry will be evicted when exceeded.
+    - ``ttl_seconds`` Entries older than this value will be treated as missed. ``None`` means never expires.
+    - ``hits`` ``misses`` Hit and miss counters.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float | None = None) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits: int = 0
+        self.misses: int = 0
+        # key -> (expire_at, value)
+        self._entry_dict: OrderedDict[Any, tuple[float | None, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entry_dict)
+
+    def get(self, key) -> tuple[bool, Any]:
+        """
+        Return a tuple ``(hit, value)``. ``value`` is ``None`` if not hit.
+        """
+        entry = self._entry_dict.get(key)
+        if entry is not None:
+            expire_at, value = entry
+            if expire_at is None or time.monotonic() < expire_at:
+                self._entry_dict.move_to_end(key)
+                self.hits += 1
+                return True, value
+            # expired
+            del self._entry_dict[key]
+
+        self.misses += 1
+        return False, None
+
+    def set(self, key, value) -> None:
+        expire_at = None
+        if self.ttl_seconds is not None:
+            expire_at = time.monotonic() + self.ttl_seconds
+
+        self._entry_dict[key] = (expire_at, value)
+        self._entry_dict.move_to_end(key)
+        while len(self._entry_dict) > self.max_size:
+            self._entry_dict.popitem(last=False)
+
+    def remove_if(self, predicate) -> int:
+        """
+        Remove entries that ``predicate(key, value)`` returns ``True``. Returns count of entries removed.
+        """
+        key_list = [key for key, (_, value) in self._entry_dict.items() if predicate(key, value)]
+        for key in key_list:
+            del self._entry_dict[key]
+        return len(key_list)
+
+    def clear(self) -> None:
+        self._entry_dict.clear()
+
+
+# cache used by read endpoints
+response_cache = LRUCache(
+    max_size=config.general.RESPONSE_CACHE_MAX_SIZE,
+    ttl_seconds=config.general.RESPONSE_CACHE_TTL_SECONDS,
+)
+
+
+# cache of results calculated from time ranges entirely in the past, e.g. time range analytics.
+# no new record will be caught into such range, so entries never expire unless the data version changes.
+past_range_cache = LRUCache(max_size=config.general.PAST_RANGE_CACHE_MAX_SIZE)
+
+
+def _make_key_part(value) -> Any:
+    """
+    Convert an argument to a hashable value used in cache key.
+    """
+    if isinstance(value, BaseModel):
+        return type(value).__name__, value.model_dump_json()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (list, tuple)):
+        return tuple(_make_key_part(item) for item in value)
+    return value
+
+
+def make_cache_key(name: str, args: tuple, kwargs: dict) -> tuple:
+    return (
+        name,
+        tuple(_make_key_part(arg) for arg in args),
+        tuple(sorted((key, _make_key_part(value)) for key, value in kwargs.items())),
+        get_data_version(),
+    )
+
+
+def _copy_if_response(value):
+    if not isinstance(value, Response):
+        return value
+    response = copy.copy(value)
+    response.raw_headers = list(value.raw_headers)
+    response.background = None
+    return response
+
+
+def cached_response(func=None, *, open_end_param: str | None = None):
+    """
+    Decorator of async read endpoints, cache the result in ``response_cache``.
+
+    Entries are keyed on the endpoint, its arguments and the current data version, so any write through
+    ``provider.database`` invalidates all entries cached before it.
+
+    :param open_end_param: Name of the end time parameter of the endpoint. If the parameter is `None` when called,
+        the time range ends at current time and the result changes with time even if no record is written, so it is
+        NOT cached. Endpoints always depending on current time (e.g. statistics of trailing windows) should not use
+        this decorator at all.
+
+    Usage::
+
+        @cache.cached_response
+        async def endpoint(...): ...
+
+        @cache.cached_response(open_end_param='end_time')
+        async def endpoint(start_time: int, end_time: int | None = None): ...
+
+    Notice:
+
+    - Writes from another process (e.g. ``catch_record.py`` launched by cron) could not increase the data version
+      of this process, such results could be outdated for at most ``RESPONSE_CACHE_TTL_SECONDS``.
+    - Exceptions are not cached.
+    - If the endpoint returns a ``Response``, copies are stored and returned, so that the encoded body is reused
+      while headers and background tasks, which may be modified when sending, are not shared between requests.
+    """
+    if func is None:
+        return functools.partial(cached_response, open_end_param=open_end_param)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        # result of a range ending at current time depends on when it's calculated
+        if open_end_param is not None and kwargs.get(open_end_param) is None:
+            return await func(*args, **kwargs)
+
+        # key must be determined before calling, since data version may change during the call
+        key = make_cache_key(func.__qualname__, args, kwargs)
+        hit, value = response_cache.get(key)
+        if hit:
+            return _copy_if_response(value)
+
+        value = await func(*args, **kwargs)
+        response_cache.set(key, _copy_if_response(value))
+        return value
+
+    return wrapper
+
+
+def get_cache_info() -> gene_schema.CacheInfoOut:
+    return gene_schema.CacheInfoOut(
+        size=len(response_cache),
+        max_size=response_cache.max_size,
+        hits=response_cache.hits,
+        misses=response_cache.misses,
+        data_version=get_data_version(),
+    )
+
+
+def make_etag(*part_list) -> str:
+    """
+    Return a strong ETag generated from the current data version and ``part_list``.
+
+    ``part_list`` should contain everything else the response depends on, e.g. request path and
+    the latest record timestamp, which covers the records written by other processes.
+    """
+    digest = hashlib.blake2b(
+        repr((_process_id, get_data_version(), part_list)).encode(),
+        digest_size=12,
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Check if ``etag`` matches the value of ``If-None-Match`` request header, using weak comparison.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.removeprefix('W/') == etag.removeprefix('W/'):
+            return True
+    return False
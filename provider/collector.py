@@ -0,0 +1,188 @@
+"""
+Resident record collector running inside the backend process.
+
+Instead of launching ``catch_record.py`` by cron, the collector catches records of all configured rooms from
+AHU website every ``COLLECTOR_INTERVAL_SEC`` seconds using the shared aiohttp session and database engine.
+"""
+import asyncio
+import math
+import random
+import time
+
+from loguru import logger
+
+import config.general
+from provider import ahu
+from provider import database
+from schema import ahu as ahu_schema
+from schema.sql import PaginationConfig
+
+
+class Collector:
+    """
+    Interval scheduler that catches records of all rooms from AHU website.
+
+    Scheduling:
+
+    - Ticks are aligned to multiples of ``interval_sec`` since UNIX epoch, each tick is delayed by a random
+      jitter between 0 and ``jitter_sec``, so that requests are not always sent at the same second.
+    - When started, records are caught immediately if the latest record of any room is older than one interval.
+    - If ticks are missed (e.g. the process or host was suspended, or collection took longer than an interval),
+      one record is caught immediately and the rest missed ticks are skipped, since balance of the past could not be
+      caught anymore.
+    - Only one collection runs at a time. If a tick comes while a manual collection is running, the tick waits for it
+      and is covered by it.
+
+    Errors raised when collecting are logged and recorded in status, and never stop the scheduler.
+    """
+
+    def __init__(self, interval_sec: float, jitter_sec: float = 0) -> None:
+        self.interval_sec = interval_sec
+        self.jitter_sec = jitter_sec
+        self.status = ahu_schema.CollectorStatusOut(interval_sec=interval_sec, room_count=len(ahu.get_room_dict()))
+        self._task: asyncio.Task | None = None
+        # held while collecting, so that scheduled and manual collections never overlap
+        self._collect_lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def collecting(self) -> bool:
+        return self._collect_lock.locked()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f'Collector started, interval: {self.interval_sec}s, jitter: {self.jitter_sec}s')
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.status.next_run_at = None
+        logger.info('Collector stopped')
+
+    async def collect_once(self) -> list[ahu_schema.RoomCatchResult]:
+        """
+        Catch records of all rooms from AHU website concurrently and add them to database.
+
+        Returns the result of each room. Rooms failed to catch or add record have ``error`` set.
+        If another collection is running, waits for it to finish before starting, check ``collecting`` before calling
+        if the same records should not be caught twice.
+        """
+        async with self._collect_lock:
+            return await self._collect()
+
+    async def _collect(self) -> list[ahu_schema.RoomCatchResult]:
+        self.status.last_run_at = time.time()
+        start_time = time.perf_counter()
+        try:
+            result_list = await ahu.get_records_of_rooms()
+            for result in result_list:
+                if result.record is None:
+                    continue
+                try:
+                    await database.add_record(result.record, room_id=result.room_id)
+                except Exception as e:
+                    logger.exception(e)
+                    result.error = f'{type(e).__name__}: {e}'
+        except Exception as e:
+            result_list = []
+            failed_room_list = list(ahu.get_room_dict().keys())
+            error_message = f'{type(e).__name__}: {e}'
+            logger.exception(e)
+        else:
+            failed_room_list = [result.room_id for result in result_list if result.error is not None]
+            error_message = '; '.join(
+                f'{result.room_id}: {result.error}' for result in result_list if result.error is not None)
+
+        self.status.room_count = len(ahu.get_room_dict())
+        self.status.last_failed_rooms = failed_room_list
+        if failed_room_list:
+            self.status.error_count += 1
+            self.status.last_error_at = time.time()
+            self.status.last_error = error_message
+            logger.error(f'Collector failed to catch record of room(s): {failed_room_list}')
+            return result_list
+
+        self.status.success_count += 1
+        self.status.last_success_at = time.time()
+        self.status.last_latency_ms = int((time.perf_counter() - start_time) * 1000)
+        self.status.last_request_timings = [
+            timing for result in result_list for timing in result.request_timings]
+        logger.debug(f'Collector caught records of {len(result_list)} room(s) in {self.status.last_latency_ms}ms')
+        return result_list
+
+    def _get_next_tick(self, timestamp: float) -> float:
+        return (math.floor(timestamp / self.interval_sec) + 1) * self.interval_sec
+
+    async def _catch_up_on_start(self) -> bool:
+        """
+        Catch records if the latest record of any room is older than one interval. Returns if any record caught.
+        """
+        for room_id in ahu.get_room_dict():
+            latest_batch = await database.get_records(PaginationConfig(size=1, index=0), room_id=room_id)
+            if len(latest_batch) == 0 or time.time() - float(latest_batch.timestamp[0]) >= self.interval_sec:
+                logger.info(f'Latest record of room {room_id} is older than collector interval, catching up')
+                result_list = await self.collect_once()
+                return any(result.error is None for result in result_list)
+        return False
+
+    async def _run(self) -> None:
+        caught_up: bool = False
+        try:
+            caught_up = await self._catch_up_on_start()
+        except Exception as e:
+            logger.exception(e)
+
+        next_tick = self._get_next_tick(time.time())
+        # skip the first tick if it's too close to the catch-up record
+        if caught_up and next_tick - time.time() < self.interval_sec / 2:
+            next_tick += self.interval_sec
+        while True:
+            run_at = next_tick + random.uniform(0, self.jitter_sec)
+            self.status.next_run_at = run_at
+            delay = run_at - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if self.collecting:
+                # a manual collection is running, which covers this tick
+                async with self._collect_lock:
+                    pass
+            else:
+                await self.collect_once()
+
+            # ticks passed since the scheduled one, while sleeping longer than expected (e.g. host suspended) or
+            # during collection, are covered by this run and skipped
+            current_time = time.time()
+            missed_count = max(0, math.floor((current_time - next_tick) / self.interval_sec))
+            if missed_count > 0:
+                self.status.missed_ticks += missed_count
+                logger.warning(f'Collector missed {missed_count} tick(s), skipped')
+            next_tick = max(next_tick + self.interval_sec, self._get_next_tick(current_time))
+
+    def get_status(self) -> ahu_schema.CollectorStatusOut:
+        status = self.status.model_copy()
+        status.enabled = config.general.COLLECTOR_ENABLED
+        status.running = self.running
+        # healthy if a record has been caught successfully within two intervals
+        status.healthy = (
+                status.last_success_at is not None
+                and time.time() - status.last_success_at <= 2 * self.interval_sec + self.jitter_sec
+        )
+        return status
+
+
+collector = Collector(
+    interval_sec=config.general.COLLECTOR_INTERVAL_SEC,
+    jitter_sec=config.general.COLLECTOR_JITTER_SEC,
+)
@@ -1,50 +1,243 @@
+import asyncio
+import base64
+import binascii
+import os
 import time
+from typing import AsyncIterator
 
 from loguru import logger
 
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+from sqlalchemy import select, func, delete, text, event
 from sqlalchemy.sql import and_
 from sqlalchemy import exc as sqlexc
+from sqlalchemy.dialects import mysql as mysql_dialect
+from sqlalchemy.dialects import sqlite as sqlite_dialect
 
 from exception import error as exc
 
+import config.general
 from config import sql
+from provider import rollup
+from provider import retention
+from provider import cache
+from provider import metrics
+from provider import slow_query
+from provider import usage_series
 from provider.algorithms import (
-    convert_balance_list_to_usage_list,
-    convert_to_model_record_list,
+    convert_balance_batch_to_usage_batch,
+    downsample_balance_batch,
+    get_auto_merge_ratio,
+    parse_statistics_window,
+    time_range_analytics,
+    trailing_window_usage,
+    round_record_batch,
+    UsageStreamConverter,
     time_range_checker,
 )
 
-from schema.electric import SQLRecord, BalanceRecord, CountInfoOut, PeriodUsageInfoOut
+from schema.electric import SQLRecord, BalanceRecord, RecordBatch, CountInfoOut, PeriodUsageInfoOut
+from schema.electric import SQLHourlyUsage, SQLDailyUsage, BulkInsertResultOut, DEFAULT_ROOM_ID
+from schema.electric import CompactionResultOut
+from schema.sql import SQLBaseModel
 from schema import sql as sql_schema
 from schema import electric as elec_schema
 from schema import general as general_schema
 
-_engine = create_async_engine(
-    f"mysql+aiomysql://"
-    f"{sql.DB_USERNAME}:{sql.DB_PASSWORD}"
-    f"@{sql.DB_HOST}/{sql.DB_NAME}"
-)
+# engine and sessionmaker are created lazily by ``get_engine()`` and ``init_sessionmaker()``
+# using the backend and pool configs in ``config/sql.py``.
+_engine: AsyncEngine | None = None
 
 # async version sessionmaker
-# call init_sessionmaker() before use this instance
-session_maker: async_sessionmaker | None = async_sessionmaker(_engine, expire_on_commit=False)
+# use ``session_maker()`` to create a session, which will initialize this instance if it's not ready.
+_session_maker: async_sessionmaker | None = None
+
+
+def get_database_url() -> str:
+    """
+    Return the SQLAlchemy database URL based on ``config/sql.py``.
+    """
+    if sql.DB_URL is not None:
+        return sql.DB_URL
+
+    if sql.DB_BACKEND == 'sqlite':
+        return f"sqlite+aiosqlite:///{sql.SQLITE_PATH}"
+
+    if sql.DB_BACKEND == 'mysql':
+        return (
+            f"mysql+aiomysql://"
+            f"{sql.DB_USERNAME}:{sql.DB_PASSWORD}"
+            f"@{sql.DB_HOST}/{sql.DB_NAME}"
+        )
+
+    raise ValueError(f'Unsupported database backend: {sql.DB_BACKEND}')
+
+
+def init_engine(database_url: str | None = None, force_create: bool = False) -> AsyncEngine:
+    """
+    Initialize the engine if it's not ready, and return it.
+
+    Parameters:
+
+    - ``database_url`` If not ``None``, use this URL instead of the one in config.
+    - ``force_create`` If ``true``, always create a new engine. The old engine will NOT be disposed.
+    """
+    global _engine, _session_maker
+    if _engine is not None and not force_create:
+        return _engine
+
+    if database_url is None:
+        database_url = get_database_url()
+
+    engine_kwargs: dict = {}
+    if database_url.startswith('sqlite'):
+        # make sure the directory of SQLite database file exists
+        sqlite_path = database_url.split(':///', 1)[-1] if ':///' in database_url else ''
+        if sqlite_path and sqlite_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(sqlite_path)), exist_ok=True)
+    else:
+        engine_kwargs = {
+            'pool_size': sql.DB_POOL_SIZE,
+            'max_overflow': sql.DB_POOL_MAX_OVERFLOW,
+            'pool_recycle': sql.DB_POOL_RECYCLE_SEC,
+            'pool_pre_ping': sql.DB_POOL_PRE_PING,
+            'pool_timeout': sql.DB_POOL_TIMEOUT_SEC,
+        }
+
+    _engine = create_async_engine(database_url, **engine_kwargs)
+    _session_maker = async_sessionmaker(_engine, expire_on_commit=False)
+    _instrument_engine(_engine)
+    logger.info(f'Database engine created, backend: {_engine.dialect.name}')
+    return _engine
+
+
+# operation label of SQL statement metrics, other statements are labeled as "other"
+_METRIC_OPERATION_SET: set[str] = {'SELECT', 'INSERT', 'UPDATE', 'DELETE'}
+
+
+def _get_statement_operation(statement: str) -> str:
+    operation = statement.lstrip()[:6].upper()
+    return operation if operation in _METRIC_OPERATION_SET else 'OTHER'
+
+
+def _instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Record duration and errors of every SQL statement to ``provider.metrics`` using engine events,
+    and report connection pool status when metrics are collected.
+
+    Statements slower than ``SLOW_QUERY_THRESHOLD_MS`` are recorded by ``provider.slow_query``.
+    """
+
+    @event.listens_for(engine.sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info['query_start_time'].pop()
+        metrics.db_query_duration_seconds.observe(duration, _get_statement_operation(statement))
+        if slow_query.is_slow(duration):
+            slow_query.record_slow_query(engine, statement, parameters, duration, executemany)
+
+    @event.listens_for(engine.sync_engine, 'handle_error')
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('query_start_time'):
+            conn.info['query_start_time'].pop()
+        metrics.db_query_errors_total.inc(_get_statement_operation(exception_context.statement or ''))
+
+    def get_pool_status() -> dict[tuple, float]:
+        pool = engine.pool
+        status_dict: dict[tuple, float] = {}
+        # not every pool class supports all these methods, e.g. ``NullPool``
+        for state, method_name in [
+            ('size', 'size'),
+            ('checked_out', 'checkedout'),
+            ('idle', 'checkedin'),
+            ('overflow', 'overflow'),
+        ]:
+            method = getattr(pool, method_name, None)
+            if method is not None:
+                status_dict[(state,)] = method()
+        # ``QueuePool.overflow()`` is negative when the pool is not full
+        if ('overflow',) in status_dict:
+            status_dict[('overflow',)] = max(0, status_dict[('overflow',)])
+        return status_dict
+
+    metrics.db_pool_connections.set_function(get_pool_status)
+
+
+def get_engine() -> AsyncEngine:
+    """
+    Return the engine, create it if it's not ready.
+    """
+    return init_engine()
+
+
+def session_maker() -> AsyncSession:
+    """
+    Create a new ``AsyncSession``, the engine and sessionmaker will be initialized if not ready.
+    """
+    if _session_maker is None:
+        init_engine()
+    return _session_maker()
+
+
+async def warm_up_engine() -> None:
+    """
+    Open connections of the pool in advance, so the first requests don't need to wait for connecting.
+
+    The count of opened connections is ``DB_POOL_SIZE``, or one for SQLite.
+    """
+    engine = get_engine()
+    warm_up_count: int = 1 if engine.dialect.name == 'sqlite' else sql.DB_POOL_SIZE
+
+    async def open_connection():
+        async with engine.connect() as conn:
+            await conn.execute(text('SELECT 1'))
+
+    await asyncio.gather(*[open_connection() for _ in range(warm_up_count)])
+    logger.success(f'Database connection pool warmed up with {warm_up_count} connection(s)')
+
+
+async def dispose_engine() -> None:
+    """
+    Close all connections of the engine. Engine will be created again when needed.
+    """
+    global _engine, _session_maker
+    if _engine is None:
+        return
+
+    await _engine.dispose()
+    _engine = None
+    _session_maker = None
+    logger.info('Database engine disposed')
+
+
+def select_record_columns(room_id: str = DEFAULT_ROOM_ID):
+    """
+    Return a select statement of the timestamp and balance columns of ``SQLRecord`` of a room.
+
+    Selecting columns instead of ORM entities avoids creating ORM objects for every row.
+    Rows could be converted to a ``RecordBatch`` using ``RecordBatch.from_rows()``.
+    """
+    return select(SQLRecord.timestamp, SQLRecord.light_balance, SQLRecord.ac_balance).where(
+        SQLRecord.room_id == room_id)
 
 
 async def init_sessionmaker(force_create: bool = False) -> async_sessionmaker:
     """
     (Async) Tool function to initialize the session maker if it's not ready.
-    :return: None
+    :return: The session maker
     """
-    global session_maker
-    if (session_maker is None) or force_create:
+    global _session_maker
+    if (_session_maker is None) or force_create:
         logger.info('Session maker initializing...')
-        session_maker = async_sessionmaker(_engine, expire_on_commit=False)
+        _session_maker = async_sessionmaker(get_engine(), expire_on_commit=False)
         logger.success('Session maker initialized')
     else:
         logger.debug('Session maker already ready')
-    return session_maker
+    return _session_maker
 
 
 # deprecated
@@ -64,13 +257,15 @@ async def init_sessionmaker(force_create: bool = False) -> async_sessionmaker:
 #     return wrapper
 
 
-async def add_record(record_info: BalanceRecord):
+async def add_record(record_info: BalanceRecord, room_id: str = DEFAULT_ROOM_ID):
     """
     Add a record to the database
     :param record_info: dict that contain light and ac balance.
+    :param room_id: The room this record belongs to.
     :return:
     """
     new_rec = SQLRecord(
+        room_id=room_id,
         timestamp=int(record_info.timestamp),
         light_balance=record_info.light_balance,
         ac_balance=record_info.ac_balance,
@@ -79,21 +274,142 @@ async def add_record(record_info: BalanceRecord):
     async with session_maker() as session:
         async with session.begin():
             session.add(new_rec)
+            await session.flush()
+            # keep usage rollups up-to-date in the same transaction
+            await rollup.update_rollups_on_insert(session, new_rec)
+
+    # appending newer record is picked up incrementally, only records inserted into the past invalidate the series
+    usage_series.usage_series_cache.invalidate(room_id, new_rec.timestamp)
+    cache.bump_data_version()
+
 
+def _upsert_record_stmt(dialect_name: str):
+    """
+    Return an ``INSERT`` statement of ``SQLRecord`` that overwrites balances when the record of the same room and
+    timestamp already exists.
+    """
+    if dialect_name == 'mysql':
+        stmt = mysql_dialect.insert(SQLRecord)
+        return stmt.on_duplicate_key_update(
+            light_balance=stmt.inserted.light_balance,
+            ac_balance=stmt.inserted.ac_balance,
+        )
+
+    if dialect_name == 'sqlite':
+        stmt = sqlite_dialect.insert(SQLRecord)
+        return stmt.on_conflict_do_update(
+            index_elements=[SQLRecord.room_id, SQLRecord.timestamp],
+            set_={
+                'light_balance': stmt.excluded.light_balance,
+                'ac_balance': stmt.excluded.ac_balance,
+            },
+        )
 
-async def get_record_count() -> CountInfoOut:
+    raise ValueError(f'Upsert not supported by database backend: {dialect_name}')
+
+
+async def add_records_bulk(
+        record_list: list[BalanceRecord],
+        overwrite: bool = True,
+        room_id: str = DEFAULT_ROOM_ID,
+) -> BulkInsertResultOut:
     """
-    Get count of records in the database
+    Add a list of records to database in a single transaction.
+
+    Parameters:
+
+    - ``record_list`` Records need to be added. Order is not required.
+    - ``overwrite`` If `true`, balances of existing records with the same timestamp will be overwritten,
+      otherwise the existing ones are kept.
+    - ``room_id`` The room these records belong to.
+
+    Returns:
+
+    Count of inserted, updated and skipped records. Check out ``BulkInsertResultOut`` for more info.
+
+    Notice:
+
+    - All records are written by one executemany ``INSERT ... ON DUPLICATE KEY UPDATE`` statement
+      (``ON CONFLICT DO UPDATE`` for SQLite).
+    - If there are duplicated timestamps in ``record_list``, the last one is used.
+    """
+    if len(record_list) > config.general.BULK_INSERT_MAX_RECORDS:
+        raise exc.ParamError(
+            'record_list',
+            f'At most {config.general.BULK_INSERT_MAX_RECORDS} records could be added in one request')
+
+    # deduplicate timestamps, later record overrides the earlier one
+    record_dict: dict[int, tuple[float, float]] = {}
+    for record in record_list:
+        if record.timestamp < 0:
+            raise exc.ParamError('timestamp', 'Timestamp of bulk records should be a valid UNIX timestamp')
+        record_dict[int(record.timestamp)] = (record.light_balance, record.ac_balance)
+    skipped: int = len(record_list) - len(record_dict)
+
+    if not record_dict:
+        return BulkInsertResultOut(inserted=0, updated=0, skipped=skipped)
+
+    timestamp_list = list(record_dict.keys())
+
+    async with session_maker() as session:
+        async with session.begin():
+            # find out existing records
+            existing_dict: dict[int, tuple[float, float]] = {}
+            for chunk_start in range(0, len(timestamp_list), 1000):
+                row_list = (await session.execute(
+                    select_record_columns(room_id).where(
+                        SQLRecord.timestamp.in_(timestamp_list[chunk_start:chunk_start + 1000]))
+                )).all()
+                for row in row_list:
+                    existing_dict[row.timestamp] = (round(row.light_balance, 2), round(row.ac_balance, 2))
+
+            # classify records
+            inserted: int = 0
+            updated: int = 0
+            value_list: list[dict] = []
+            for timestamp, (light_balance, ac_balance) in record_dict.items():
+                existing = existing_dict.get(timestamp)
+                if existing is None:
+                    inserted += 1
+                elif (not overwrite) or existing == (light_balance, ac_balance):
+                    skipped += 1
+                    continue
+                else:
+                    updated += 1
+                value_list.append({
+                    'room_id': room_id,
+                    'timestamp': timestamp,
+                    'light_balance': light_balance,
+                    'ac_balance': ac_balance,
+                })
+
+            if value_list:
+                await session.execute(_upsert_record_stmt(session.bind.dialect.name), value_list)
+
+                # recalculate rollups of affected days
+                await rollup.refresh_rollups_of_timestamps(
+                    session, [value['timestamp'] for value in value_list], room_id=room_id)
+
+    if value_list:
+        usage_series.usage_series_cache.invalidate(room_id, min(value['timestamp'] for value in value_list))
+        cache.bump_data_version()
+
+    return BulkInsertResultOut(inserted=inserted, updated=updated, skipped=skipped)
+
+
+async def get_record_count(room_id: str = DEFAULT_ROOM_ID) -> CountInfoOut:
+    """
+    Get count of records of a room in the database
     """
     async with session_maker() as session:
         async with session.begin():
             # statement
-            stmt = select(func.count(SQLRecord.timestamp)).distinct()
+            stmt = select(func.count(SQLRecord.timestamp)).where(SQLRecord.room_id == room_id)
             timestamp_7_day_ago = time.time() - 7 * 24 * 60 * 60
             timestamp_7_day_ago = int(timestamp_7_day_ago)
 
-            stmt_last_7 = select(
-                func.count(SQLRecord.timestamp)).where(SQLRecord.timestamp > timestamp_7_day_ago)
+            stmt_last_7 = select(func.count(SQLRecord.timestamp)).where(
+                and_(SQLRecord.room_id == room_id, SQLRecord.timestamp > timestamp_7_day_ago))
 
             # retrive data
             try:
@@ -107,26 +423,127 @@ async def get_record_count() -> CountInfoOut:
             return CountInfoOut(total=res, last_7_days=res_last_7)
 
 
-async def get_records(pagination: sql_schema.PaginationConfig) -> list[BalanceRecord]:
-    stmt = select(SQLRecord).order_by(SQLRecord.timestamp.desc())
+async def get_records(pagination: sql_schema.PaginationConfig, room_id: str = DEFAULT_ROOM_ID) -> RecordBatch:
+    """
+    Get records of a room with pagination, the latest record comes first. Values are rounded to 2 decimal places.
+    """
+    stmt = select_record_columns(room_id).order_by(SQLRecord.timestamp.desc())
     stmt = pagination.use_on(stmt)
     async with session_maker() as session:
         try:
-            res = await session.scalars(stmt)
+            row_list = (await session.execute(stmt)).all()
         except sqlexc.NoSuchColumnError as e:
-            res = []
-        record_list: list[BalanceRecord] = res.all()
-        return record_list
-    pass
+            row_list = []
+        return round_record_batch(RecordBatch.from_rows(row_list))
+
+
+async def get_latest_record_timestamp(room_id: str = DEFAULT_ROOM_ID) -> int | None:
+    """
+    Return timestamp of the latest record of a room, or ``None`` if there is no record.
+    Only the ``(room_id, timestamp)`` primary key index is read.
+    """
+    async with session_maker() as session:
+        return (await session.execute(
+            select(func.max(SQLRecord.timestamp)).where(SQLRecord.room_id == room_id)
+        )).scalar_one_or_none()
+
+
+# direction marks used in record page cursor
+_CURSOR_OLDER = 'o'
+_CURSOR_NEWER = 'n'
+
 
+def _encode_record_cursor(direction: str, timestamp: int) -> str:
+    return base64.urlsafe_b64encode(f'{direction}:{int(timestamp)}'.encode()).decode().rstrip('=')
 
-async def find_record_timestamp_days_ago(days: int = 7) -> int:
+
+def _decode_record_cursor(cursor: str) -> tuple[str, int]:
+    """
+    Decode a record page cursor, returns ``(direction, timestamp)``. Raise ``ParamError`` if cursor is invalid.
+    """
+    try:
+        direction, timestamp = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().split(':')
+        if direction not in (_CURSOR_OLDER, _CURSOR_NEWER):
+            raise ValueError
+        return direction, int(timestamp)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise exc.ParamError('cursor', 'Invalid pagination cursor')
+
+
+async def get_records_by_cursor(
+        pagination: sql_schema.KeysetPaginationConfig,
+        room_id: str = DEFAULT_ROOM_ID,
+) -> elec_schema.RecordPageOut:
+    """
+    Get records of a room with cursor based pagination, the latest record comes first.
+
+    Each page is a range seek on ``(room_id, timestamp)`` primary key with at most ``size + 1`` rows read,
+    no matter how deep the page is.
+
+    Returns:
+
+    ``RecordPageOut`` with records and the cursors of next (older) and previous (newer) page.
+    If the page is empty, both cursors are ``None``.
+    """
+    stmt = select_record_columns(room_id)
+    direction = _CURSOR_OLDER
+    if pagination.cursor is None:
+        stmt = stmt.order_by(SQLRecord.timestamp.desc())
+    else:
+        direction, timestamp = _decode_record_cursor(pagination.cursor)
+        if direction == _CURSOR_OLDER:
+            stmt = stmt.where(SQLRecord.timestamp < timestamp).order_by(SQLRecord.timestamp.desc())
+        else:
+            stmt = stmt.where(SQLRecord.timestamp > timestamp).order_by(SQLRecord.timestamp.asc())
+
+    # fetch one more row to check if there are more rows in this direction
+    stmt = stmt.limit(pagination.size + 1)
+
+    async with session_maker() as session:
+        row_list = (await session.execute(stmt)).all()
+        has_more: bool = len(row_list) > pagination.size
+        row_list = row_list[:pagination.size]
+
+        if not row_list:
+            return elec_schema.RecordPageOut(records=[])
+
+        # make page latest first
+        if direction == _CURSOR_NEWER:
+            row_list.reverse()
+        newest_timestamp: int = row_list[0].timestamp
+        oldest_timestamp: int = row_list[-1].timestamp
+
+        # check if there are rows in the opposite direction, the first page has no newer rows
+        if direction == _CURSOR_OLDER:
+            has_older: bool = has_more
+            has_newer: bool = False
+            if pagination.cursor is not None:
+                has_newer = (await session.execute(
+                    select(SQLRecord.timestamp).where(
+                        and_(SQLRecord.room_id == room_id, SQLRecord.timestamp > newest_timestamp)).limit(1)
+                )).first() is not None
+        else:
+            has_newer: bool = has_more
+            has_older: bool = (await session.execute(
+                select(SQLRecord.timestamp).where(
+                    and_(SQLRecord.room_id == room_id, SQLRecord.timestamp < oldest_timestamp)).limit(1)
+            )).first() is not None
+
+    return elec_schema.RecordPageOut(
+        records=round_record_batch(RecordBatch.from_rows(row_list)).to_record_list(),
+        next_cursor=_encode_record_cursor(_CURSOR_OLDER, oldest_timestamp) if has_older else None,
+        prev_cursor=_encode_record_cursor(_CURSOR_NEWER, newest_timestamp) if has_newer else None,
+    )
+
+
+async def find_record_timestamp_days_ago(days: int = 7, room_id: str = DEFAULT_ROOM_ID) -> int:
     """
     Find out and return an `int` timestamp that closest to a specified number of days ago.
 
     Parameters:
 
     - ``days`` How many days ago you want to find the timestamp closest to.
+    - ``room_id`` Only records of this room are considered.
 
     Notice here days **does NOT mean natural day** but means 24 hours.
 
@@ -138,10 +555,14 @@ async def find_record_timestamp_days_ago(days: int = 7) -> int:
     ideal_timestamp: int = int(time.time()) - days * 24 * 60 * 60
 
     stmt_find_after_ideal_timestamp = (select(func.min(SQLRecord.timestamp))
-                                       .where(SQLRecord.timestamp > ideal_timestamp)
+                                       .where(and_(SQLRecord.room_id == room_id,
+                                                   SQLRecord.timestamp > ideal_timestamp))
                                        .order_by(SQLRecord.timestamp))
 
-    stmt_latest_timestamp = (select(SQLRecord.timestamp).order_by(SQLRecord.timestamp.desc()).limit(limit=1))
+    stmt_latest_timestamp = (select(SQLRecord.timestamp)
+                             .where(SQLRecord.room_id == room_id)
+                             .order_by(SQLRecord.timestamp.desc())
+                             .limit(limit=1))
 
     async with session_maker() as session:
         async with session.begin():
@@ -203,62 +624,118 @@ def calculate_usage(
     }
 
 
-async def get_statistics() -> elec_schema.Statistics:
-    try:
-        timestamp_day_ago: int = await find_record_timestamp_days_ago(1)
-        timestamp_7_days_ago: int = await find_record_timestamp_days_ago(7)
-    except exc.NoResultError as e:
-        raise exc.NoResultError(
-            'No record found. Statistics only available when there is at least one record in database'
-        )
+async def get_multi_window_statistics(
+        window_list: list[str],
+        room_id: str = DEFAULT_ROOM_ID,
+) -> elec_schema.MultiWindowStatisticsOut:
+    """
+    Get usage statistics of multiple trailing windows ending at current time, e.g. ``['1d', '7d', '30d']``.
+
+    Records of the widest window are read by a single query, then usage of all windows is calculated from them
+    in one pass. Check out ``trailing_window_usage()`` for more info.
+
+    Parameters:
 
-    usage_day: dict = {}
-    usage_week: dict = {}
+    - ``window_list`` Windows like ``12h``, ``7d`` or ``4w``. Check out ``parse_statistics_window()``.
+    - ``room_id`` The room to calculate statistics of.
+
+    Raises ``NoResultError`` if there is no record of this room in database.
+    """
+    if not window_list:
+        raise exc.ParamError('windows', 'At least one statistics window is required')
+    window_sec_list: list[int] = [parse_statistics_window(window) for window in window_list]
+
+    current_timestamp: int = int(time.time())
+    widest_start: int = current_timestamp - max(window_sec_list)
 
     async with session_maker() as session:
-        async with session.begin():
-            # retrieve and calc daily usage
-            res = await session.scalars(
-                select(SQLRecord).where(SQLRecord.timestamp > timestamp_day_ago).order_by(SQLRecord.timestamp.asc())
-            )
-            record_list: list[BalanceRecord] = res.all()
-            usage_day = calculate_usage(record_list)
+        row_list = (await session.execute(
+            select_record_columns(room_id).where(and_(
+                SQLRecord.timestamp > widest_start,
+                SQLRecord.timestamp <= current_timestamp,
+            )).order_by(SQLRecord.timestamp.asc())
+        )).all()
+
+        # no record in widest window, check if there is any record at all
+        if not row_list:
+            has_record: bool = (await session.execute(
+                select(SQLRecord.timestamp).where(SQLRecord.room_id == room_id).limit(1)
+            )).first() is not None
+            if not has_record:
+                raise exc.NoResultError(
+                    'No record found. Statistics only available when there is at least one record in database'
+                )
+
+    usage_list = trailing_window_usage(
+        RecordBatch.from_rows(row_list),
+        [current_timestamp - window_sec for window_sec in window_sec_list],
+    )
 
-            # retrieve and calc weekly usage
-            res = await session.scalars(
-                select(SQLRecord).where(SQLRecord.timestamp > timestamp_7_days_ago).order_by(SQLRecord.timestamp.asc())
+    return elec_schema.MultiWindowStatisticsOut(
+        timestamp=time.time(),
+        windows=[
+            elec_schema.WindowStatistics(
+                window=window,
+                window_sec=window_sec,
+                start_timestamp=current_timestamp - window_sec,
+                end_timestamp=current_timestamp,
+                light_usage=round(light_usage, 2),
+                ac_usage=round(ac_usage, 2),
+                point_used=point_used,
             )
-            record_list: list[BalanceRecord] = res.all()
-            usage_week = calculate_usage(record_list)
+            for window, window_sec, (light_usage, ac_usage, point_used)
+            in zip(window_list, window_sec_list, usage_list)
+        ],
+    )
+
+
+async def get_statistics(room_id: str = DEFAULT_ROOM_ID) -> elec_schema.Statistics:
+    """
+    Get usage statistics of the last day and the last week. Wrapper of ``get_multi_window_statistics()``.
+    """
+    multi_window_statistics = await get_multi_window_statistics(['1d', '7d'], room_id=room_id)
+    statistics_day, statistics_week = multi_window_statistics.windows
 
     return elec_schema.Statistics(
-        timestamp=time.time(),
-        light_total_last_day=usage_day['light_usage'],
-        ac_total_last_day=usage_day['ac_usage'],
-        light_total_last_week=usage_week['light_usage'],
-        ac_total_last_week=usage_week['ac_usage'],
+        timestamp=multi_window_statistics.timestamp,
+        light_total_last_day=statistics_day.light_usage,
+        ac_total_last_day=statistics_day.ac_usage,
+        light_total_last_week=statistics_week.light_usage,
+        ac_total_last_week=statistics_week.ac_usage,
     )
 
 
 async def get_recent_records(
         days: int,
         usage_convert_config: elec_schema.UsageConvertConfig,
-) -> list[SQLRecord]:
+        max_points: int | None = None,
+        room_id: str = DEFAULT_ROOM_ID,
+) -> RecordBatch:
     """
-    Get all the records in recent days.
+    Get all the records of a room in recent days.
 
     - ``days`` The days you want to get records starts from.
     - ``usage_convert_config`` If not `None`, convert the balance list to usage list using this config.
+    - ``max_points`` If not `None`, downsample the result. Check out ``get_records_by_time_range()``.
 
     Returns:
 
-    Returns A list of BalanceRecord objects. If no result, return empty list.
+    Returns A ``RecordBatch``. If no result, return empty batch.
     Notes that the list return is asc by timestamp, means old record in the beginning.
+
+    Notice:
+
+    - When converting to usage list without downsampling, the result is served by the incremental usage series
+      cache if ``USAGE_SERIES_CACHE_ENABLED``. Check out ``provider/usage_series.py``.
     """
     timestamp_day_ago: int = int(time.time()) - days * 24 * 60 * 60
+    if usage_series.is_cacheable(usage_convert_config, max_points):
+        return await _get_recent_usage_series(days, usage_convert_config, room_id)
     return await get_records_by_time_range(start_time=timestamp_day_ago,
                                            end_time=None,
-                                           usage_convert_config=usage_convert_config)
+                                           usage_convert_config=usage_convert_config,
+                                           max_points=max_points,
+                                           room_id=room_id)
     # stmt = select(SQLRecord).where(SQLRecord.timestamp >= timestamp_day_ago).order_by(SQLRecord.timestamp.asc())
     # async with session_maker() as session:
     #     try:
@@ -284,6 +761,49 @@ async def get_recent_records(
     #         return []
 
 
+async def _get_recent_usage_series(
+        days: int,
+        usage_convert_config: elec_schema.UsageConvertConfig,
+        room_id: str = DEFAULT_ROOM_ID,
+) -> RecordBatch:
+    """
+    Get usage series of recent days from ``usage_series_cache``, only records caught after the last request are
+    read from database. The result is identical to the one of ``get_records_by_time_range()``.
+    """
+    window_sec: int = days * 24 * 60 * 60
+    key = usage_series.usage_series_cache.make_key(room_id, usage_convert_config, window_sec)
+
+    entry = usage_series.usage_series_cache.get(key)
+    if entry is None:
+        entry = usage_series.UsageSeriesEntry(usage_convert_config, start_timestamp=int(time.time()) - window_sec)
+        usage_series.usage_series_cache.set(key, entry)
+
+    async with entry.lock:
+        # window is decided after acquiring the lock, so that it never moves backward between updates
+        end_time: int = int(time.time())
+        start_time: int = end_time - window_sec
+        if start_time < entry.start_timestamp:
+            # system clock moved backward, records before the entry window have been dropped
+            usage_series.usage_series_cache.invalidate(room_id)
+            return await get_records_by_time_range(start_time, end_time, usage_convert_config, room_id=room_id)
+
+        # records caught since the last request
+        record_batch = await _get_record_batch_in_range(entry.last_record_timestamp + 1, end_time, room_id)
+        return entry.update(start_time, record_batch)
+
+
+async def _get_record_batch_in_range(start_time: int, end_time: int, room_id: str = DEFAULT_ROOM_ID) -> RecordBatch:
+    stmt = select_record_columns(room_id).where(
+        and_(
+            SQLRecord.timestamp >= start_time,
+            SQLRecord.timestamp <= end_time,
+        )
+    ).order_by(SQLRecord.timestamp.asc())
+
+    async with session_maker() as session:
+        return RecordBatch.from_rows((await session.execute(stmt)).all())
+
+
 # deprecated
 # def get_timestamp_of_today_start() -> int:
 #     """
@@ -323,7 +843,8 @@ async def daily_usage_list(
 async def period_usage_list(
         period: general_schema.PeriodUnit,
         period_count: int,
-        recent_on_top: bool = True):
+        recent_on_top: bool = True,
+        room_id: str = DEFAULT_ROOM_ID):
     """
     Get usage statistics list with specified period as time duration unit.
 
@@ -331,48 +852,33 @@ async def period_usage_list(
 
     - ``period``: The period unit. Check `PeriodUnit` enum class for more info.
     - ``period_count``: How many periods of usage should be in the result list.
+    - ``room_id``: The room to calculate usage of.
+
+    Notice:
+
+    - All periods are calculated together from the usage rollups, with at most one query for each rollup level
+      and one for raw records, no matter how many periods are requested.
     """
     current_timestamp: int = int(time.time())
-    period_start_timestamp: int = general_schema.PeriodUnit.get_current_period_start(period)
-
-    # list store all result items
-    result_list: list[elec_schema.PeriodUsageInfoOut] = []
+    period_range_list = general_schema.PeriodUnit.get_recent_period_ranges(
+        period,
+        period_count,
+        current_timestamp,
+    )
 
-    # store the current start time in this loop
-    cur_start_time: int = period_start_timestamp
-    cur_end_time: int = current_timestamp
     async with session_maker() as session:
-        for back_idx in range(0, period_count + 1):
-            if back_idx == 0:
-                cur_end_time = current_timestamp
-
-            # construct statement and execute it
-            stmt = select(SQLRecord).where(
-                and_(
-                    SQLRecord.timestamp >= cur_start_time,
-                    SQLRecord.timestamp <= cur_end_time,
-                )
-            )
-            try:
-                res = await session.scalars(stmt)
-                record_list = res.all()
-                if record_list is None:
-                    raise sqlexc.NoSuchColumnError()
-            except sqlexc.NoSuchColumnError as e:
-                record_list = []
+        segment_list = await rollup.get_usage_of_ranges(session, period_range_list, room_id=room_id)
 
-            # calculate the usage
-            usage_dict = calculate_usage(record_list=record_list)
-            result_list.append(PeriodUsageInfoOut(
-                start_time=cur_start_time,
-                end_time=cur_end_time,
-                ac_usage=usage_dict['ac_usage'],
-                light_usage=usage_dict['light_usage'],
-            ))
+    # list store all result items
+    result_list: list[elec_schema.PeriodUsageInfoOut] = []
 
-            # update start and end time of next loop
-            cur_start_time = general_schema.PeriodUnit.get_previous_period_start(period, cur_start_time)
-            cur_end_time = general_schema.PeriodUnit.get_period_end(period, cur_start_time)
+    for (cur_start_time, cur_end_time), segment in zip(period_range_list, segment_list):
+        result_list.append(PeriodUsageInfoOut(
+            start_time=cur_start_time,
+            end_time=cur_end_time,
+            ac_usage=round(segment.ac_usage, 2),
+            light_usage=round(segment.light_usage, 2),
+        ))
 
     if not recent_on_top:
         result_list.reverse()
@@ -380,23 +886,54 @@ async def period_usage_list(
     return result_list
 
 
+def _check_record_time_range(start_time: int, end_time: int | None) -> tuple[int, int]:
+    """
+    Validate the time range used to get records. Returns ``(start_time, end_time)`` as ``int``.
+    If ``end_time`` is ``None``, default to current timestamp.
+    """
+    # use default end time if None
+    if end_time is None:
+        end_time = int(time.time())
+
+    start_time = int(start_time)
+    end_time = int(end_time)
+
+    # end_time bigger than start_time
+    if end_time < start_time:
+        raise exc.ParamError(
+            'end_time',
+            'end_time should satisfy end_time >= start_time')
+
+    # time should be in the past
+    current_time = int(time.time())
+    if end_time > current_time:
+        raise exc.ParamError('end_time', 'end_time should be a time that in the past.')
+
+    return start_time, end_time
+
+
 async def get_records_by_time_range(
         start_time: int,
         end_time: int | None,
         usage_convert_config: elec_schema.UsageConvertConfig | None,
-) -> list[BalanceRecord]:
+        max_points: int | None = None,
+        room_id: str = DEFAULT_ROOM_ID,
+) -> RecordBatch:
     """
-    Get all records during a specified time range.
+    Get all records of a room during a specified time range.
 
     Parameters:
 
     - ``start_time``: Start of the time range. `int` UNIX timestamp.
     - ``end_time``: End of the time range. `int` UNIX timestamp. If `None`, default to current timestamp.
     - ``usage_convert_config``: If NOT `None`, use this config to convert balance record list to usage list.
+    - ``max_points``: If NOT `None`, downsample the result to at most this count of points. When converting to
+      usage list, this value overrides ``usage_convert_config.max_points``.
+    - ``room_id``: The room to get records of.
 
     Return:
 
-    - A list of ``BalanceRecord`` with ascending timestamp.
+    - A ``RecordBatch`` with ascending timestamp. Values are rounded to 2 decimal places.
 
     Notice:
 
@@ -404,26 +941,10 @@ async def get_records_by_time_range(
     - If need to convert to usage list (``usage_convert_config`` is not None), then the input and output should also
       follow the standard of the convert function.
     """
-    # use default end time if None
-    if end_time is None:
-        end_time = int(time.time())
-
-    start_time = int(start_time)
-    end_time = int(end_time)
-
-    # end_time bigger than start_time
-    if end_time < start_time:
-        raise exc.ParamError(
-            'end_time',
-            'end_time should satisfy end_time >= start_time')
-
-    # time should be in the past
-    current_time = int(time.time())
-    if end_time > current_time:
-        raise exc.ParamError('end_time', 'end_time should be a time that in the past.')
+    start_time, end_time = _check_record_time_range(start_time, end_time)
 
     # construct statement
-    stmt = select(SQLRecord).where(
+    stmt = select_record_columns(room_id).where(
         and_(
             SQLRecord.timestamp >= start_time,
             SQLRecord.timestamp <= end_time,
@@ -432,27 +953,108 @@ async def get_records_by_time_range(
 
     async with session_maker() as session:
         try:
-            res = await session.scalars(stmt)
-            record_list = res.all()
-            if record_list is None:
-                raise sqlexc.NoSuchColumnError()
+            row_list = (await session.execute(stmt)).all()
         except sqlexc.NoSuchColumnError as e:
-            record_list = []
             # if the list is empty, no need to do convert anymore
-            return record_list
-
-        # if config not None, convert to usage list
-        if usage_convert_config is not None:
-            record_list: list[SQLRecord | BalanceRecord] = record_list  # type anno
-            record_list = convert_balance_list_to_usage_list(
-                record_list=record_list,
-                usage_convert_config=usage_convert_config,
-            )
+            return RecordBatch.empty()
+
+    record_batch = RecordBatch.from_rows(row_list)
+
+    # if config not None, convert to usage list
+    if usage_convert_config is not None:
+        if max_points is not None:
+            usage_convert_config = usage_convert_config.model_copy(update={'max_points': max_points})
+        record_batch = convert_balance_batch_to_usage_batch(
+            record_batch=record_batch,
+            usage_convert_config=usage_convert_config,
+        )
+    elif max_points is not None:
+        record_batch = downsample_balance_batch(record_batch, max_points)
 
-        return convert_to_model_record_list(record_list=record_list)
+    return round_record_batch(record_batch)
+
+
+async def stream_records_by_time_range(
+        start_time: int,
+        end_time: int | None,
+        usage_convert_config: elec_schema.UsageConvertConfig | None,
+        chunk_size: int | None = None,
+        room_id: str = DEFAULT_ROOM_ID,
+) -> AsyncIterator[RecordBatch]:
+    """
+    Streaming version of ``get_records_by_time_range()``.
+
+    Parameters are validated when calling this function, then an async iterator of ``RecordBatch`` is returned,
+    which reads records from database using ``session.stream()`` and yields them chunk by chunk.
+    If ``usage_convert_config`` is not `None`, chunks are converted by ``UsageStreamConverter``.
+
+    Parameters:
+
+    - ``chunk_size`` Max count of rows fetched from database at a time. Default to ``STREAM_CHUNK_SIZE`` in config.
+
+    Notice:
 
+    - The concatenated result is identical to the one of ``get_records_by_time_range()``. However, the yielded
+      batches may be empty or have different size from ``chunk_size`` when converting to usage.
+    - The database session is kept open until the iterator is exhausted or closed.
+    """
+    start_time, end_time = _check_record_time_range(start_time, end_time)
+    if chunk_size is None:
+        chunk_size = config.general.STREAM_CHUNK_SIZE
+
+    range_condition = and_(
+        SQLRecord.room_id == room_id,
+        SQLRecord.timestamp >= start_time,
+        SQLRecord.timestamp <= end_time,
+    )
 
-async def delete_records_by_time_range(start: int, end: int, dry_run: bool = False) -> int:
+    converter: UsageStreamConverter | None = None
+    if usage_convert_config is not None:
+        # the auto merge ratio depends on the timestamp of the first and last record in range
+        merge_ratio: int | None = None
+        if usage_convert_config.use_smart_merge and usage_convert_config.merge_ratio is None:
+            async with session_maker() as session:
+                first_timestamp, last_timestamp = (await session.execute(
+                    select(func.min(SQLRecord.timestamp), func.max(SQLRecord.timestamp)).where(range_condition)
+                )).one()
+            if first_timestamp is not None:
+                merge_ratio = get_auto_merge_ratio(first_timestamp, last_timestamp)
+            else:
+                merge_ratio = 1
+
+        converter = UsageStreamConverter(usage_convert_config, merge_ratio=merge_ratio)
+
+    stmt = select_record_columns(room_id).where(range_condition).order_by(SQLRecord.timestamp.asc())
+    return _iter_record_stream(stmt, converter, chunk_size)
+
+
+async def _iter_record_stream(
+        stmt,
+        converter: UsageStreamConverter | None,
+        chunk_size: int,
+) -> AsyncIterator[RecordBatch]:
+    async with session_maker() as session:
+        result = await session.stream(stmt.execution_options(yield_per=chunk_size))
+        async for row_list in result.partitions(chunk_size):
+            record_batch = RecordBatch.from_rows(row_list)
+            if converter is not None:
+                record_batch = converter.feed(record_batch)
+            if len(record_batch) > 0:
+                yield round_record_batch(record_batch)
+
+    if converter is not None:
+        record_batch = converter.finish()
+        if len(record_batch) > 0:
+            yield round_record_batch(record_batch)
+
+
+async def delete_records_by_time_range(
+        start: int,
+        end: int,
+        dry_run: bool = False,
+        chunk_size: int | None = None,
+        room_id: str = DEFAULT_ROOM_ID,
+) -> int:
     """
     Remove records from database with specific time range [start, end] (Notice that end time included in range)
 
@@ -461,6 +1063,10 @@ async def delete_records_by_time_range(start: int, end: int, dry_run: bool = Fal
     - ``start`` UNIX timestamp of the start time range.
     - ``end`` UNIX timestamp of the end time range.
     - ``dry_run`` If `True`, will only test the affected records count, and will NOT delete the records.
+    - ``chunk_size`` If set, records will be deleted in batches of at most this count, each batch in its own
+      transaction, so that the table will not be locked for a long time when removing a large range.
+      ``None`` means delete all records in a single statement.
+    - ``room_id`` Only records of this room are deleted.
 
     Returns:
 
@@ -469,78 +1075,139 @@ async def delete_records_by_time_range(start: int, end: int, dry_run: bool = Fal
 
     # legal check
     time_range_checker(start, end)
+    if chunk_size is not None and chunk_size <= 0:
+        raise exc.ParamError('chunk_size', 'chunk_size should be a positive integer')
 
-    # construct statement
-    stmt = select(SQLRecord).where(
-        and_(
-            SQLRecord.timestamp >= start,
-            SQLRecord.timestamp <= end,
-        ),
+    range_condition = and_(
+        SQLRecord.room_id == room_id,
+        SQLRecord.timestamp >= start,
+        SQLRecord.timestamp <= end,
     )
 
+    if dry_run:
+        async with session_maker() as session:
+            return (await session.execute(
+                select(func.count()).select_from(SQLRecord).where(range_condition)
+            )).scalar_one()
+
+    if chunk_size is None:
+        async with session_maker() as session:
+            async with session.begin():
+                affected: int = (await session.execute(
+                    delete(SQLRecord).where(range_condition)
+                )).rowcount
+
+                # recalculate affected usage rollups
+                if affected > 0:
+                    await rollup.refresh_rollups(session, start, end, room_id=room_id)
+
+        if affected > 0:
+            usage_series.usage_series_cache.invalidate(room_id, start)
+            cache.bump_data_version()
+        return affected
+
+    # chunked mode
     affected: int = 0
-
-    async with session_maker() as session:
-        async with session.begin():
-            res = (await session.scalars(stmt)).all()
-            affected = len(res)
-
-            # if dry run, return
-            if dry_run:
-                return affected
-
-            # delete records
-            for record in res:
-                await session.delete(record)
+    chunk_start: int = start
+    while chunk_start <= end:
+        async with session_maker() as session:
+            async with session.begin():
+                # find the timestamp of the last record in this chunk
+                chunk_end: int | None = (await session.execute(
+                    select(SQLRecord.timestamp)
+                    .where(and_(
+                        SQLRecord.room_id == room_id,
+                        SQLRecord.timestamp >= chunk_start,
+                        SQLRecord.timestamp <= end,
+                    ))
+                    .order_by(SQLRecord.timestamp.asc())
+                    .offset(chunk_size - 1)
+                    .limit(1)
+                )).scalar_one_or_none()
+
+                # less than chunk_size records left, delete them all
+                if chunk_end is None:
+                    chunk_end = end
+
+                deleted: int = (await session.execute(
+                    delete(SQLRecord).where(and_(
+                        SQLRecord.room_id == room_id,
+                        SQLRecord.timestamp >= chunk_start,
+                        SQLRecord.timestamp <= chunk_end,
+                    ))
+                )).rowcount
+                if deleted > 0:
+                    await rollup.refresh_rollups(session, chunk_start, chunk_end, room_id=room_id)
+
+        affected += deleted
+        if deleted > 0:
+            usage_series.usage_series_cache.invalidate(room_id, chunk_start)
+            cache.bump_data_version()
+        logger.debug(f'Deleted {deleted} records in [{chunk_start}, {chunk_end}], {affected} in total')
+        chunk_start = chunk_end + 1
 
     return affected
 
 
-async def get_statistics_by_time_range(start_time: int, end_time: int | None = None) -> elec_schema.TimeRangeStatistics:
+async def get_statistics_by_time_range(
+        start_time: int,
+        end_time: int | None = None,
+        room_id: str = DEFAULT_ROOM_ID,
+) -> elec_schema.TimeRangeStatistics:
     """
-    Get statistics info of a specific time range.
+    Get statistics info of a room of a specific time range.
 
     Parameters:
 
     - ``start`` UNIX timestamp of the start time range.
     - ``end`` UNIX timestamp of the end time range.
+    - ``room_id`` The room to calculate statistics of.
+
+    Notice:
+
+    - ``start_timestamp`` and ``end_timestamp`` of the result are the first and last record in range, NOT the first
+      and last converted usage point as before usage rollups were added.
     """
 
     time_range_checker(start_time, end_time)
 
-    # get usage list
-    usage_list: list[BalanceRecord] = await get_records_by_time_range(
-        start_time, end_time,
-        usage_convert_config=elec_schema.UsageConvertConfig(
-            spreading=True,
-            use_smart_merge=True,
-            merge_ratio=None,
-            smoothing=False,
-            per_hour_usage=False,
-            remove_first_point=True,
-        ))
+    # use default end time if None
+    current_time = int(time.time())
+    if end_time is None:
+        end_time = current_time
 
-    # get balance list
-    record_list = await get_records_by_time_range(start_time, end_time, usage_convert_config=None)
-    point_used = len(record_list)
+    # time should be in the past
+    if end_time > current_time:
+        raise exc.ParamError('end_time', 'end_time should be a time that in the past.')
 
-    # calculate total usage
-    total_light: float = 0
-    total_ac: float = 0
-    for usage_item in usage_list:
-        total_light += usage_item.light_balance
-        total_ac += usage_item.ac_balance
+    cache_key = None
+    if _is_past_range(end_time):
+        cache_key = cache.make_cache_key('get_statistics_by_time_range', (start_time, end_time, room_id), {})
+        hit, value = cache.past_range_cache.get(cache_key)
+        if hit:
+            return value
+
+    # calculate usage from rollups
+    async with session_maker() as session:
+        segment, = await rollup.get_usage_of_ranges(session, [(start_time, end_time)], room_id=room_id)
+
+    if segment.record_count == 0:
+        raise exc.NoResultError('No record found in this time range.')
+
+    point_used = segment.record_count
+    total_light: float = segment.light_usage
+    total_ac: float = segment.ac_usage
 
     # calculate hour distance
-    start_timestamp = int(usage_list[0].timestamp)
-    end_timestamp = int(usage_list[-1].timestamp)
-    hour_distance: int = int((end_timestamp - start_timestamp) / 3600)
+    start_timestamp = segment.first_timestamp
+    end_timestamp = segment.last_timestamp
+    hour_distance: float = (end_timestamp - start_timestamp) / 3600
 
-    # calculate avg
-    avg_ac: float = total_ac / hour_distance
-    avg_light: float = total_light / hour_distance
+    # calculate avg, no average if there is only one record
+    avg_ac: float = total_ac / hour_distance if hour_distance > 0 else 0.0
+    avg_light: float = total_light / hour_distance if hour_distance > 0 else 0.0
 
-    return elec_schema.TimeRangeStatistics(
+    result = elec_schema.TimeRangeStatistics(
         total_usage_light=total_light,
         total_usage_ac=total_ac,
         avg_usage_light=avg_light,
@@ -549,3 +1216,170 @@ async def get_statistics_by_time_range(start_time: int, end_time: int | None = N
         end_timestamp=end_timestamp,
         point_used=point_used,
     )
+    if cache_key is not None:
+        cache.past_range_cache.set(cache_key, result)
+    return result
+
+
+def _is_past_range(end_time: int) -> bool:
+    """
+    Check if a time range ends in the past, so that no new record will be caught into it.
+    Records are timestamped when caught, which is always later than such range.
+    """
+    return end_time < int(time.time())
+
+
+async def get_time_range_analytics(
+        start_time: int,
+        end_time: int | None,
+        percentile_list: list[float],
+        room_id: str = DEFAULT_ROOM_ID,
+) -> elec_schema.TimeRangeAnalyticsOut:
+    """
+    Get analytics of records of a room in a time range. All metrics are calculated from a single fetch of raw records.
+    Check out ``time_range_analytics()`` for more info.
+
+    Parameters:
+
+    - ``start_time`` ``end_time`` The time range. If ``end_time`` is `None`, default to current timestamp.
+    - ``percentile_list`` Percentiles of hourly usage to calculate, each between 0 and 100.
+    - ``room_id`` The room to calculate analytics of.
+
+    Notice:
+
+    - Results of ranges ending in the past are kept in ``past_range_cache`` until any write through this backend.
+    """
+    start_time, end_time = _check_record_time_range(start_time, end_time)
+    for percentile in percentile_list:
+        if not 0 <= percentile <= 100:
+            raise exc.ParamError('percentiles', 'Percentile should be between 0 and 100')
+
+    cache_key = None
+    if _is_past_range(end_time):
+        cache_key = cache.make_cache_key(
+            'get_time_range_analytics', (start_time, end_time, tuple(percentile_list), room_id), {})
+        hit, value = cache.past_range_cache.get(cache_key)
+        if hit:
+            return value
+
+    stmt = select_record_columns(room_id).where(and_(
+        SQLRecord.timestamp >= start_time,
+        SQLRecord.timestamp <= end_time,
+    )).order_by(SQLRecord.timestamp.asc())
+    async with session_maker() as session:
+        row_list = (await session.execute(stmt)).all()
+
+    result = time_range_analytics(RecordBatch.from_rows(row_list), start_time, end_time, percentile_list)
+    if cache_key is not None:
+        cache.past_range_cache.set(cache_key, result)
+    return result
+
+
+async def rebuild_rollups(chunk_days: int = 30) -> int:
+    """
+    Rebuild all usage rollup tables from the whole record history of all rooms.
+
+    Rollup tables will be created if not exist, and all existing rollups will be cleared.
+    History of each room is then processed chunk by chunk in separate transactions,
+    each chunk covers ``chunk_days`` days.
+
+    Returns count of rollup rows written.
+    """
+    async with get_engine().begin() as conn:
+        await conn.run_sync(
+            SQLBaseModel.metadata.create_all,
+            tables=[SQLHourlyUsage.__table__, SQLDailyUsage.__table__],
+        )
+
+    async with session_maker() as session:
+        room_range_list = (await session.execute(
+            select(SQLRecord.room_id, func.min(SQLRecord.timestamp), func.max(SQLRecord.timestamp))
+            .group_by(SQLRecord.room_id)
+        )).all()
+
+    # clear outdated rollups
+    async with session_maker() as session:
+        async with session.begin():
+            await session.execute(delete(SQLHourlyUsage))
+            await session.execute(delete(SQLDailyUsage))
+
+    written: int = 0
+    for room_id, first_timestamp, last_timestamp in room_range_list:
+        chunk_start: int = rollup.get_day_start(first_timestamp)
+        while chunk_start <= last_timestamp:
+            # chunk end is aligned with day start, so that buckets never cross chunks
+            chunk_end: int = chunk_start
+            for _ in range(chunk_days):
+                chunk_end = rollup.get_next_day_start(chunk_end)
+
+            async with session_maker() as session:
+                async with session.begin():
+                    written += await rollup.refresh_rollups(session, chunk_start, chunk_end - 1, room_id=room_id)
+            logger.debug(f'Rollups of room {room_id} rebuilt until {chunk_end}, {written} rows written')
+
+            chunk_start = chunk_end
+
+    cache.bump_data_version()
+
+    return written
+
+
+async def compact_records(
+        dry_run: bool = False,
+        room_id: str | None = None,
+        chunk_days: int | None = None,
+) -> CompactionResultOut:
+    """
+    Compact old raw records into representative points of each hour or day, based on the retention ages
+    in general config. Check out ``provider.retention`` for more info.
+
+    Parameters:
+
+    - ``dry_run`` If `True`, will only count the records could be removed, and will NOT remove them.
+    - ``room_id`` Only records of this room are compacted. ``None`` means all rooms.
+    - ``chunk_days`` Days of records compacted in each transaction, default to ``RECORD_COMPACT_CHUNK_DAYS``.
+
+    Notice:
+
+    - Usage of any range between kept records is unchanged, including rollups, which are refreshed chunk by chunk.
+    """
+    if chunk_days is None:
+        chunk_days = config.general.RECORD_COMPACT_CHUNK_DAYS
+    if chunk_days <= 0:
+        raise exc.ParamError('chunk_days', 'chunk_days should be a positive integer')
+
+    stmt = select(SQLRecord.room_id, func.min(SQLRecord.timestamp)).group_by(SQLRecord.room_id)
+    if room_id is not None:
+        stmt = stmt.where(SQLRecord.room_id == room_id)
+    async with session_maker() as session:
+        room_first_list = (await session.execute(stmt)).all()
+
+    result = CompactionResultOut(dry_run=dry_run, scanned=0, removed=0)
+    for level, range_end, range_start in retention.get_compaction_range_list():
+        for room, first_timestamp in room_first_list:
+            chunk_start: int = rollup.get_day_start(first_timestamp)
+            if range_start is not None:
+                chunk_start = max(chunk_start, range_start)
+            while chunk_start < range_end:
+                # chunk end is aligned with day start, so that buckets never cross chunks
+                chunk_end: int = chunk_start
+                for _ in range(chunk_days):
+                    chunk_end = rollup.get_next_day_start(chunk_end)
+                chunk_end = min(chunk_end, range_end)
+
+                async with session_maker() as session:
+                    async with session.begin():
+                        scanned, removed = await retention.compact_chunk(
+                            session, level, chunk_start, chunk_end, dry_run, room_id=room)
+
+                result.scanned += scanned
+                result.removed += removed
+                if removed > 0 and not dry_run:
+                    usage_series.usage_series_cache.invalidate(room, chunk_start)
+                    cache.bump_data_version()
+                logger.debug(f'Compacted records of room {room} by {level} in [{chunk_start}, {chunk_end}), '
+                             f'{removed} of {scanned} records removed')
+
+                chunk_start = chunk_end
+
+    return result
@@ -0,0 +1,231 @@
+"""
+In-process metrics exposed by ``/metrics`` endpoint in Prometheus text exposition format.
+
+Metrics are kept in memory of this process and rendered when scraped, no external service is required.
+Recording a value costs a dict lookup and a few additions, so instruments could be placed on hot paths.
+
+Notice:
+
+- Values are reset when the process restarts. If backend runs with multiple worker processes, each worker has
+  its own metrics.
+"""
+import bisect
+import time
+from typing import Callable
+
+# upper bounds in seconds of histogram buckets, ``+Inf`` bucket is always added
+DEFAULT_BUCKETS: tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(label_names: tuple[str, ...], label_values: tuple, extra: str = '') -> str:
+    part_list = [f'{name}="{_escape_label_value(str(value))}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        part_list.append(extra)
+    if not part_list:
+        return ''
+    return '{' + ','.join(part_list) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Base class of metrics. Subclasses should implement ``collect()`` which returns the sample lines.
+
+    Label values are passed to recording methods positionally, in the same order as ``label_names``.
+    """
+    type_name: str = 'untyped'
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+
+    def collect(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        line_list = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type_name}',
+            *self.collect(),
+        ]
+        return '\n'.join(line_list)
+
+
+class Counter(Metric):
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, label_names)
+        self._value_dict: dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        self._value_dict[label_values] = self._value_dict.get(label_values, 0) + amount
+
+    def get(self, *label_values) -> float:
+        return self._value_dict.get(label_values, 0)
+
+    def collect(self) -> list[str]:
+        return [
+            f'{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}'
+            for label_values, value in sorted(self._value_dict.items())
+        ]
+
+
+class Histogram(Metric):
+    type_name = 'histogram'
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            label_names: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket count list (not cumulative, last one is +Inf), sum, count]
+        self._state_dict: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        state = self._state_dict.get(label_values)
+        if state is None:
+            state = self._state_dict[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def get_count(self, *label_values) -> int:
+        state = self._state_dict.get(label_values)
+        return 0 if state is None else state[2]
+
+    def collect(self) -> list[str]:
+        line_list: list[str] = []
+        for label_values, (bucket_count_list, value_sum, count) in sorted(self._state_dict.items()):
+            cumulative: int = 0
+            for upper_bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_count_list):
+                cumulative += bucket_count
+                le = f'le="{_format_value(upper_bound)}"'
+                line_list.append(
+                    f'{self.name}_bucket{_format_labels(self.label_names, label_values, le)} {cumulative}')
+            labels = _format_labels(self.label_names, label_values)
+            line_list.append(f'{self.name}_sum{labels} {_format_value(value_sum)}')
+            line_list.append(f'{self.name}_count{labels} {count}')
+        return line_list
+
+
+class Gauge(Metric):
+    """
+    Gauge whose values are read when collecting, by calling the function set by ``set_function()``.
+
+    The function should return a dict of label values tuple to value.
+    """
+    type_name = 'gauge'
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, label_names)
+        self._func: Callable[[], dict[tuple, float]] | None = None
+
+    def set_function(self, func: Callable[[], dict[tuple, float]] | None) -> None:
+        self._func = func
+
+    def collect(self) -> list[str]:
+        if self._func is None:
+            return []
+        return [
+            f'{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}'
+            for label_values, value in sorted(self._func().items())
+        ]
+
+
+class StageTimer:
+    """
+    Record the duration of consecutive stages of a process into a histogram labeled by stage name.
+
+    Usage::
+
+        timer = StageTimer(histogram)
+        do_first_stage()
+        timer.lap('first')
+        do_second_stage()
+        timer.lap('second')
+    """
+    __slots__ = ('histogram', '_last_time')
+
+    def __init__(self, histogram: Histogram) -> None:
+        self.histogram = histogram
+        self._last_time = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.histogram.observe(now - self._last_time, stage)
+        self._last_time = now
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metric_list: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metric_list.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Return all metrics in Prometheus text exposition format.
+        """
+        return '\n'.join(metric.render() for metric in self._metric_list) + '\n'
+
+
+registry = Registry()
+
+http_request_duration_seconds: Histogram = registry.register(Histogram(
+    'http_request_duration_seconds',
+    'Latency of HTTP requests by route template, until the response is completely sent.',
+    ('method', 'route', 'status'),
+))
+
+db_query_duration_seconds: Histogram = registry.register(Histogram(
+    'db_query_duration_seconds',
+    'Duration of SQL statements executed by the database engine.',
+    ('operation',),
+))
+
+db_query_errors_total: Counter = registry.register(Counter(
+    'db_query_errors_total',
+    'Count of SQL statements raised errors.',
+    ('operation',),
+))
+
+db_pool_connections: Gauge = registry.register(Gauge(
+    'db_pool_connections',
+    'Connections of the database pool by state. size is the configured pool size.',
+    ('state',),
+))
+
+ahu_request_duration_seconds: Histogram = registry.register(Histogram(
+    'ahu_request_duration_seconds',
+    'Latency of every attempt of requests to AHU website, including failed ones.',
+    ('room', 'account'),
+))
+
+ahu_request_errors_total: Counter = registry.register(Counter(
+    'ahu_request_errors_total',
+    'Count of failed attempts of requests to AHU website by reason.',
+    ('room', 'account', 'reason'),
+))
+
+usage_convert_stage_duration_seconds: Histogram = registry.register(Histogram(
+    'usage_convert_stage_duration_seconds',
+    'Duration of each stage when converting balance records to usage.',
+    ('stage',),
+))
@@ -0,0 +1,149 @@
+"""
+Retention policy of raw records.
+
+Records older than ``RECORD_COMPACT_DAILY_AFTER_DAYS`` are compacted into representative points of each day, and
+records older than ``RECORD_COMPACT_HOURLY_AFTER_DAYS`` into points of each hour. The last record of every bucket is
+kept as its representative point, together with the records where the balance turns from decreasing to increasing or
+vice versa (e.g. right before and after top-ups). Removing any other record never changes the sum of balance decreases,
+so usage calculated by ``calculate_usage()``, rollups and usage convert over any range between kept records is the
+same as before. Check out docs/usage_calc.md for more info.
+
+Functions in this module receive an ``AsyncSession`` and never commit, the transaction is controlled by caller.
+"""
+import time
+
+from sqlalchemy import select, delete, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config.general
+from provider import rollup
+from schema.electric import SQLRecord, DEFAULT_ROOM_ID
+
+# max count of timestamps in a single ``DELETE ... IN`` statement
+DELETE_BATCH_SIZE: int = 500
+
+# compaction level name -> bucket start function
+COMPACT_LEVEL_DICT = {
+    'hour': rollup.get_hour_start,
+    'day': rollup.get_day_start,
+}
+
+
+def _is_turning_point(prev_value: float, value: float, next_value: float) -> bool:
+    return (value > prev_value and value > next_value) or (value < prev_value and value < next_value)
+
+
+def select_removable_timestamps(row_list, bucket_start_func, anchor_row=None) -> list[int]:
+    """
+    Return timestamps of records that could be removed without changing the usage of the records.
+
+    Parameters:
+
+    - ``row_list`` Rows with ``timestamp``, ``light_balance`` and ``ac_balance``. Requires ascending timestamp,
+      and the last row must be the last record of its bucket.
+    - ``bucket_start_func`` Function returns the bucket start of a timestamp, e.g. ``rollup.get_hour_start``.
+    - ``anchor_row`` The record right before ``row_list`` which is kept, ``None`` if there is no record before.
+
+    Notice:
+
+    - The last record of each bucket is always kept. So is the first record if there is no ``anchor_row``.
+    - A record is removed only if it is not a turning point of both light and ac balance between its kept neighbours,
+      in which case ``max(0, a - b) + max(0, b - c) == max(0, a - c)``.
+    """
+    # stack of (row, pinned), pinned records are never removed
+    kept_list: list[tuple] = []
+    if anchor_row is not None:
+        kept_list.append((anchor_row, True))
+
+    removable_list: list[int] = []
+    size = len(row_list)
+    for index, row in enumerate(row_list):
+        # the top of stack has both neighbours now, check if it's needed.
+        # removing a non turning point keeps the direction of its neighbours, so no need to check them again.
+        if len(kept_list) >= 2 and not kept_list[-1][1]:
+            prev_row, candidate = kept_list[-2][0], kept_list[-1][0]
+            if not (_is_turning_point(prev_row.light_balance, candidate.light_balance, row.light_balance)
+                    or _is_turning_point(prev_row.ac_balance, candidate.ac_balance, row.ac_balance)):
+                kept_list.pop()
+                removable_list.append(candidate.timestamp)
+
+        pinned = (
+                (index == 0 and anchor_row is None)
+                or index == size - 1
+                or bucket_start_func(row_list[index + 1].timestamp) != bucket_start_func(row.timestamp)
+        )
+        kept_list.append((row, pinned))
+
+    return removable_list
+
+
+def get_compaction_range_list(now: int | None = None) -> list[tuple[str, int, int | None]]:
+    """
+    Return the ranges need to be compacted based on general config, as ``(level, end_exclusive, start)``.
+    ``start`` is ``None`` if the range starts from the first record.
+
+    Ranges never overlap. Records older than daily compaction age are only compacted by day, and the hourly
+    range starts where the daily range ends. Range ends are aligned with buckets of their level.
+    """
+    if now is None:
+        now = int(time.time())
+
+    range_list: list[tuple[str, int, int | None]] = []
+    daily_end: int | None = None
+    if config.general.RECORD_COMPACT_DAILY_AFTER_DAYS is not None:
+        daily_end = rollup.get_day_start(now - config.general.RECORD_COMPACT_DAILY_AFTER_DAYS * 24 * 60 * 60)
+        range_list.append(('day', daily_end, None))
+
+    if config.general.RECORD_COMPACT_HOURLY_AFTER_DAYS is not None:
+        hourly_end = rollup.get_hour_start(now - config.general.RECORD_COMPACT_HOURLY_AFTER_DAYS * 24 * 60 * 60)
+        if daily_end is None or hourly_end > daily_end:
+            range_list.append(('hour', hourly_end, daily_end))
+
+    return range_list
+
+
+async def compact_chunk(
+        session: AsyncSession,
+        level: str,
+        start: int,
+        end_exclusive: int,
+        dry_run: bool = False,
+        room_id: str = DEFAULT_ROOM_ID,
+) -> tuple[int, int]:
+    """
+    Compact records of a room in time range ``[start, end_exclusive)``, and refresh the affected rollups.
+
+    ``end_exclusive`` must be aligned with the buckets of ``level``, so that the last record in range is the last
+    record of its bucket. If ``dry_run`` is `True`, records are only counted and NOT removed.
+
+    Returns ``(scanned, removed)`` count of records.
+    """
+    anchor_row = (await session.execute(
+        select(SQLRecord.timestamp, SQLRecord.light_balance, SQLRecord.ac_balance)
+        .where(and_(SQLRecord.room_id == room_id, SQLRecord.timestamp < start))
+        .order_by(SQLRecord.timestamp.desc())
+        .limit(1)
+    )).one_or_none()
+
+    row_list = (await session.execute(
+        select(SQLRecord.timestamp, SQLRecord.light_balance, SQLRecord.ac_balance)
+        .where(and_(
+            SQLRecord.room_id == room_id,
+            SQLRecord.timestamp >= start,
+            SQLRecord.timestamp < end_exclusive,
+        ))
+        .order_by(SQLRecord.timestamp.asc())
+    )).all()
+
+    removable_list = select_removable_timestamps(row_list, COMPACT_LEVEL_DICT[level], anchor_row)
+    if dry_run or not removable_list:
+        return len(row_list), len(removable_list)
+
+    for index in range(0, len(removable_list), DELETE_BATCH_SIZE):
+        await session.execute(delete(SQLRecord).where(and_(
+            SQLRecord.room_id == room_id,
+            SQLRecord.timestamp.in_(removable_list[index:index + DELETE_BATCH_SIZE]),
+        )))
+    await rollup.refresh_rollups(session, start, end_exclusive - 1, room_id=room_id)
+
+    return len(row_list), len(removable_list)
@@ -0,0 +1,358 @@
+"""
+Hourly and daily usage rollup tables.
+
+Each rollup row stores the info of the records inside one time bucket: record count, first and last balance,
+and the usage between the records inside the bucket. Since the first and last balance are kept, the usage of
+any continuous time range could be calculated by combining the rollup rows and the raw records at the edges
+of the range, which gives the same result as ``calculate_usage()`` on the raw records.
+
+Functions in this module receive an ``AsyncSession`` and never commit, the transaction is controlled by caller.
+All rollups are scoped by room, the same as the records.
+"""
+import bisect
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete, insert, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from schema.electric import SQLRecord, SQLHourlyUsage, SQLDailyUsage, DEFAULT_ROOM_ID
+
+
+@dataclass
+class UsageSegment:
+    """
+    Usage info of a continuous range of records with ascending timestamp.
+
+    Two segments could be combined using ``extend()``. The usage between the last record of the previous segment
+    and the first record of the next segment will be added. Balance increases (top-ups) are NOT counted as usage,
+    which is the same as ``calculate_usage()``.
+    """
+    record_count: int = 0
+    first_timestamp: int = 0
+    last_timestamp: int = 0
+    first_light_balance: float = 0
+    first_ac_balance: float = 0
+    last_light_balance: float = 0
+    last_ac_balance: float = 0
+    light_usage: float = 0
+    ac_usage: float = 0
+
+    @classmethod
+    def from_rows(cls, row_list) -> 'UsageSegment':
+        """
+        Create a segment from rows with ``timestamp``, ``light_balance`` and ``ac_balance``. Requires ascending timestamp.
+        """
+        segment = cls()
+        for row in row_list:
+            segment.append_record(row.timestamp, row.light_balance, row.ac_balance)
+        return segment
+
+    @classmethod
+    def from_rollup(cls, rollup: SQLHourlyUsage | SQLDailyUsage) -> 'UsageSegment':
+        return cls(**{key: getattr(rollup, key) for key in cls.__dataclass_fields__})
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def append_record(self, timestamp: int, light_balance: float, ac_balance: float) -> None:
+        """
+        Add a record after the last record of this segment.
+        """
+        if self.record_count == 0:
+            self.first_timestamp = timestamp
+            self.first_light_balance = light_balance
+            self.first_ac_balance = ac_balance
+        else:
+            self.light_usage += max(0.0, self.last_light_balance - light_balance)
+            self.ac_usage += max(0.0, self.last_ac_balance - ac_balance)
+
+        self.last_timestamp = timestamp
+        self.last_light_balance = light_balance
+        self.last_ac_balance = ac_balance
+        self.record_count += 1
+
+    def prepend_record(self, timestamp: int, light_balance: float, ac_balance: float) -> None:
+        """
+        Add a record before the first record of this segment.
+        """
+        if self.record_count == 0:
+            self.append_record(timestamp, light_balance, ac_balance)
+            return
+
+        self.light_usage += max(0.0, light_balance - self.first_light_balance)
+        self.ac_usage += max(0.0, ac_balance - self.first_ac_balance)
+
+        self.first_timestamp = timestamp
+        self.first_light_balance = light_balance
+        self.first_ac_balance = ac_balance
+        self.record_count += 1
+
+    def extend(self, other: 'UsageSegment') -> None:
+        """
+        Combine another segment into this one. All records of ``other`` must be later than the ones of this segment.
+        """
+        if other.record_count == 0:
+            return
+        if self.record_count == 0:
+            self.__dict__.update(other.__dict__)
+            return
+
+        self.light_usage += max(0.0, self.last_light_balance - other.first_light_balance) + other.light_usage
+        self.ac_usage += max(0.0, self.last_ac_balance - other.first_ac_balance) + other.ac_usage
+
+        self.last_timestamp = other.last_timestamp
+        self.last_light_balance = other.last_light_balance
+        self.last_ac_balance = other.last_ac_balance
+        self.record_count += other.record_count
+
+
+def get_hour_start(timestamp: int) -> int:
+    """
+    Return the start timestamp of the local hour this timestamp belongs to.
+    """
+    dt = datetime.fromtimestamp(int(timestamp)).replace(minute=0, second=0, microsecond=0)
+    return int(dt.timestamp())
+
+
+def get_day_start(timestamp: int) -> int:
+    """
+    Return the start timestamp of the local day (0:00AM) this timestamp belongs to.
+    """
+    dt = datetime.fromtimestamp(int(timestamp)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return int(dt.timestamp())
+
+
+def get_next_hour_start(hour_start: int) -> int:
+    return get_hour_start(hour_start + 90 * 60)
+
+
+def get_next_day_start(day_start: int) -> int:
+    return get_day_start(int((datetime.fromtimestamp(day_start) + timedelta(days=1, hours=12)).timestamp()))
+
+
+# (rollup model, bucket start function, next bucket start function), from fine to coarse.
+ROLLUP_LEVEL_LIST = [
+    (SQLHourlyUsage, get_hour_start, get_next_hour_start),
+    (SQLDailyUsage, get_day_start, get_next_day_start),
+]
+
+
+def _bucket_ceil(timestamp: int, bucket_start_func, next_bucket_start_func) -> int:
+    bucket_start = bucket_start_func(timestamp)
+    if bucket_start == timestamp:
+        return bucket_start
+    return next_bucket_start_func(bucket_start)
+
+
+def split_range_to_pieces(start: int, end_exclusive: int, level: int | None = None) -> list[tuple[int, int, int]]:
+    """
+    Split time range ``[start, end_exclusive)`` into ascending pieces of ``(level, piece_start, piece_end)``.
+
+    ``level`` is the index in ``ROLLUP_LEVEL_LIST``, ``-1`` means raw records should be used for this piece.
+    Coarse rollups are used as much as possible, the remaining parts at the edges use finer rollups or raw records.
+    """
+    if level is None:
+        level = len(ROLLUP_LEVEL_LIST) - 1
+    if start >= end_exclusive:
+        return []
+    if level < 0:
+        return [(-1, start, end_exclusive)]
+
+    _, bucket_start_func, next_bucket_start_func = ROLLUP_LEVEL_LIST[level]
+    aligned_start = _bucket_ceil(start, bucket_start_func, next_bucket_start_func)
+    aligned_end = bucket_start_func(end_exclusive)
+
+    # no full bucket in this range, try finer level
+    if aligned_start >= aligned_end:
+        return split_range_to_pieces(start, end_exclusive, level - 1)
+
+    return (
+            split_range_to_pieces(start, aligned_start, level - 1)
+            + [(level, aligned_start, aligned_end)]
+            + split_range_to_pieces(aligned_end, end_exclusive, level - 1)
+    )
+
+
+def _merge_intervals(interval_list: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    merged: list[list[int]] = []
+    for start, end in sorted(interval_list):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+async def get_usage_of_ranges(
+        session: AsyncSession,
+        range_list: list[tuple[int, int]],
+        room_id: str = DEFAULT_ROOM_ID,
+) -> list[UsageSegment]:
+    """
+    Calculate the usage segment of every time range ``[start, end]`` (end included) in ``range_list`` of a room.
+
+    At most one query is performed for each rollup level and one for raw records, no matter how many ranges
+    are passed, and the cost depends on the number of buckets instead of the number of raw records.
+    """
+    piece_list_of_ranges = [split_range_to_pieces(int(start), int(end) + 1) for start, end in range_list]
+
+    # collect intervals needed for every level, then query each level once.
+    # key -1 means raw records.
+    interval_dict: dict[int, list[tuple[int, int]]] = {}
+    for piece_list in piece_list_of_ranges:
+        for level, piece_start, piece_end in piece_list:
+            interval_dict.setdefault(level, []).append((piece_start, piece_end))
+
+    # level -> (ascending key list, ascending segment list)
+    loaded_dict: dict[int, tuple[list[int], list[UsageSegment]]] = {}
+    for level, interval_list in interval_dict.items():
+        interval_list = _merge_intervals(interval_list)
+        if level < 0:
+            column = SQLRecord.timestamp
+            stmt = select(SQLRecord.timestamp, SQLRecord.light_balance, SQLRecord.ac_balance)
+            stmt = stmt.where(SQLRecord.room_id == room_id)
+        else:
+            model = ROLLUP_LEVEL_LIST[level][0]
+            column = model.bucket_start
+            stmt = select(model).where(model.room_id == room_id)
+        stmt = stmt.where(
+            or_(*[and_(column >= start, column < end) for start, end in interval_list])
+        ).order_by(column.asc())
+
+        if level < 0:
+            row_list = (await session.execute(stmt)).all()
+            loaded_dict[level] = (
+                [row.timestamp for row in row_list],
+                [UsageSegment.from_rows([row]) for row in row_list],
+            )
+        else:
+            rollup_list = (await session.scalars(stmt)).all()
+            loaded_dict[level] = (
+                [rollup.bucket_start for rollup in rollup_list],
+                [UsageSegment.from_rollup(rollup) for rollup in rollup_list],
+            )
+
+    # combine pieces of each range
+    result_list: list[UsageSegment] = []
+    for piece_list in piece_list_of_ranges:
+        range_segment = UsageSegment()
+        for level, piece_start, piece_end in piece_list:
+            key_list, segment_list = loaded_dict[level]
+            start_idx = bisect.bisect_left(key_list, piece_start)
+            end_idx = bisect.bisect_left(key_list, piece_end)
+            for segment in segment_list[start_idx:end_idx]:
+                range_segment.extend(segment)
+        result_list.append(range_segment)
+
+    return result_list
+
+
+async def _load_raw_segment(session: AsyncSession, room_id: str, start: int, end_exclusive: int) -> UsageSegment:
+    stmt = select(SQLRecord.timestamp, SQLRecord.light_balance, SQLRecord.ac_balance).where(
+        and_(SQLRecord.room_id == room_id, SQLRecord.timestamp >= start, SQLRecord.timestamp < end_exclusive)
+    ).order_by(SQLRecord.timestamp.asc())
+    return UsageSegment.from_rows((await session.execute(stmt)).all())
+
+
+async def update_rollups_on_insert(session: AsyncSession, record: SQLRecord) -> None:
+    """
+    Incrementally update the rollup buckets the newly inserted ``record`` belongs to.
+
+    Appending a record to the end (or start) of a bucket is done in place. If the record is inserted
+    into the middle of a bucket, the bucket will be recalculated from raw records.
+    """
+    for model, bucket_start_func, next_bucket_start_func in ROLLUP_LEVEL_LIST:
+        bucket_start = bucket_start_func(record.timestamp)
+        rollup = await session.get(model, {'room_id': record.room_id, 'bucket_start': bucket_start})
+
+        if rollup is None:
+            segment = UsageSegment()
+            segment.append_record(record.timestamp, record.light_balance, record.ac_balance)
+            session.add(model(room_id=record.room_id, bucket_start=bucket_start, **segment.to_dict()))
+            continue
+
+        segment = UsageSegment.from_rollup(rollup)
+        if record.timestamp > segment.last_timestamp:
+            segment.append_record(record.timestamp, record.light_balance, record.ac_balance)
+        elif record.timestamp < segment.first_timestamp:
+            segment.prepend_record(record.timestamp, record.light_balance, record.ac_balance)
+        else:
+            # make sure the new record is visible to the query
+            await session.flush()
+            segment = await _load_raw_segment(
+                session, record.room_id, bucket_start, next_bucket_start_func(bucket_start))
+
+        for key, value in segment.to_dict().items():
+            setattr(rollup, key, value)
+
+
+async def refresh_rollups(session: AsyncSession, start: int, end: int, room_id: str = DEFAULT_ROOM_ID) -> int:
+    """
+    Recalculate all rollup buckets of a room overlapping time range ``[start, end]`` from raw records.
+
+    Used when records are removed or changed in bulk. Returns count of rollup rows written.
+    """
+    written: int = 0
+    for model, bucket_start_func, next_bucket_start_func in ROLLUP_LEVEL_LIST:
+        range_start = bucket_start_func(start)
+        range_end = next_bucket_start_func(bucket_start_func(end))
+
+        await session.execute(delete(model).where(and_(
+            model.room_id == room_id,
+            model.bucket_start >= range_start,
+            model.bucket_start < range_end,
+        )))
+
+        row_list = (await session.execute(
+            select(SQLRecord.timestamp, SQLRecord.light_balance, SQLRecord.ac_balance).where(and_(
+                SQLRecord.room_id == room_id,
+                SQLRecord.timestamp >= range_start,
+                SQLRecord.timestamp < range_end,
+            )).order_by(SQLRecord.timestamp.asc())
+        )).all()
+
+        # group ascending rows into buckets
+        segment_dict: dict[int, UsageSegment] = {}
+        for row in row_list:
+            bucket_start = bucket_start_func(row.timestamp)
+            segment = segment_dict.get(bucket_start)
+            if segment is None:
+                segment = segment_dict[bucket_start] = UsageSegment()
+            segment.append_record(row.timestamp, row.light_balance, row.ac_balance)
+
+        if segment_dict:
+            await session.execute(insert(model), [
+                {'room_id': room_id, 'bucket_start': bucket_start, **segment.to_dict()}
+                for bucket_start, segment in segment_dict.items()
+            ])
+        written += len(segment_dict)
+
+    return written
+
+
+async def refresh_rollups_of_timestamps(
+        session: AsyncSession,
+        timestamp_list: list[int],
+        room_id: str = DEFAULT_ROOM_ID,
+) -> int:
+    """
+    Recalculate the rollup buckets of a room of the days that the timestamps belong to.
+
+    Used after records at scattered timestamps are written in bulk. Adjacent days are refreshed together.
+    Returns count of rollup rows written.
+    """
+    day_start_list = sorted({get_day_start(timestamp) for timestamp in timestamp_list})
+
+    # merge adjacent days into ranges of [start, end_exclusive)
+    range_list: list[list[int]] = []
+    for day_start in day_start_list:
+        if range_list and range_list[-1][1] == day_start:
+            range_list[-1][1] = get_next_day_start(day_start)
+        else:
+            range_list.append([day_start, get_next_day_start(day_start)])
+
+    written: int = 0
+    for start, end_exclusive in range_list:
+        written += await refresh_rollups(session, start, end_exclusive - 1, room_id=room_id)
+    return written
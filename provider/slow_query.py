@@ -0,0 +1,165 @@
+"""
+Slow query log of the database engine.
+
+SQL statements slower than ``SLOW_QUERY_THRESHOLD_MS`` are logged with their parameters, duration and the provider
+function executed them, and the most recent ones are kept in memory. For ``SELECT`` statements, the query plan is
+captured by running ``EXPLAIN`` in background using another connection, so the slow request is not delayed further.
+"""
+import asyncio
+import sys
+import time
+from collections import deque
+
+import greenlet
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import config.general
+from provider.cache import LRUCache
+from schema import general as gene_schema
+
+# max length of the parameters string of a slow query, e.g. a long ``IN`` list
+PARAMETERS_MAX_LENGTH: int = 1000
+
+# names of the engine event listeners in ``provider.database``, skipped when finding caller
+_LISTENER_NAME_SET: set[str] = {'before_cursor_execute', 'after_cursor_execute'}
+
+_slow_query_deque: deque[gene_schema.SlowQueryOut] = deque(maxlen=config.general.SLOW_QUERY_LOG_MAX_SIZE)
+
+# statement -> EXPLAIN rows, so that the plan of a frequently slow statement is not captured again and again
+_explain_cache = LRUCache(max_size=256, ttl_seconds=10 * 60)
+
+# keep references of running EXPLAIN tasks, otherwise they may be garbage collected
+_explain_task_set: set[asyncio.Task] = set()
+
+
+def is_slow(duration_sec: float) -> bool:
+    threshold_ms = config.general.SLOW_QUERY_THRESHOLD_MS
+    return threshold_ms is not None and duration_sec * 1000 >= threshold_ms
+
+
+def _iter_frames():
+    frame = sys._getframe(1)
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+
+    # statements of ``AsyncSession`` are executed inside a greenlet, whose stack does not contain the coroutines
+    # awaiting it. continue with the frame where the parent greenlet switched into this one.
+    parent = greenlet.getcurrent().parent
+    frame = parent.gr_frame if parent is not None else None
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+
+
+def find_caller() -> str | None:
+    """
+    Return the qualified name of the innermost function in ``provider`` package in the current call stack,
+    excluding this module and the engine event listeners.
+    """
+    for frame in _iter_frames():
+        module_name: str = frame.f_globals.get('__name__', '')
+        if not module_name.startswith('provider.') or module_name == __name__:
+            continue
+        if frame.f_code.co_name in _LISTENER_NAME_SET:
+            continue
+        return f'{module_name}.{frame.f_code.co_name}'
+    return None
+
+
+def get_explain_statement(dialect_name: str, statement: str) -> str | None:
+    """
+    Return the ``EXPLAIN`` statement of a ``SELECT`` statement. ``None`` if not supported.
+    """
+    if statement.lstrip()[:6].upper() != 'SELECT':
+        return None
+    if dialect_name == 'sqlite':
+        return f'EXPLAIN QUERY PLAN {statement}'
+    if dialect_name == 'mysql':
+        return f'EXPLAIN {statement}'
+    return None
+
+
+def record_slow_query(
+        engine: AsyncEngine,
+        statement: str,
+        parameters,
+        duration_sec: float,
+        executemany: bool,
+) -> None:
+    """
+    Log a slow statement and keep it in memory. Called by engine event listener in ``provider.database``.
+    """
+    # statements run by this module
+    if statement.lstrip()[:7].upper() == 'EXPLAIN':
+        return
+
+    parameters_str = repr(parameters)
+    if len(parameters_str) > PARAMETERS_MAX_LENGTH:
+        parameters_str = parameters_str[:PARAMETERS_MAX_LENGTH] + '...'
+
+    slow_query = gene_schema.SlowQueryOut(
+        occurred_at=time.time(),
+        duration_ms=round(duration_sec * 1000, 3),
+        statement=statement,
+        parameters=parameters_str,
+        caller=find_caller(),
+    )
+    _slow_query_deque.append(slow_query)
+    logger.warning(f'Slow query ({slow_query.duration_ms}ms) by {slow_query.caller}: '
+                   f'{" ".join(statement.split())} {parameters_str}')
+
+    if not config.general.SLOW_QUERY_EXPLAIN or executemany:
+        return
+    explain_statement = get_explain_statement(engine.dialect.name, statement)
+    if explain_statement is None:
+        return
+
+    hit, explain = _explain_cache.get(statement)
+    if hit:
+        slow_query.explain = explain
+        return
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # engine used without event loop, e.g. in sync scripts
+        return
+    task = loop.create_task(_capture_explain(engine, slow_query, explain_statement, parameters))
+    _explain_task_set.add(task)
+    task.add_done_callback(_explain_task_set.discard)
+
+
+async def _capture_explain(
+        engine: AsyncEngine,
+        slow_query: gene_schema.SlowQueryOut,
+        explain_statement: str,
+        parameters,
+) -> None:
+    try:
+        async with engine.connect() as conn:
+            result = await conn.exec_driver_sql(explain_statement, parameters)
+            explain = [dict(row._mapping) for row in result.all()]
+    except Exception as e:
+        slow_query.explain_error = f'{type(e).__name__}: {e}'
+        logger.warning(f'Failed to capture EXPLAIN of slow query: {slow_query.explain_error}')
+        return
+
+    slow_query.explain = explain
+    _explain_cache.set(slow_query.statement, explain)
+
+
+def get_slow_queries(limit: int | None = None) -> list[gene_schema.SlowQueryOut]:
+    """
+    Return the most recent slow queries, the latest comes first.
+    """
+    slow_query_list = [slow_query.model_copy() for slow_query in reversed(_slow_query_deque)]
+    if limit is not None:
+        slow_query_list = slow_query_list[:limit]
+    return slow_query_list
+
+
+def clear() -> None:
+    _slow_query_deque.clear()
+    _explain_cache.clear()
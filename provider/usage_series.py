@@ -0,0 +1,208 @@
+"""
+Append-only cache of converted usage series of recent time windows.
+
+Most ``/info/recent_records`` requests cover the same sliding window, which gains only one new record per collector
+interval. Each cache entry keeps the raw records of the window, a ``UsageStreamConverter`` that has been fed these
+records, the rounded usage points already determined by it, and the finished series of the last request.
+
+- If no record is caught and no record leaves the window since the last request, the finished series is returned
+  as it is.
+- If only new records are caught, they are fed into the converter, and the few points held back by spreading,
+  smart merge and smoothing near the end are flushed from a copy of the converter.
+- If the oldest records leave the window, only the points up to the second record of the window are converted
+  again from the new first record, the rest are kept. Check out ``UsageSeriesEntry._drop_head()``.
+- Smart merge groups are aligned with the first point of window. So with a merge ratio greater than 1, or when the
+  auto merge ratio changes, the series is converted again from all cached records instead. Only new records are
+  read from database in this case as well.
+
+So the result is always identical to converting the records of the requested window at once with
+``get_records_by_time_range()``.
+
+Notice:
+
+- Only appending newer records is incremental. Writes at or before the last record of an entry should call
+  ``invalidate()``, then the entry will be rebuilt on the next request.
+"""
+import asyncio
+import copy
+
+import numpy as np
+
+import config.general
+from provider.algorithms import UsageStreamConverter, get_auto_merge_ratio, round_record_batch
+from provider.cache import LRUCache
+from schema import electric as elec_schema
+from schema.electric import RecordBatch
+
+# count of records converted again when the first record of window changes. Smoothing holds back the last two points,
+# so with four records all points up to the second record are determined.
+HEAD_RECORD_COUNT: int = 4
+
+
+class UsageSeriesEntry:
+    """
+    Usage series of one room and convert config, extended while new records arrive.
+
+    Parameters:
+
+    - ``start_timestamp`` Start of the window when creating this entry.
+
+    Members:
+
+    - ``start_timestamp`` Window start of the last ``update()``. Records before it have been dropped, so the window
+      start of following updates should never be less than this value.
+    - ``last_record_timestamp`` Timestamp of the last record fed into this entry. Records newer than this
+      value should be fed by ``update()``.
+    - ``lock`` Should be held while updating this entry.
+    """
+
+    def __init__(self, usage_convert_config: elec_schema.UsageConvertConfig, start_timestamp: int) -> None:
+        self.usage_convert_config = usage_convert_config
+        self.start_timestamp = start_timestamp
+        self.last_record_timestamp: int = start_timestamp - 1
+        self.lock = asyncio.Lock()
+        # raw records in window, ascending
+        self._record_batch: RecordBatch = RecordBatch.empty()
+        self._converter: UsageStreamConverter | None = None
+        self._merge_ratio: int | None = None
+        # rounded points already determined by converter, ascending
+        self._point_batch: RecordBatch = RecordBatch.empty()
+        # finished series of the current window, ``None`` if outdated
+        self._series: RecordBatch | None = None
+
+    def update(self, start_timestamp: int, record_batch: RecordBatch) -> RecordBatch:
+        """
+        Feed records newer than ``last_record_timestamp`` and move the window start to ``start_timestamp``.
+
+        Returns the usage series of records from ``start_timestamp`` to ``last_record_timestamp``, rounded to
+        2 decimal places, which is identical to the result of ``convert_balance_batch_to_usage_batch()``.
+        """
+        if start_timestamp < self.start_timestamp:
+            raise ValueError('Window start of usage series entry should never decrease')
+        self.start_timestamp = start_timestamp
+
+        if len(record_batch) > 0:
+            self.last_record_timestamp = int(record_batch.timestamp[-1])
+            self._record_batch = RecordBatch.concat([self._record_batch, record_batch])
+
+        drop_count = int(np.searchsorted(self._record_batch.timestamp, start_timestamp, side='left'))
+        if drop_count > 0:
+            self._record_batch = self._record_batch[drop_count:]
+
+        merge_ratio = self._get_merge_ratio()
+        if (
+                self._converter is None
+                or merge_ratio != self._merge_ratio
+                or (drop_count > 0 and not self._can_drop_head())
+        ):
+            # convert again from the first record of window
+            self._merge_ratio = merge_ratio
+            self._converter = UsageStreamConverter(self.usage_convert_config, merge_ratio=merge_ratio)
+            self._point_batch = round_record_batch(self._converter.feed(self._record_batch))
+            self._series = None
+        else:
+            if len(record_batch) > 0:
+                new_point_batch = self._converter.feed(record_batch)
+                if len(new_point_batch) > 0:
+                    self._point_batch = RecordBatch.concat([self._point_batch, round_record_batch(new_point_batch)])
+                self._series = None
+            if drop_count > 0:
+                self._drop_head()
+                self._series = None
+
+        if self._series is None:
+            # flush the held back points from a copy, so that the converter could still be extended afterward
+            tail_batch = copy.deepcopy(self._converter).finish()
+            self._series = RecordBatch.concat([self._point_batch, round_record_batch(tail_batch)])
+        return self._series
+
+    def _can_drop_head(self) -> bool:
+        """
+        Check if records leaving the window could be handled by ``_drop_head()``. Smart merge groups are aligned with
+        the first point of window, so all groups change when the first record changes, unless the ratio is 1.
+        """
+        if len(self._record_batch) < HEAD_RECORD_COUNT:
+            return False
+        if not self.usage_convert_config.use_smart_merge:
+            return True
+        merge_ratio = self.usage_convert_config.merge_ratio
+        if merge_ratio is None:
+            merge_ratio = self._merge_ratio
+        return max(1, int(merge_ratio)) == 1
+
+    def _drop_head(self) -> None:
+        """
+        Replace the points of the window head after the first record of window changed.
+
+        Without smart merge, every process only looks at the neighbours of a point. So only the points up to the
+        second record of window could be different from the ones converted from the old first record. These points
+        are converted again from the first ``HEAD_RECORD_COUNT`` records, and the rest are kept.
+        """
+        second_timestamp = self._record_batch.timestamp[1]
+        head_converter = UsageStreamConverter(self.usage_convert_config, merge_ratio=self._merge_ratio)
+        head_batch = head_converter.feed(self._record_batch[:HEAD_RECORD_COUNT])
+        head_count = int(np.searchsorted(head_batch.timestamp, second_timestamp, side='right'))
+        keep_index = int(np.searchsorted(self._point_batch.timestamp, second_timestamp, side='right'))
+        self._point_batch = RecordBatch.concat([
+            round_record_batch(head_batch[:head_count]),
+            self._point_batch[keep_index:],
+        ])
+
+    def _get_merge_ratio(self) -> int | None:
+        """
+        Return the merge ratio of the records in window, resolved the same way as ``stream_records_by_time_range()``.
+        """
+        if not self.usage_convert_config.use_smart_merge or self.usage_convert_config.merge_ratio is not None:
+            return None
+        if len(self._record_batch) == 0:
+            return 1
+        return get_auto_merge_ratio(self._record_batch.timestamp[0], self._record_batch.timestamp[-1])
+
+
+class UsageSeriesCache:
+    """
+    LRU cache of ``UsageSeriesEntry`` keyed on room, convert config and window length.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self._lru = LRUCache(max_size=max_size)
+
+    @staticmethod
+    def make_key(room_id: str, usage_convert_config: elec_schema.UsageConvertConfig, window_sec: int) -> tuple:
+        return room_id, usage_convert_config.model_dump_json(), window_sec
+
+    def get(self, key: tuple) -> UsageSeriesEntry | None:
+        return self._lru.get(key)[1]
+
+    def set(self, key: tuple, entry: UsageSeriesEntry) -> None:
+        self._lru.set(key, entry)
+
+    def invalidate(self, room_id: str, timestamp: int | None = None) -> int:
+        """
+        Remove entries of a room that have been fed records at or after ``timestamp``.
+        ``None`` removes all entries of the room. Returns count of entries removed.
+        """
+        return self._lru.remove_if(
+            lambda key, entry: key[0] == room_id and (
+                    timestamp is None or entry.last_record_timestamp >= timestamp)
+        )
+
+    def clear(self) -> None:
+        self._lru.clear()
+
+
+usage_series_cache = UsageSeriesCache(max_size=config.general.USAGE_SERIES_CACHE_MAX_SIZE)
+
+
+def is_cacheable(usage_convert_config: elec_schema.UsageConvertConfig | None, max_points: int | None) -> bool:
+    """
+    Check if the recent usage series of this config could be served by ``usage_series_cache``.
+
+    Downsampling requires the whole series, so requests with ``max_points`` are not cached.
+    """
+    return (
+            config.general.USAGE_SERIES_CACHE_ENABLED
+            and usage_convert_config is not None
+            and usage_convert_config.max_points is None
+            and max_points is None
+    )
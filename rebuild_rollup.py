@@ -0,0 +1,15 @@
+import asyncio
+
+from loguru import logger
+
+from provider import database
+
+
+async def main():
+    written = await database.rebuild_rollups()
+    await database.dispose_engine()
+    logger.success(f'Usage rollups rebuilt, {written} rollup rows written')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
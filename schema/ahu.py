@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field
 
+from .electric import BalanceRecord
+
 
 class AHUHeaderInfo(BaseModel):
     """
@@ -25,3 +27,91 @@ class AHUHeaderInfo(BaseModel):
             'Authorization': self.authorization,
             'synjones-auth': self.synjones_auth,
         }
+
+
+class AHURequestTiming(BaseModel):
+    """
+    Timing info of a sub-request to AHU website.
+
+    Members:
+
+    - ``name`` Name of the sub-request, ``light`` or ``ac``. Prefixed by room id for rooms other than the default
+      one, e.g. ``b3_402/light``.
+    - ``attempts`` Count of attempts performed, including retries.
+    - ``latency_ms`` Total time consumed by this sub-request including retry backoff. In milliseconds unit.
+    - ``attempt_latency_ms`` Time consumed by each attempt. In milliseconds unit.
+    """
+    name: str
+    attempts: int
+    latency_ms: int
+    attempt_latency_ms: list[int] = Field(default_factory=list)
+
+
+class RoomInfo(BaseModel):
+    """
+    A room that records are caught of.
+
+    Members:
+
+    - ``room_id`` ID of this room, used to scope records in database.
+    - ``light_info`` ``ac_info`` Request info dicts of the light and AC account sent to AHU website.
+    """
+    room_id: str
+    light_info: dict
+    ac_info: dict
+
+
+class RoomCatchResult(BaseModel):
+    """
+    Result of catching the record of one room from AHU website.
+
+    Members:
+
+    - ``room_id`` ID of the room.
+    - ``record`` The record caught. ``None`` if failed.
+    - ``request_timings`` Timing info of the sub-requests to AHU website.
+    - ``error`` Error message if failed.
+    """
+    room_id: str
+    record: BalanceRecord | None = None
+    request_timings: list[AHURequestTiming] = Field(default_factory=list)
+    error: str | None = None
+
+
+class CollectorStatusOut(BaseModel):
+    """
+    Status of the resident record collector.
+
+    Members:
+
+    - ``enabled`` If collector is enabled in config.
+    - ``running`` If collector scheduler is running.
+    - ``healthy`` If a record has been caught successfully within the recent two intervals.
+    - ``interval_sec`` Interval between two collections in seconds.
+    - ``room_count`` Count of rooms records are caught of in each collection.
+    - ``last_run_at`` ``last_success_at`` ``last_error_at`` ``next_run_at`` UNIX timestamps. ``None`` if not happened.
+    - ``last_error`` Message of the last error.
+    - ``last_latency_ms`` Time consumed by the last successful collection, including database operation.
+    - ``last_request_timings`` Timing info of the sub-requests to AHU website in the last successful collection.
+      Timings of all rooms are included.
+    - ``last_failed_rooms`` IDs of rooms failed in the last collection. A collection is successful only if records
+      of all rooms are caught.
+    - ``success_count`` ``error_count`` Count of successful and failed collections since backend started.
+    - ``missed_ticks`` Count of ticks skipped since the scheduler fell behind.
+    """
+    enabled: bool = False
+    running: bool = False
+    healthy: bool = False
+    interval_sec: float
+    room_count: int = 0
+    last_run_at: float | None = None
+    last_success_at: float | None = None
+    last_error_at: float | None = None
+    last_error: str | None = None
+    next_run_at: float | None = None
+    last_latency_ms: int | None = None
+    last_request_timings: list[AHURequestTiming] = Field(default_factory=list)
+    last_failed_rooms: list[str] = Field(default_factory=list)
+    success_count: int = 0
+    error_count: int = 0
+    missed_ticks: int = 0
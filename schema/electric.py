@@ -2,10 +2,11 @@ import time
 from dataclasses import dataclass
 from enum import Enum
 
+import numpy as np
 from loguru import logger
 from sqlalchemy.orm import mapped_column, Mapped
-from sqlalchemy import BIGINT
-from pydantic import BaseModel, field_validator
+from sqlalchemy import BIGINT, String
+from pydantic import BaseModel, Field, field_validator
 
 from .sql import SQLBaseModel
 
@@ -47,18 +48,168 @@ class BalanceRecord(BaseModel):
         )
 
 
+class RecordBatch:
+    """
+    Columnar batch of records, used on internal paths instead of a list of ``BalanceRecord``.
+
+    Records are stored as parallel NumPy arrays, so no Pydantic model is created for every row.
+    Pydantic models should only be created when the data is passed to frontend, using ``to_record_list()``.
+
+    Members:
+
+    - ``timestamp`` Timestamp array. ``int64`` when loaded from database, ``float64`` when converted from a
+      ``BalanceRecord`` list.
+    - ``light_balance`` ``ac_balance`` ``float64`` value arrays. Could be either balance or usage.
+
+    Notice:
+
+    - Batch instance should be treated as immutable. Functions receiving a batch should return a new one
+      instead of mutating arrays in place.
+    """
+    __slots__ = ('timestamp', 'light_balance', 'ac_balance')
+
+    def __init__(self, timestamp: np.ndarray, light_balance: np.ndarray, ac_balance: np.ndarray) -> None:
+        self.timestamp = timestamp
+        self.light_balance = light_balance
+        self.ac_balance = ac_balance
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def __getitem__(self, item: slice) -> 'RecordBatch':
+        return RecordBatch(self.timestamp[item], self.light_balance[item], self.ac_balance[item])
+
+    @classmethod
+    def empty(cls) -> 'RecordBatch':
+        return cls(
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.float64),
+            np.empty(0, dtype=np.float64),
+        )
+
+    @classmethod
+    def concat(cls, batch_list: list['RecordBatch']) -> 'RecordBatch':
+        """
+        Join batches in order into a new batch.
+        """
+        if not batch_list:
+            return cls.empty()
+        return cls(
+            np.concatenate([batch.timestamp for batch in batch_list]),
+            np.concatenate([batch.light_balance for batch in batch_list]),
+            np.concatenate([batch.ac_balance for batch in batch_list]),
+        )
+
+    @classmethod
+    def from_rows(cls, row_list) -> 'RecordBatch':
+        """
+        Create a batch from rows of ``(timestamp, light_balance, ac_balance)``, e.g. the result of selecting
+        these three columns of ``SQLRecord``.
+        """
+        size = len(row_list)
+        if size == 0:
+            return cls.empty()
+
+        timestamp_list, light_list, ac_list = zip(*row_list)
+        return cls(
+            np.fromiter(timestamp_list, dtype=np.int64, count=size),
+            np.fromiter(light_list, dtype=np.float64, count=size),
+            np.fromiter(ac_list, dtype=np.float64, count=size),
+        )
+
+    @classmethod
+    def from_records(cls, record_list: list['BalanceRecord | SQLRecord']) -> 'RecordBatch':
+        """
+        Create a batch from a list of ``BalanceRecord`` or ``SQLRecord``. Timestamps are kept as float.
+        """
+        size = len(record_list)
+        return cls(
+            np.fromiter((record.timestamp for record in record_list), dtype=np.float64, count=size),
+            np.fromiter((record.light_balance for record in record_list), dtype=np.float64, count=size),
+            np.fromiter((record.ac_balance for record in record_list), dtype=np.float64, count=size),
+        )
+
+    def to_record_list(self) -> list[BalanceRecord]:
+        """
+        Convert this batch to a list of ``BalanceRecord``.
+
+        Values are passed as they are without validation, round the batch before converting if needed.
+        """
+        return [
+            BalanceRecord.model_construct(timestamp=timestamp, light_balance=light, ac_balance=ac)
+            for timestamp, light, ac in zip(
+                self.timestamp.astype(np.float64).tolist(),
+                self.light_balance.tolist(),
+                self.ac_balance.tolist(),
+            )
+        ]
+
+
+# id of the room configured by ``DORM_LIGHT_INFO_DICT`` and ``DORM_AC_INFO_DICT`` in ``config/dorm.py``.
+# records caught before multi-room support belong to this room.
+DEFAULT_ROOM_ID: str = 'default'
+
+# max length of room id
+ROOM_ID_MAX_LENGTH: int = 64
+
+
 class SQLRecord(SQLBaseModel):
+    """
+    Primary key is ``(room_id, timestamp)``, which is also used as the index of all room scoped queries.
+    """
     __tablename__ = 'record'
 
+    room_id: Mapped[str] = mapped_column(
+        String(ROOM_ID_MAX_LENGTH),
+        primary_key=True,
+        default=DEFAULT_ROOM_ID,
+        server_default=DEFAULT_ROOM_ID,
+        comment='The room this record belongs to')
     timestamp: Mapped[int] = mapped_column(
         primary_key=True,
         autoincrement=False,
-        unique=True,
         comment='The timestamp this record has been caught')
     light_balance: Mapped[float] = mapped_column(comment='The balance or general.py account')
     ac_balance: Mapped[float] = mapped_column(comment='The balance of air conditioner account')
 
 
+class UsageRollupColumns:
+    """
+    Columns shared by usage rollup tables. Each row stores the info of the records inside one time bucket.
+
+    Usage between two adjacent buckets is NOT included in either bucket, it could be calculated using
+    the last balance of the previous bucket and the first balance of the next bucket.
+    For more info, check out ``provider/rollup.py``.
+    """
+    room_id: Mapped[str] = mapped_column(
+        String(ROOM_ID_MAX_LENGTH),
+        primary_key=True,
+        default=DEFAULT_ROOM_ID,
+        server_default=DEFAULT_ROOM_ID,
+        comment='The room this bucket belongs to')
+    bucket_start: Mapped[int] = mapped_column(
+        primary_key=True,
+        autoincrement=False,
+        comment='The start timestamp of this bucket')
+    record_count: Mapped[int] = mapped_column(comment='Count of records inside this bucket')
+    first_timestamp: Mapped[int] = mapped_column(comment='Timestamp of the first record inside this bucket')
+    last_timestamp: Mapped[int] = mapped_column(comment='Timestamp of the last record inside this bucket')
+    first_light_balance: Mapped[float] = mapped_column(comment='Light balance of the first record')
+    first_ac_balance: Mapped[float] = mapped_column(comment='AC balance of the first record')
+    last_light_balance: Mapped[float] = mapped_column(comment='Light balance of the last record')
+    last_ac_balance: Mapped[float] = mapped_column(comment='AC balance of the last record')
+    light_usage: Mapped[float] = mapped_column(comment='Light usage between records inside this bucket')
+    ac_usage: Mapped[float] = mapped_column(comment='AC usage between records inside this bucket')
+
+
+class SQLHourlyUsage(UsageRollupColumns, SQLBaseModel):
+    __tablename__ = 'usage_hourly'
+
+
+class SQLDailyUsage(UsageRollupColumns, SQLBaseModel):
+    __tablename__ = 'usage_daily'
+
+
 class Statistics(BaseModel):
     """
     Class used as response model for statistics info
@@ -73,11 +224,86 @@ class Statistics(BaseModel):
     ac_total_last_week: float
 
 
+class WindowStatistics(BaseModel):
+    """
+    Usage statistics of a trailing time window.
+
+    Members:
+
+    - ``window`` The window as requested, e.g. ``7d``.
+    - ``window_sec`` Duration of the window in seconds.
+    - ``start_timestamp`` ``end_timestamp`` Time range of the window.
+    - ``light_usage`` ``ac_usage`` Total usage during the window.
+    - ``point_used`` Count of records the usage is calculated from.
+    """
+    window: str
+    window_sec: int
+    start_timestamp: int
+    end_timestamp: int
+    light_usage: float
+    ac_usage: float
+    point_used: int
+
+
+class MultiWindowStatisticsOut(BaseModel):
+    """
+    Usage statistics of multiple trailing windows, all ending at ``timestamp``.
+    """
+    timestamp: float
+    windows: list[WindowStatistics]
+
+
 class CountInfoOut(BaseModel):
     total: int
     last_7_days: int
 
 
+class RecordPageOut(BaseModel):
+    """
+    A page of records returned by cursor based pagination, the latest record comes first.
+
+    Members:
+
+    - ``records`` Records in this page.
+    - ``next_cursor`` Cursor of the next page with older records. ``None`` if there is no older record.
+    - ``prev_cursor`` Cursor of the previous page with newer records. ``None`` if there is no newer record.
+    """
+    records: list[BalanceRecord]
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+
+
+class BulkInsertResultOut(BaseModel):
+    """
+    Result of bulk record insertion.
+
+    Members:
+
+    - ``inserted`` Count of records with new timestamp that have been inserted.
+    - ``updated`` Count of existing records whose balances have been overwritten.
+    - ``skipped`` Count of records not written. Including records identical to the existing ones,
+      existing records when overwrite is disabled, and duplicated timestamps inside the request.
+    """
+    inserted: int
+    updated: int
+    skipped: int
+
+
+class CompactionResultOut(BaseModel):
+    """
+    Result of record compaction.
+
+    Members:
+
+    - ``dry_run`` If `True`, records are only counted and have NOT been removed.
+    - ``scanned`` Count of records older than the compaction ages that have been checked.
+    - ``removed`` Count of records removed, or would be removed if not in dry run mode.
+    """
+    dry_run: bool
+    scanned: int
+    removed: int
+
+
 TEST_STATISTICS_DICT = {
     'timestamp': 0,
     'total_last_day': 3.54,
@@ -128,6 +354,8 @@ class UsageConvertConfig(BaseModel):
     - ``smoothing`` If `true`, implement points smoothing.
     - ``per_hour_usage``: If `true`, the usage list value will use `usage/h` as unit.
     - ``remove_first_point`` If `true`, will remove the first point, since it will not contain any useful usage info.
+    - ``max_points`` If NOT `None`, downsample the usage list to at most this count of points using
+      Largest-Triangle-Three-Buckets algorithm. Total usage is kept. Check out ``docs/usage_calc.md``.
     """
     spreading: bool = True
     use_smart_merge: bool = True
@@ -135,6 +363,7 @@ class UsageConvertConfig(BaseModel):
     smoothing: bool = True
     per_hour_usage: bool = True
     remove_first_point: bool = True
+    max_points: int | None = Field(default=None, ge=3)
 
 
 class TimeRangeStatistics(BaseModel):
@@ -159,3 +388,59 @@ class TimeRangeStatistics(BaseModel):
     @classmethod
     def rounding_result(cls, value: float):
         return round(value, 2)
+
+
+class UsageAnalytics(BaseModel):
+    """
+    Usage analytics of one account (light or AC) in a time range.
+
+    Members:
+
+    - ``total_usage`` Total usage. Top-ups are not counted.
+    - ``avg_usage_per_hour`` Average usage per hour between the first and the last record in range.
+    - ``peak_hour_start`` ``peak_hour_usage`` Start timestamp and usage of the hour with max usage.
+      ``None`` if there are less than two records.
+    - ``hourly_usage_percentiles`` Percentiles of usage per hour, keyed like ``p50``, ``p90``. Only hours with
+      records are included.
+    - ``top_up_count`` ``top_up_amount`` Count and total amount of balance increases between adjacent records.
+    """
+    total_usage: float
+    avg_usage_per_hour: float
+    peak_hour_start: int | None = None
+    peak_hour_usage: float = 0
+    hourly_usage_percentiles: dict[str, float] = Field(default_factory=dict)
+    top_up_count: int = 0
+    top_up_amount: float = 0
+
+    @field_validator('total_usage', 'avg_usage_per_hour', 'peak_hour_usage', 'top_up_amount')
+    @classmethod
+    def rounding_result(cls, value: float):
+        return round(value, 2)
+
+
+class TimeRangeAnalyticsOut(BaseModel):
+    """
+    Analytics of records in a time range.
+
+    Members:
+
+    - ``start_timestamp`` ``end_timestamp`` The requested time range.
+    - ``first_record_timestamp`` ``last_record_timestamp`` Timestamp of the first and last record in range.
+    - ``point_used`` Count of records in range.
+    - ``coverage_ratio`` Ratio of the expected record slots in range that have records, between 0 and 1.
+    - ``light`` ``ac`` Usage analytics of each account.
+    """
+    start_timestamp: int
+    end_timestamp: int
+    first_record_timestamp: int | None = None
+    last_record_timestamp: int | None = None
+    point_used: int
+    coverage_ratio: float
+    light: UsageAnalytics
+    ac: UsageAnalytics
+
+    @field_validator('coverage_ratio')
+    @classmethod
+    def rounding_ratio(cls, value: float):
+        return round(value, 4)
+
@@ -9,6 +9,32 @@ class BackendInfoOut(BaseModel):
     on_cloud: bool
 
 
+class CacheInfoOut(BaseModel):
+    """
+    Members:
+
+    - ``size`` ``max_size`` Current and max count of entries in cache.
+    - ``hits`` ``misses`` Count of cache hits and misses since the backend started.
+    - ``data_version`` Current data version, increased on every write to database.
+    """
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    data_version: int
+
+
+class StreamFormat(str, Enum):
+    """
+    Response format of streaming endpoints.
+
+    - ``ndjson`` Newline delimited JSON, one JSON object per line.
+    - ``json`` A normal JSON array, sent in chunks.
+    """
+    ndjson: str = 'ndjson'
+    json: str = 'json'
+
+
 class PeriodUnit(str, Enum):
     """
     Enum used to represent the time unit when calculating usage or other case need to set time period
@@ -68,6 +94,32 @@ class PeriodUnit(str, Enum):
         if period == PeriodUnit.month:
             return int((dt_period_start - timedelta(days=5)).replace(day=1).timestamp())
 
+    @classmethod
+    def get_recent_period_ranges(
+            cls,
+            period: 'PeriodUnit',
+            period_count: int,
+            current_timestamp: int,
+    ) -> list[tuple[int, int]]:
+        """
+        Return a list of ``(start, end)`` timestamp tuples of the recent periods, the current period comes first.
+
+        The current period ends at ``current_timestamp``, the previous ones end at their natural period end.
+        Notice that the list contains ``period_count + 1`` items since the current period is included.
+        """
+        range_list: list[tuple[int, int]] = []
+
+        cur_start_time: int = cls.get_current_period_start(period)
+        cur_end_time: int = current_timestamp
+        for back_idx in range(0, period_count + 1):
+            range_list.append((cur_start_time, cur_end_time))
+
+            # update start and end time of next period
+            cur_start_time = cls.get_previous_period_start(period, cur_start_time)
+            cur_end_time = cls.get_period_end(period, cur_start_time)
+
+        return range_list
+
     @classmethod
     def get_period_duration(cls, period: 'PeriodUnit') -> int:
         """
@@ -81,3 +133,26 @@ class PeriodUnit(str, Enum):
             return duration * 7
         if period == PeriodUnit.month:
             return duration * 30
+
+
+class SlowQueryOut(BaseModel):
+    """
+    Info of a SQL statement slower than ``SLOW_QUERY_THRESHOLD_MS``.
+
+    Members:
+
+    - ``occurred_at`` UNIX timestamp when the statement finished.
+    - ``duration_ms`` Execution time of the statement in milliseconds.
+    - ``statement`` ``parameters`` SQL statement and its parameters. Parameters are truncated if too long.
+    - ``caller`` The provider function executed this statement, e.g. ``provider.database.get_record_count``.
+    - ``explain`` Rows returned by ``EXPLAIN`` of this statement (``EXPLAIN QUERY PLAN`` for SQLite).
+      ``None`` if not captured, e.g. not a ``SELECT`` statement, or still capturing.
+    - ``explain_error`` Error message if failed to capture ``EXPLAIN``.
+    """
+    occurred_at: float
+    duration_ms: float
+    statement: str
+    parameters: str
+    caller: str | None = None
+    explain: list[dict] | None = None
+    explain_error: str | None = None
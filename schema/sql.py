@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from sqlalchemy import Select
 from sqlalchemy.orm import DeclarativeBase
@@ -32,4 +32,18 @@ class PaginationConfig(BaseModel):
     def use_on(self, select_stmt: Select):
         offset = self.size * self.index
         limit = self.size
-        return select_stmt.limit(limit).offset(offset)
\ No newline at end of file
+        return select_stmt.limit(limit).offset(offset)
+
+
+class KeysetPaginationConfig(BaseModel):
+    """
+    Cursor based pagination config. Unlike ``PaginationConfig``, pages are located by the key of the boundary row
+    instead of offset, so the cost of getting a page does not depend on how deep the page is.
+
+    Members:
+
+    - ``size`` How many rows contains in a page.
+    - ``cursor`` Opaque cursor string returned by previous page. ``None`` means the first page.
+    """
+    size: int = Field(default=20, ge=1, le=1000)
+    cursor: str | None = None
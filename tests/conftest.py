@@ -0,0 +1,19 @@
+"""
+Make the project importable from tests, and fallback to the example configs for config modules that have not been
+created yet, so that tests could run in a fresh clone.
+"""
+import importlib
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+for config_name in ['general', 'sql', 'auth', 'dorm']:
+    try:
+        importlib.import_module(f'config.{config_name}')
+    except ModuleNotFoundError:
+        config_module = importlib.import_module(f'config.{config_name}_example')
+        sys.modules[f'config.{config_name}'] = config_module
+        setattr(config, config_name, config_module)
@@ -0,0 +1,92 @@
+import itertools
+import random
+
+import pytest
+
+import config.general
+from provider.algorithms import (
+    UsageStreamConverter,
+    convert_balance_batch_to_usage_batch,
+    convert_balance_list_to_usage_list,
+    get_auto_merge_ratio,
+    round_record_batch,
+)
+from schema import electric as elec_schema
+from schema.electric import RecordBatch
+
+CONFIG_LIST = [
+    elec_schema.UsageConvertConfig(
+        spreading=spreading,
+        use_smart_merge=use_smart_merge,
+        merge_ratio=merge_ratio,
+        smoothing=smoothing,
+        per_hour_usage=per_hour_usage,
+        remove_first_point=remove_first_point,
+    )
+    for spreading, (use_smart_merge, merge_ratio), smoothing, per_hour_usage, remove_first_point in itertools.product(
+        [True, False],
+        [(False, None), (True, None), (True, 4)],
+        [True, False],
+        [True, False],
+        [True, False],
+    )
+]
+
+
+def make_record_batch(seed: int, size: int) -> RecordBatch:
+    rand = random.Random(seed)
+    timestamp, light, ac = 1_700_000_000, 100.0, 50.0
+    row_list = []
+    for _ in range(size):
+        timestamp += rand.choice([3600, 3600, 3550, 3650, 1200, 5 * 3600])
+        light -= rand.choice([0.0, rand.uniform(0, 1.5)])
+        ac -= rand.uniform(0, 2)
+        if rand.random() < 0.05:
+            light += 30
+        row_list.append((timestamp, round(light, 2), round(ac, 2)))
+    return RecordBatch.from_rows(row_list)
+
+
+def to_row_list(record_batch: RecordBatch) -> list[tuple]:
+    return list(zip(
+        record_batch.timestamp.astype(float).tolist(),
+        record_batch.light_balance.tolist(),
+        record_batch.ac_balance.tolist(),
+    ))
+
+
+def convert_pure_python(monkeypatch, record_batch: RecordBatch, usage_convert_config) -> list[tuple]:
+    """
+    Convert with the pure Python version. Its smoothing and per hour steps don't round the values, so the result is
+    rounded here the same way as ``round_record_batch()``.
+    """
+    monkeypatch.setattr(config.general, 'USAGE_CONVERT_VECTORIZED', False)
+    usage_list = convert_balance_list_to_usage_list(record_batch.to_record_list(), usage_convert_config)
+    monkeypatch.setattr(config.general, 'USAGE_CONVERT_VECTORIZED', True)
+    return to_row_list(round_record_batch(RecordBatch.from_records(usage_list)))
+
+
+@pytest.mark.parametrize('usage_convert_config', CONFIG_LIST)
+@pytest.mark.parametrize('size', [0, 1, 2, 3, 5, 50, 300])
+def test_vectorized_converter_identical(monkeypatch, usage_convert_config, size):
+    record_batch = make_record_batch(seed=size, size=size)
+    expected_row_list = convert_pure_python(monkeypatch, record_batch, usage_convert_config)
+
+    vectorized_batch = convert_balance_batch_to_usage_batch(record_batch, usage_convert_config)
+    assert to_row_list(round_record_batch(vectorized_batch)) == expected_row_list
+
+
+@pytest.mark.parametrize('usage_convert_config', CONFIG_LIST)
+@pytest.mark.parametrize('size', [0, 1, 2, 3, 5, 50, 300])
+@pytest.mark.parametrize('chunk_size', [1, 7, 1000])
+def test_stream_converter_identical(monkeypatch, usage_convert_config, size, chunk_size):
+    record_batch = make_record_batch(seed=size, size=size)
+    expected_row_list = convert_pure_python(monkeypatch, record_batch, usage_convert_config)
+
+    merge_ratio = 1
+    if size > 0:
+        merge_ratio = get_auto_merge_ratio(record_batch.timestamp[0], record_batch.timestamp[-1])
+    converter = UsageStreamConverter(usage_convert_config, merge_ratio=merge_ratio)
+    batch_list = [converter.feed(record_batch[index:index + chunk_size]) for index in range(0, size, chunk_size)]
+    batch_list.append(converter.finish())
+    assert to_row_list(round_record_batch(RecordBatch.concat(batch_list))) == expected_row_list
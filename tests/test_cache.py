@@ -0,0 +1,26 @@
+import asyncio
+
+from provider import cache
+
+
+def test_cached_response_skips_open_end_time():
+    call_list = []
+
+    @cache.cached_response(open_end_param='end_time')
+    async def endpoint(start_time: int, end_time: int | None = None):
+        call_list.append((start_time, end_time))
+        return len(call_list)
+
+    async def main():
+        cache.response_cache.clear()
+        # closed range is cached until data version changes
+        assert await endpoint(start_time=0, end_time=100) == 1
+        assert await endpoint(start_time=0, end_time=100) == 1
+        cache.bump_data_version()
+        assert await endpoint(start_time=0, end_time=100) == 2
+
+        # range ending at current time is never cached
+        assert await endpoint(start_time=0, end_time=None) == 3
+        assert await endpoint(start_time=0, end_time=None) == 4
+
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import pytest
+
+from endpoints import ahu as ahu_endpoint
+from exception import error as exc
+from provider import collector as collector_module
+from provider.collector import Collector
+
+
+class StopCollector(Exception):
+    pass
+
+
+class FakeClock:
+    """
+    Fake ``time.time()`` and ``asyncio.sleep()``. Sleeping advances the clock, plus the suspended time if planned.
+    """
+
+    def __init__(self, now: float) -> None:
+        self.now = now
+        # index of sleep call -> extra seconds passed while suspended
+        self.suspend_dict: dict[int, float] = {}
+        self.sleep_count: int = 0
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        self.now += delay + self.suspend_dict.get(self.sleep_count, 0)
+        self.sleep_count += 1
+
+
+def run_collector(monkeypatch, clock: FakeClock, collect_duration_list: list[float]) -> tuple[Collector, list[float]]:
+    """
+    Run the scheduler of a collector with interval of 100 seconds and no jitter, until all collections are done.
+    Returns the collector and the time when each collection started.
+    """
+    monkeypatch.setattr(time, 'time', clock.time)
+    monkeypatch.setattr(collector_module.asyncio, 'sleep', clock.sleep)
+
+    collector = Collector(interval_sec=100, jitter_sec=0)
+    run_at_list: list[float] = []
+
+    async def catch_up_on_start() -> bool:
+        return False
+
+    async def collect_once() -> list:
+        run_at_list.append(clock.now)
+        if len(run_at_list) > len(collect_duration_list):
+            raise StopCollector
+        clock.now += collect_duration_list[len(run_at_list) - 1]
+        return []
+
+    monkeypatch.setattr(collector, '_catch_up_on_start', catch_up_on_start)
+    monkeypatch.setattr(collector, 'collect_once', collect_once)
+
+    with pytest.raises(StopCollector):
+        asyncio.run(collector._run())
+    return collector, run_at_list[:-1]
+
+
+def test_runs_on_every_tick(monkeypatch):
+    collector, run_at_list = run_collector(monkeypatch, FakeClock(1050), [1, 1, 1])
+    assert run_at_list == [1100, 1200, 1300]
+    assert collector.status.missed_ticks == 0
+
+
+def test_ticks_missed_while_suspended_counted_once(monkeypatch):
+    clock = FakeClock(1050)
+    # the second sleep (until 1200) wakes up at 1550, ticks 1300, 1400 and 1500 are missed
+    clock.suspend_dict[1] = 350
+    collector, run_at_list = run_collector(monkeypatch, clock, [0, 0, 0])
+    assert run_at_list == [1100, 1550, 1600]
+    assert collector.status.missed_ticks == 3
+
+
+def test_ticks_passed_during_collection_skipped(monkeypatch):
+    # the first collection ends at 1350, ticks 1200 and 1300 are missed
+    collector, run_at_list = run_collector(monkeypatch, FakeClock(1050), [250, 0, 0])
+    assert run_at_list == [1100, 1400, 1500]
+    assert collector.status.missed_ticks == 2
+
+
+def test_collections_never_overlap():
+    collector = Collector(interval_sec=100)
+    started = asyncio.Event()
+    release = asyncio.Event()
+    call_list = []
+
+    async def collect() -> list:
+        call_list.append(len(call_list))
+        started.set()
+        await release.wait()
+        return []
+
+    async def main():
+        collector._collect = collect
+        first_task = asyncio.create_task(collector.collect_once())
+        await started.wait()
+        assert collector.collecting
+
+        # another collection waits until the running one finished
+        second_task = asyncio.create_task(collector.collect_once())
+        await asyncio.sleep(0)
+        assert call_list == [0]
+
+        release.set()
+        await first_task
+        await second_task
+        assert call_list == [0, 1]
+        assert not collector.collecting
+
+    asyncio.run(main())
+
+
+def test_manual_run_rejected_while_collecting(monkeypatch):
+    async def main():
+        busy_collector = Collector(interval_sec=100)
+        monkeypatch.setattr(collector_module, 'collector', busy_collector)
+        async with busy_collector._collect_lock:
+            with pytest.raises(exc.CollectorBusyError):
+                await ahu_endpoint.run_collector_once(role=None)
+
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+from provider import rollup
+from provider.algorithms import convert_balance_list_to_usage_list
+from provider.database import calculate_usage
+from provider.retention import COMPACT_LEVEL_DICT, select_removable_timestamps
+from schema import electric as elec_schema
+from schema.electric import BalanceRecord
+
+
+def make_record_list(seed: int, size: int = 600) -> list[BalanceRecord]:
+    """
+    Random records every 10 to 30 minutes, with plateaus, top-ups and balance going back and forth.
+    """
+    rand = random.Random(seed)
+    timestamp, light, ac = 1_700_000_000, 100.0, 50.0
+    record_list = []
+    for _ in range(size):
+        timestamp += rand.randint(600, 1800)
+        # plateaus are common, e.g. at night
+        light -= rand.choice([0.0, 0.0, 0.0, rand.uniform(0, 1)])
+        ac -= rand.choice([0.0, rand.uniform(0, 2)])
+        if rand.random() < 0.03:
+            light += 50
+        if rand.random() < 0.03:
+            ac += 30
+        if rand.random() < 0.02:
+            # balance corrected back and forth
+            light += 0.5
+        record_list.append(BalanceRecord(timestamp=timestamp, light_balance=light, ac_balance=ac))
+    return record_list
+
+
+def compact(record_list: list[BalanceRecord], level: str, chunk_size: int) -> list[BalanceRecord]:
+    """
+    Compact records chunk by chunk like ``compact_chunk()``, chunks end at bucket boundaries.
+    """
+    bucket_start_func = COMPACT_LEVEL_DICT[level]
+    boundary_list = [0] + [
+        index + 1 for index in range(chunk_size, len(record_list) - 1, chunk_size)
+        if bucket_start_func(record_list[index].timestamp) != bucket_start_func(record_list[index + 1].timestamp)
+    ] + [len(record_list)]
+
+    removable_set: set[float] = set()
+    anchor = None
+    for start, end in zip(boundary_list[:-1], boundary_list[1:]):
+        chunk = record_list[start:end]
+        removable_set.update(select_removable_timestamps(chunk, bucket_start_func, anchor))
+        anchor = chunk[-1]
+    return [record for record in record_list if record.timestamp not in removable_set]
+
+
+@pytest.mark.parametrize('level', ['hour', 'day'])
+@pytest.mark.parametrize('chunk_size', [50, 10_000])
+@pytest.mark.parametrize('seed', range(5))
+def test_compaction_preserves_usage(level, chunk_size, seed):
+    record_list = make_record_list(seed)
+    compacted_list = compact(record_list, level, chunk_size)
+    assert len(compacted_list) < len(record_list)
+
+    usage = calculate_usage(record_list, result_rounded=False)
+    compacted_usage = calculate_usage(compacted_list, result_rounded=False)
+    assert compacted_usage['light_usage'] == pytest.approx(usage['light_usage'], abs=1e-6)
+    assert compacted_usage['ac_usage'] == pytest.approx(usage['ac_usage'], abs=1e-6)
+
+    # total of the usage list is preserved as well. Spreading is disabled since spread points are rounded one by one
+    usage_convert_config = elec_schema.UsageConvertConfig(
+        spreading=False, use_smart_merge=False, smoothing=False, per_hour_usage=False, remove_first_point=False)
+    usage_list = convert_balance_list_to_usage_list(record_list, usage_convert_config)
+    compacted_usage_list = convert_balance_list_to_usage_list(compacted_list, usage_convert_config)
+    assert sum(record.light_balance for record in compacted_usage_list) == pytest.approx(
+        sum(record.light_balance for record in usage_list), abs=1e-6)
+    assert sum(record.ac_balance for record in compacted_usage_list) == pytest.approx(
+        sum(record.ac_balance for record in usage_list), abs=1e-6)
+
+
+@pytest.mark.parametrize('level', ['hour', 'day'])
+def test_compaction_keeps_bucket_representatives(level):
+    record_list = make_record_list(seed=0)
+    compacted_timestamp_set = {record.timestamp for record in compact(record_list, level, chunk_size=50)}
+    bucket_start_func = COMPACT_LEVEL_DICT[level]
+
+    # first record and the last record of each bucket are kept
+    assert record_list[0].timestamp in compacted_timestamp_set
+    for record, next_record in zip(record_list, record_list[1:] + [None]):
+        if next_record is None or bucket_start_func(record.timestamp) != bucket_start_func(next_record.timestamp):
+            assert record.timestamp in compacted_timestamp_set
+
+
+def test_plateau_and_top_up():
+    timestamp_list = [rollup.get_hour_start(1_700_000_000) + minute * 60 for minute in [0, 10, 20, 30, 40, 50]]
+    light_list = [10.0, 10.0, 10.0, 9.0, 30.0, 29.0]
+    record_list = [
+        BalanceRecord(timestamp=timestamp, light_balance=light, ac_balance=5.0)
+        for timestamp, light in zip(timestamp_list, light_list)
+    ]
+
+    # plateau points are removed, the lowest point before the top-up and the top-up itself are kept
+    removable_list = select_removable_timestamps(record_list, rollup.get_hour_start)
+    assert removable_list == [timestamp_list[1], timestamp_list[2]]
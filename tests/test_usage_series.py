@@ -0,0 +1,110 @@
+import itertools
+import random
+
+import pytest
+
+from provider.algorithms import convert_balance_batch_to_usage_batch, round_record_batch
+from provider.usage_series import UsageSeriesEntry
+from schema import electric as elec_schema
+from schema.electric import RecordBatch
+
+CONFIG_LIST = [
+    elec_schema.UsageConvertConfig(
+        spreading=spreading,
+        use_smart_merge=use_smart_merge,
+        merge_ratio=merge_ratio,
+        smoothing=smoothing,
+        per_hour_usage=per_hour_usage,
+        remove_first_point=remove_first_point,
+    )
+    for spreading, (use_smart_merge, merge_ratio), smoothing, per_hour_usage, remove_first_point in itertools.product(
+        [True, False],
+        [(False, None), (True, None), (True, 3)],
+        [True, False],
+        [True, False],
+        [True, False],
+    )
+]
+
+
+def make_record_batch(seed: int, size: int, start: int) -> RecordBatch:
+    """
+    Random records with irregular intervals, long gaps, plateaus and top-ups.
+    """
+    rand = random.Random(seed)
+    timestamp, light, ac = start, 100.0, 50.0
+    row_list = []
+    for _ in range(size):
+        timestamp += rand.choice([3600, 3600, 3600, 3500, 3700, 1800, 4 * 3600])
+        light -= rand.choice([0.0, 0.0, rand.uniform(0, 1.5)])
+        ac -= rand.uniform(0, 2)
+        if rand.random() < 0.03:
+            light += 50
+        if rand.random() < 0.03:
+            ac += 30
+        row_list.append((timestamp, round(light, 2), round(ac, 2)))
+    return RecordBatch.from_rows(row_list)
+
+
+def convert_from_scratch(record_batch: RecordBatch, start: int, end: int, usage_convert_config) -> RecordBatch:
+    # the same as ``get_records_by_time_range()``
+    mask = (record_batch.timestamp >= start) & (record_batch.timestamp <= end)
+    window_batch = RecordBatch(
+        record_batch.timestamp[mask], record_batch.light_balance[mask], record_batch.ac_balance[mask])
+    return round_record_batch(convert_balance_batch_to_usage_batch(window_batch, usage_convert_config))
+
+
+def assert_batch_identical(left: RecordBatch, right: RecordBatch) -> None:
+    assert left.timestamp.tolist() == right.timestamp.tolist()
+    assert left.light_balance.tobytes() == right.light_balance.tobytes()
+    assert left.ac_balance.tobytes() == right.ac_balance.tobytes()
+
+
+@pytest.mark.parametrize('usage_convert_config', CONFIG_LIST)
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('days', [1, 7])
+def test_cached_series_identical_to_conversion_from_scratch(usage_convert_config, seed, days):
+    first_timestamp = 1_700_000_000
+    record_batch = make_record_batch(seed, size=250, start=first_timestamp)
+    # auto merge ratio of one day window is 1, so records leaving the window are handled incrementally
+    window_sec = days * 24 * 60 * 60
+    rand = random.Random(seed)
+
+    now = first_timestamp + 3600
+    entry = UsageSeriesEntry(usage_convert_config, start_timestamp=now - window_sec)
+    while now < int(record_batch.timestamp[-1]) + 3600:
+        # requests between new records, or several records caught since the last request
+        now += rand.choice([60, 600, 3600, 3 * 3600])
+        start = now - window_sec
+        mask = (record_batch.timestamp > entry.last_record_timestamp) & (record_batch.timestamp <= now)
+        new_batch = RecordBatch(
+            record_batch.timestamp[mask], record_batch.light_balance[mask], record_batch.ac_balance[mask])
+
+        series = entry.update(start, new_batch)
+        assert_batch_identical(series, convert_from_scratch(record_batch, start, now, usage_convert_config))
+
+
+def test_window_start_never_decreases():
+    entry = UsageSeriesEntry(elec_schema.UsageConvertConfig(), start_timestamp=1000)
+    entry.update(2000, RecordBatch.empty())
+    with pytest.raises(ValueError):
+        entry.update(1500, RecordBatch.empty())
+
+
+def test_records_leaving_window_handled_incrementally():
+    usage_convert_config = elec_schema.UsageConvertConfig(use_smart_merge=False)
+    record_batch = make_record_batch(seed=0, size=100, start=1_700_000_000)
+    window_sec = 24 * 60 * 60
+    now = int(record_batch.timestamp[50])
+
+    entry = UsageSeriesEntry(usage_convert_config, start_timestamp=now - window_sec)
+    entry.update(now - window_sec, record_batch[:51])
+    converter = entry._converter
+
+    # one new record, and the oldest records leave the window
+    now = int(record_batch.timestamp[51])
+    series = entry.update(now - window_sec, record_batch[51:52])
+    assert len(entry._record_batch) < 52
+    assert entry._converter is converter
+    assert_batch_identical(
+        series, convert_from_scratch(record_batch, now - window_sec, now, usage_convert_config))